@@ -1,91 +1,269 @@
-import re
+from functools import cache
+from typing import NamedTuple
 import numpy as np
 import map
+import home_race
 
-def choose_home(loc_strs, money):
-    """Returns the preferable option to get home asap.
+# an optional DecisionCache (see decision_cache.py) in front of the
+# functions of this module; None means that nothing is cached
+decision_cache = None
+
+
+def set_decision_cache(cache):
+    """Sets the DecisionCache used by the AI, None turns caching off."""
+    global decision_cache
+    decision_cache = cache
+
+
+class AIParams(NamedTuple):
+    """
+    The numbers which tune how an AI plays
+
+    The defaults are the values the AIs have always had. A Player has
+    its own parameters (Player.params), so AIs with different
+    parameters can play against each other (see tuner.py). The
+    parameters are hashable, so they are part of the keys of the caches.
+
+    ...
+
+    Attributes
+    ----------
+    sea_coeff : float
+        The penalty of travelling by sea with 100 or 200 pounds.
+    air_coeffs : tuple of float
+        The penalty of flying with 300, 400, 500-900, 1000-1200 and
+        more pounds.
+    sea_penalty : float
+        How many times longer the sea is for a player without money
+        (see map.distances).
+    """
+
+    sea_coeff: float = 1
+    air_coeffs: tuple = (6, 4, 2, 1, 0)
+    sea_penalty: float = 1.75
+
+
+default_params = AIParams()
+
+
+def money_bucket(money):
+    """Returns the money bucket for choose_action_token.
+
+    choose_action_token only depends on the money through the
+    coefficients of sea and air travel and whether the player is poor,
+    so the money values that lead to the same decision are grouped
+    together for the decision cache.
+    """
+    if money == 0:
+        return 0
+    if money < 300:
+        return 1
+    if money == 300:
+        return 2
+    if money == 400:
+        return 3
+    if money <= 900:
+        return 4
+    if money <= 1200:
+        return 5
+    return 6
+
+
+def sea_coeff(money, params=default_params):
+    """Returns the penalty of travelling by sea with little money."""
+    if money in [100, 200]:
+        return params.sea_coeff
+    return 0
 
-    This function, with the help of the function expected_time, returns
-    which of the options given to the function has the shortest
-    expected value of turns to get to Tangier or Cairo.
+
+def air_coeff(money, params=default_params):
+    """Returns the penalty of flying for the amount of money."""
+    if money == 300:
+        return params.air_coeffs[0]
+    if money == 400:
+        return params.air_coeffs[1]
+    if money <= 900:
+        return params.air_coeffs[2]
+    if money <= 1200:
+        return params.air_coeffs[3]
+    return params.air_coeffs[4]
+
+
+# Batch scoring
+# The candidate locations are handled as four index arrays: the node
+# the player last passed (first), the node the player is going toward
+# (second) and the steps to both of them. A city or a crossroads has
+# first == second and zero steps. All the candidates are then scored
+# with one NumPy expression over the per-node cost arrays.
+
+
+@cache
+def _candidate(loc_str):
+    """Returns the location string as (first, second, d_first, d_second)."""
+    loc = loc_str.split("-")
+    if len(loc) == 1:
+        index = map.abb_index[loc[0]]
+        return (index, index, 0, 0)
+    return (map.abb_index[loc[0]], map.abb_index[loc[1]], int(loc[2]), int(loc[3]))
+
+
+def candidate_arrays(loc_strs):
+    """Returns the index arrays of the location strings.
 
     Parameters
     ----------
-    loc_strs : str
+    loc_strs : list of str
         The locations the player could reach this turn.
-    money : int
-        How much money the player has this turn.
 
     Returns
     -------
-    int: the best option of the loc_strs
+    first, second, d_first, d_second : arrays of int
+        The nodes at both ends of each candidate and the steps to them.
     """
-    exp_values = np.zeros_like(loc_strs)
-    times = map.expected_time(money)
-    for index, value in enumerate(loc_strs):
-        loc = re.split(r"-", value)
-        if len(loc) == 1:
-            exp_values[index] = times[loc[0]][0]
-        else:
-            # how long it takes to the next place in the chain + how much from there
-            first = (
-                map.expected(int(loc[2]) + times[loc[0]][2][1])
-                + times[map.abbs[times[loc[0]][2][0]]][0]
-            )
-            second = (
-                map.expected(int(loc[3]) + times[loc[1]][2][1])
-                + times[map.abbs[times[loc[1]][2][0]]][0]
-            )
-            exp_values[index] = min(first, second)
-    return np.argmin(exp_values)
+    return np.array([_candidate(a) for a in loc_strs], dtype=np.int64).T
+
+
+@cache
+def route_arrays(loc, way):
+    """Returns the index arrays of one step from the city to each route.
+
+    For air travel the candidates are the cities the player can fly
+    to. The arrays are read-only as they are cached.
+    """
+    index = map.abb_index[loc]
+    if way == "air":
+        dests = [map.abb_index[a] for a in map.air_routes[loc]]
+        arrays = np.array([dests, dests, [0] * len(dests), [0] * len(dests)])
+    else:
+        routes = map.land_routes[loc] if way == "land" else map.sea_routes[loc]
+        arrays = np.array(
+            [
+                [index] * len(routes),
+                [map.abb_index[a[0]] for a in routes],
+                [1] * len(routes),
+                [a[1] - 1 for a in routes],
+            ]
+        )
+    arrays = arrays.astype(np.int64).reshape(4, -1)
+    arrays.flags.writeable = False
+    return tuple(arrays)
+
 
+def token_distances(unflipped, poor, sea_penalty=1.75):
+    """Returns the per-node array of the sorted distances to the tokens."""
+    if not any(unflipped):
+        # without elimination the game can continue after all the flips
+        return np.empty((map.no_nodes, 0))
+    return map.closest_tokens(tuple(unflipped), poor, sea_penalty)
 
-def closest_token_location(loc_str, unflipped, poor):
-    """Returns the distances to the closest token.
 
-    This helper function, with the help of the function closest_tokens,
-    returns the distances to the closest token from this location.
-    It could be through sea or through land, but if the player has no
-    money, (s)he moves slower in the sea and that is reflected in the
-    result.
+def token_scores(first, second, d_first, d_second, dists):
+    """Returns the sorted distances to the tokens from the candidates.
+
+    The rows 2i and 2i + 1 are the distances of the candidate i through
+    either end of its edge, and the rows are compared lexicographically
+    (see lex_argmin), so the best candidate is lex_argmin(...) // 2. In
+    a city both rows are the same and the distances are rounded down,
+    as the sea distances of a poor player are multiplied by the
+    sea_penalty of the AI.
+    """
+    city = (first == second)[:, None]
+    scores = np.empty((2 * len(first), dists.shape[1]))
+    scores[0::2] = np.where(city, np.floor(dists[first]), dists[first] + d_first[:, None])
+    scores[1::2] = np.where(city, scores[0::2], dists[second] + d_second[:, None])
+    return scores
+
+
+def city_scores(first, second, d_first, d_second, unflipped, destination):
+    """Returns the distances from the candidates to Gol or Tow.
+
+    If any of the candidates is a city with an unflipped token, only
+    those are considered.
+    """
+    if destination == "Gol":
+        dists = dist_gol
+    else:
+        dists = dist_tow
+    potentials = (first == second) & np.array(unflipped, dtype=bool)[first]
+    if potentials.any():
+        return np.where(potentials, dists[first], np.inf)
+    return np.minimum(dists[first] + d_first, dists[second] + d_second)
+
+
+def lex_argmin(scores):
+    """Returns the index of the lexicographically smallest row.
+
+    Of equal rows the first one is returned, like list.index(min(...)).
+    """
+    if scores.shape[1] == 0:
+        return 0
+    return int(np.lexsort(scores.T[::-1])[0])
+
+
+dist_gol = np.array(map.dist_gol)
+dist_tow = np.array(map.dist_tow)
+
+
+def choose_home(loc_strs, money, forced=False):
+    """Returns the preferable option to get home asap.
+
+    This function, with the help of the solved race home (see
+    home_race.py), returns which of the options given to the function
+    has the shortest expected value of turns to get to Tangier or
+    Cairo, when the player travels optimally from there.
 
     Parameters
     ----------
-    loc_str : str
-        The location which is being investigated.
-    unflipped : list of bool
-        The variable from the Game object that contains the information
-        which cities have an unflipped token.
-    poor : bool
-        If the player has money or not.
+    loc_strs : str
+        The locations the player could reach this turn.
+    money : int
+        How much money the player has this turn.
+    forced : bool, optional
+        Whether the player is travelling by sea with no money. Defaults
+        to False.
 
     Returns
     -------
     int: the best option of the loc_strs
     """
-    # notice: regular min (not np.min) is utilized, so one needs to play around with the types
-    dists = map.closest_tokens(tuple(unflipped), poor)
-    loc = re.split(r"-", loc_str)
-    if len(loc) == 1:
-        return [np.int64(a) for a in dists[map.abbs.index(loc[0])]]
-    first = dists[map.abbs.index(loc[0])] + int(loc[2])
-    second = dists[map.abbs.index(loc[1])] + int(loc[3])
-    return min(list(first), list(second))
+    if decision_cache is not None:
+        key = ("home", tuple(loc_strs), money, forced)
+        result = decision_cache.get(key)
+        if result is None:
+            result = _choose_home(loc_strs, money, forced)
+            decision_cache.put(key, result)
+        return result
+    return _choose_home(loc_strs, money, forced)
 
 
-def choose_token(loc_strs, unflipped, money):
+def _choose_home(loc_strs, money, forced=False):
+    """The uncached version of choose_home."""
+    return int(np.argmin(home_race.scores(loc_strs, money, forced)))
+
+
+def choose_token(loc_strs, unflipped, money, params=default_params):
     """Returns the best option to get the closest token."""
-    if money:
-        poor = False
-    else:
-        poor = True
-    dist_values = []
-    for loc in loc_strs:
-        dist_values.append(closest_token_location(loc, unflipped, poor))
-    return dist_values.index(min(dist_values))
+    if decision_cache is not None:
+        key = ("token", tuple(loc_strs), bytes(unflipped), money == 0, params.sea_penalty)
+        result = decision_cache.get(key)
+        if result is None:
+            result = _choose_token(loc_strs, unflipped, money, params)
+            decision_cache.put(key, result)
+        return result
+    return _choose_token(loc_strs, unflipped, money, params)
+
+
+def _choose_token(loc_strs, unflipped, money, params=default_params):
+    """The uncached version of choose_token."""
+    return lex_argmin(
+        token_scores(
+            *candidate_arrays(loc_strs),
+            token_distances(unflipped, not money, params.sea_penalty),
+        )
+    ) // 2
 
 
-def choose_action_token(options, loc, unflipped, money):
+def choose_action_token(options, loc, unflipped, money, params=default_params):
     """Returns the action to get the closest token.
 
     This function chooses the best action if there are 2+ options for
@@ -108,74 +286,52 @@ def choose_action_token(options, loc, unflipped, money):
         which cities have an unflipped token.
     money : int
         How much money the player has.
+    params : AIParams, optional
+        The parameters of the AI. Defaults to default_params.
 
     Returns
     -------
     str: the best option what to do this turn: either flip, land, sea
     or air
     """
+    if decision_cache is not None:
+        key = (
+            "action_token", tuple(options), loc, bytes(unflipped), money_bucket(money),
+            params,
+        )
+        result = decision_cache.get(key)
+        if result is None:
+            result = _choose_action_token(options, loc, unflipped, money, params)
+            decision_cache.put(key, result)
+        return result
+    return _choose_action_token(options, loc, unflipped, money, params)
 
-    def sea_coeff(money):
-        if money in [100, 200]:
-            return 1
-        return 0
-
-    def air_coeff(money):
-        if money == 300:
-            return 6
-        if money == 400:
-            return 4
-        if money <= 900:
-            return 2
-        if money <= 1200:
-            return 1
-        return 0
 
-    if money:
-        poor = False
-    else:
-        poor = True
+def _choose_action_token(options, loc, unflipped, money, params=default_params):
+    """The uncached version of choose_action_token."""
     if "flip" in options:
         return "flip"
-    transport_times = [None] * len(options)
+    scores = []
+    option_of_row = []
     for index, value in enumerate(options):
-        if value == "land":
+        if value == "air":
+            # with 300 pounds the player has no money left after the flight
+            result = token_scores(
+                *route_arrays(loc, "air"),
+                token_distances(unflipped, money == 300, params.sea_penalty),
+            ) + air_coeff(money, params)
+        else:
             # loc is enough - this is always a city!
             # go one step to each direction and pick the best
-            move_options = map.land_routes[loc]
-            compare = []
-            for a in move_options:
-                new_loc = loc + "-" + a[0] + "-" + str(1) + "-" + str(a[1] - 1)
-                compare.append(closest_token_location(new_loc, unflipped, poor))
-            transport_times[index] = min(compare)
-        elif value == "sea":
-            move_options = map.sea_routes[loc]
-            compare = []
-            for a in move_options:
-                new_loc = loc + "-" + a[0] + "-" + str(1) + "-" + str(a[1] - 1)           
-                tester = np.array(
-                    closest_token_location(new_loc, unflipped, poor)
-                )               
-                tester += sea_coeff(money)
-                compare.append(list(tester))
-            transport_times[index] = min(compare)
-        # air
-        else:
-            move_options = map.air_routes[loc]
-            compare = []
-            for a in move_options:
-                if money == 300:
-                    tester = np.array(
-                        closest_token_location(a, unflipped, poor=True)
-                    )
-                else:
-                    tester = np.array(
-                        closest_token_location(a, unflipped, poor=False)
-                    )
-                tester += air_coeff(money)
-                compare.append(list(tester))
-            transport_times[index] = min(compare)
-    return options[transport_times.index(min(transport_times))]
+            result = token_scores(
+                *route_arrays(loc, value),
+                token_distances(unflipped, not money, params.sea_penalty),
+            )
+            if value == "sea":
+                result += sea_coeff(money, params)
+        scores.append(result)
+        option_of_row += [index] * (len(result) // 2)
+    return options[option_of_row[lex_argmin(np.concatenate(scores)) // 2]]
 
 
 def choose_action_city(options):
@@ -217,44 +373,28 @@ def choose_city(destination, loc_strs, unflipped, money):
     -------
     int: the best option of the loc_strs
     """
+    if decision_cache is not None:
+        key = ("city", destination, tuple(loc_strs), bytes(unflipped))
+        result = decision_cache.get(key)
+        if result is None:
+            result = _choose_city(destination, loc_strs, unflipped, money)
+            decision_cache.put(key, result)
+        return result
+    return _choose_city(destination, loc_strs, unflipped, money)
+
+
+def _choose_city(destination, loc_strs, unflipped, money):
+    """The uncached version of choose_city."""
+    first, second, d_first, d_second = candidate_arrays(loc_strs)
+    city = first == second
     # destination can be either Gol or Tow
-    if "Gol" in loc_strs:
-        return loc_strs.index("Gol")
-    if "Tow" in loc_strs:
-        return loc_strs.index("Tow")
-    cities = [len(re.split(r"-", a)) == 1 for a in loc_strs]
-    potentials = [
-        value and unflipped[map.abbs.index(loc_strs[index])]
-        for index, value in enumerate(cities)
-    ]
-    if sum(potentials) == 1:
-        return potentials.index(1)
-    if sum(potentials) == 0:
-        distances = []
-        for a in loc_strs:
-            loc_str = re.split(r"-", a)
-            if len(loc_str) == 1:  # a crossroads or a flipped city
-                if destination == "Gol":
-                    distances.append(map.dist_gol[map.abbs.index(loc_str[0])])
-                else:
-                    distances.append(map.dist_tow[map.abbs.index(loc_str[0])])
-            else:
-                if destination == "Gol":
-                    dist_1 = map.dist_gol[map.abbs.index(loc_str[0])] + int(loc_str[2])
-                    dist_2 = map.dist_gol[map.abbs.index(loc_str[1])] + int(loc_str[3])
-                else:
-                    dist_1 = map.dist_tow[map.abbs.index(loc_str[0])] + int(loc_str[2])
-                    dist_2 = map.dist_tow[map.abbs.index(loc_str[1])] + int(loc_str[3])
-                distances.append(min(dist_1, dist_2))
-    else:
-        distances = []
-        for a in loc_strs:
-            loc_str = re.split(r"-", a)
-            if len(loc_str) > 1 or not unflipped[map.abbs.index(a)]:
-                distances.append(np.inf)
-            else:
-                if destination == "Gol":
-                    distances.append(map.dist_gol[map.abbs.index(a)])
-                else:
-                    distances.append(map.dist_tow[map.abbs.index(a)])
-    return distances.index(min(distances))
+    for target in ("Gol", "Tow"):
+        found = city & (first == map.abb_index[target])
+        if found.any():
+            return int(np.argmax(found))
+    potentials = city & np.array(unflipped, dtype=bool)[first]
+    if potentials.sum() == 1:
+        return int(np.argmax(potentials))
+    return int(
+        np.argmin(city_scores(first, second, d_first, d_second, unflipped, destination))
+    )
@@ -1,28 +1,391 @@
+import json
+import os
 import time
 import random
 import initialize
 import csv
 import numpy as np
+import AI_decisions
+from decision_cache import DecisionCache, ShardedDecisionCache
+from metrics import MetricsReporter
+import caches
+import outcomes
+
+fieldnames = ['Winner', 'Turns', 'Horseshoe winner', 'Star location']
+
+
+def result_fields(counters=False, ai_types=None):
+    """Returns the columns of the results.
+
+    With counters the counters of each AI (see outcomes.py) follow the
+    four columns, e.g. "Amy flips", ..., "Dave money".
+    """
+    if not counters:
+        return fieldnames
+    names = [
+        initialize.player_name(x) for x in range(len(ai_types or initialize.default_ai_types))
+    ]
+    return fieldnames + outcomes.columns(names)
+
+
+def play_game(seed, elimination=True, **setup):
+    """Plays one AI game with the seed and returns its row of data.
+
+    The game has a random generator of its own, seeded with the seed,
+    so games can be played in threads at the same time. The keyword
+    arguments are passed to initialize.init_AI. With counters=True the
+    counters of the AIs are added to the row (see result_fields).
+    """
+    game = initialize.init_AI(elimination, rng=random.Random(seed), **setup)
+    while game.winner is None:
+        game.play()
+    row = [game.winner.name, game.turn_no, game.winner.has_horseshoe, game.tokens.index(7)]
+    if game.counters is not None:
+        game.counters.finish()
+        row += game.counters.values()
+    return row
+
+
+def run_games(start, stop, elimination=True, reporter=None, threads=None, **setup):
+    """Plays the games with the seeds start, ..., stop - 1.
+
+    If a MetricsReporter (see metrics.py) is given, it is told about
+    every game. Returns an array with a row of data for each game.
+
+    With threads the games are played in a thread pool of that size.
+    The threads share the caches of map.py and AI_decisions.py, so the
+    static ones are filled first and the threads only read them. The
+    decision cache (if any) must then be a ShardedDecisionCache. The
+    results are the same as without threads.
+    """
+    columns = result_fields(setup.get("counters", False), setup.get("ai_types"))
+    data = np.empty([stop - start, len(columns)], dtype=object)
+    if threads:
+        if AI_decisions.decision_cache is not None and not isinstance(
+            AI_decisions.decision_cache, ShardedDecisionCache
+        ):
+            raise ValueError("The threads need a ShardedDecisionCache!")
+        if setup.get("occupancy") is not None:
+            raise ValueError("The threads can't count into the same Occupancy!")
+        # concurrent.futures (and logging) is only imported for the threads
+        from concurrent.futures import ThreadPoolExecutor
+
+        caches.warm_up()
+        with ThreadPoolExecutor(threads) as pool:
+            rows = pool.map(lambda x: play_game(x, elimination, **setup), range(start, stop))
+            for x, row in enumerate(rows):
+                data[x] = row
+                if reporter is not None:
+                    reporter.game(row)
+        return data
+    for x in range(start, stop):
+        row = play_game(x, elimination, **setup)
+        data[x - start] = row
+        if reporter is not None:
+            reporter.game(row)
+    return data
+
+
+def write_results(filename, data, columns=fieldnames):
+    """Writes the rows of data with the header into the csv file."""
+    with open(filename, "w", newline='') as file:
+        header_writer = csv.DictWriter(file, columns)
+        header_writer.writeheader()
+        writer = csv.writer(file)
+        for row in data:
+            writer.writerow(row)
+
+
+class Accumulator:
+    """
+    Running totals of the games played so far
+
+    ...
+
+    Attributes
+    ----------
+    games : int
+        How many games have been added.
+    wins : dictionary
+        How many games each player has won.
+    horseshoe_wins : int
+        How many games were won by a horseshoe.
+    turns_sum : int
+        The sum of the game lengths.
+    turns_sq_sum : int
+        The sum of the squares of the game lengths.
+
+    Methods
+    -------
+    add
+        Adds the rows of data to the totals
+    state
+        Returns the totals as a dictionary (e.g. for a checkpoint)
+    report
+        Returns the totals as a readable string
+    """
+
+    def __init__(self, state=None):
+        """
+        Parameters
+        ----------
+        state : dictionary, optional
+            The totals returned by the method state, if the totals
+            are continued from a checkpoint.
+        """
+        state = state or {}
+        self.games = state.get("games", 0)
+        self.wins = dict(state.get("wins", {}))
+        self.horseshoe_wins = state.get("horseshoe_wins", 0)
+        self.turns_sum = state.get("turns_sum", 0)
+        self.turns_sq_sum = state.get("turns_sq_sum", 0)
+
+    def add(self, data):
+        """Adds the rows of data to the totals."""
+        for row in data:
+            self.wins[row[0]] = self.wins.get(row[0], 0) + 1
+            self.horseshoe_wins += bool(row[2])
+            self.turns_sum += int(row[1])
+            self.turns_sq_sum += int(row[1]) ** 2
+        self.games += len(data)
+
+    def state(self):
+        """Returns the totals as a dictionary."""
+        return {
+            "games": self.games,
+            "wins": self.wins,
+            "horseshoe_wins": self.horseshoe_wins,
+            "turns_sum": self.turns_sum,
+            "turns_sq_sum": self.turns_sq_sum,
+        }
+
+    def report(self):
+        """Returns the totals as a readable string."""
+        if not self.games:
+            return "No games have been played."
+        mean = self.turns_sum / self.games
+        variance = max(self.turns_sq_sum / self.games - mean**2, 0)
+        msg = ""
+        for name in sorted(self.wins):
+            msg += f"{name} won {round(self.wins[name] / self.games * 100, 3)} % of the games.\n"
+        msg += f"{round(self.horseshoe_wins / self.games * 100, 3)} % of the games were won by finding a horseshoe.\n"
+        msg += f"The game lasted on average {round(mean, 3)} turns and the standard deviation was {round(variance**0.5, 3)}."
+        return msg
+
+
+def checkpoint_name(filename):
+    """Returns the name of the checkpoint file of the results file."""
+    return filename + ".checkpoint"
+
+
+def load_progress(filename, elimination, endgame_shortcut=False, counters=False):
+    """Returns how far the results file has been played.
+
+    The progress is read from the checkpoint file. A results file
+    without a checkpoint (e.g. from an older run or one that died
+    before its first checkpoint) is read through up to its last
+    complete row, and its rows are expected to be the seeds 0, 1, 2,
+    ... An empty file or a file with only the header has no games.
+
+    Returns
+    -------
+    done : int
+        How many games (seeds 0, ..., done - 1) are in the results.
+    size : int
+        The size of the results file in bytes up to those games.
+    accumulator : Accumulator
+        The totals of those games.
+    """
+    if os.path.exists(checkpoint_name(filename)):
+        with open(checkpoint_name(filename)) as file:
+            checkpoint = json.load(file)
+        if checkpoint["elimination"] != elimination:
+            raise ValueError(
+                f"{filename} was played with elimination={checkpoint['elimination']}!"
+            )
+        if checkpoint.get("endgame_shortcut", False) != endgame_shortcut:
+            raise ValueError(
+                f"{filename} was played with endgame_shortcut={not endgame_shortcut}!"
+            )
+        if checkpoint.get("counters", False) != counters:
+            raise ValueError(f"{filename} was played with counters={not counters}!")
+        return checkpoint["completed"][1], checkpoint["bytes"], Accumulator(checkpoint["accumulator"])
+    accumulator = Accumulator()
+    rows = []
+    # only the complete lines count: a run that died may have left the
+    # header or the last row half-written, or nothing at all
+    size = 0
+    header = None
+    with open(filename, "rb") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            row = next(csv.reader([line.decode()]))
+            if header is None:
+                header = row
+                if (len(header) > len(fieldnames)) != counters:
+                    raise ValueError(f"{filename} was played with counters={not counters}!")
+            else:
+                if len(row) != len(header):
+                    break
+                try:
+                    rows.append([row[0], int(row[1]), row[2] == "True", int(row[3])])
+                except ValueError:
+                    break
+            size += len(line)
+    accumulator.add(rows)
+    return len(rows), size, accumulator
+
+
+def run_with_checkpoints(filename, no_games, elimination=True, checkpoint_every=10**4,
+                         resume=False, reporter=None, endgame_shortcut=False, threads=None,
+                         counters=False):
+    """Plays the games and writes them into the file as they finish.
+
+    After every checkpoint_every games the rows are flushed to the disk
+    and a checkpoint is written next to the file: which seeds have been
+    played, how many bytes of the file they take and the totals of the
+    games. With resume the run continues from the last checkpoint, and
+    a finished file can be extended to more games. The file is the same
+    as if all the games were played in one go.
+
+    Parameters
+    ----------
+    filename : str
+        The csv file of the results.
+    no_games : int
+        The games with the seeds 0, ..., no_games - 1 are played.
+    elimination : bool, optional
+        Whether the elimination rules are on. Defaults to True.
+    checkpoint_every : int, optional
+        How many games there are between the checkpoints. Defaults to
+        10000.
+    resume : bool, optional
+        Whether to continue the file. Defaults to False.
+    reporter : MetricsReporter, optional
+        Reports the progress of the run. Defaults to None.
+    endgame_shortcut : bool, optional
+        Whether the race home is sampled instead of played (see
+        home_race.finish_race). Defaults to False.
+    threads : int, optional
+        Plays the games in a thread pool of this size (see run_games).
+        Defaults to None, i.e. in this thread.
+    counters : bool, optional
+        Whether the counters of the AIs are written as extra columns
+        (see result_fields). Defaults to False.
+
+    Returns
+    -------
+    accumulator : Accumulator
+        The totals of all the games in the file.
+    """
+    if resume and os.path.exists(filename):
+        done, size, accumulator = load_progress(
+            filename, elimination, endgame_shortcut, counters
+        )
+        file = open(filename, "r+", newline='')
+        # anything after the last checkpoint is played again
+        file.truncate(size)
+        file.seek(size)
+        if not size:
+            csv.DictWriter(file, result_fields(counters)).writeheader()
+    else:
+        done, accumulator = 0, Accumulator()
+        file = open(filename, "w", newline='')
+        csv.DictWriter(file, result_fields(counters)).writeheader()
+    if reporter is not None:
+        reporter.done = reporter.start_done = done
+    with file:
+        writer = csv.writer(file)
+        for start in range(done, no_games, checkpoint_every):
+            stop = min(start + checkpoint_every, no_games)
+            data = run_games(
+                start, stop, elimination, reporter, threads, endgame_shortcut=endgame_shortcut,
+                counters=counters
+            )
+            writer.writerows(data)
+            file.flush()
+            os.fsync(file.fileno())
+            accumulator.add(data)
+            checkpoint = {
+                "elimination": elimination,
+                "endgame_shortcut": endgame_shortcut,
+                "counters": counters,
+                "completed": [0, stop],
+                "bytes": file.tell(),
+                "accumulator": accumulator.state(),
+            }
+            with open(checkpoint_name(filename) + ".tmp", "w") as checkpoint_file:
+                json.dump(checkpoint, checkpoint_file)
+            os.replace(checkpoint_name(filename) + ".tmp", checkpoint_name(filename))
+    if reporter is not None:
+        reporter.write()
+    return accumulator
+
 
 if __name__ == "__main__":
+    # argparse is not needed by the workers that import this module
+    import argparse
+
     # change this variable for different amount of games
     no_games = 10**3
     # change this variable if you don't want the elimination rules on
     elimination = True
+    # change this variable to cache the decisions of the AIs across
+    # the games (None turns the cache off)
+    decision_cache_size = 2**18
+    # change this variable for more or less frequent checkpoints
+    checkpoint_every = 10**4
+    # change this variable for more or less frequent metrics of the run
+    # into metrics.jsonl and metrics.prom (None turns them off)
+    metrics_interval = 10
+    # change this variable if you don't want the static caches of the
+    # map to be filled before the games (see caches.py)
+    warm_up_caches = True
+    # change this variable to limit the caches of the map, e.g.
+    # {"closest_tokens": ("lru", 4096)} (see caches.py)
+    cache_limits = {}
+    # change this variable to sample the race home from its exact
+    # distributions instead of playing it (see home_race.py), which is
+    # faster but gives different games for the same seeds
+    endgame_shortcut = False
+    # change this variable to play the games in this many threads of
+    # one process, which share the tables and caches of the map: on a
+    # free-threaded Python this uses all the cores with the memory of a
+    # single process (None plays the games in the main thread)
+    threads = None
+    # change this variable to write what happened to each AI (the
+    # money, robberies, flights, turns lost, ...) as extra columns of
+    # the results (see outcomes.py)
+    counters = False
 
-    t = time.time()  
-    fieldnames = ['Winner', 'Turns', 'Horseshoe winner', 'Star location']      
-    data = np.empty([no_games, len(fieldnames)], dtype=object)
-    for x in range(no_games):
-        random.seed(x)
-        game = initialize.init_AI(elimination)
-        while game.winner is None:
-            msg = game.play()
-        data[x] = [game.winner.name, game.turn_no, game.winner.has_horseshoe, game.tokens.index(7)]
-    with open("statistics.csv", "w", newline='') as file:
-        header_writer = csv.DictWriter(file, fieldnames)
-        header_writer.writeheader()
-        writer = csv.writer(file)
-        for row in data:
-            writer.writerow(row)
+    parser = argparse.ArgumentParser(description="Plays the AI games.")
+    parser.add_argument("--games", type=int, default=no_games,
+                        help="the amount of games")
+    parser.add_argument("--resume", action="store_true",
+                        help="continues the results file from its last checkpoint")
+    parser.add_argument("--output", default="statistics.csv",
+                        help="the file of the results")
+    args = parser.parse_args()
+
+    if decision_cache_size and threads:
+        AI_decisions.set_decision_cache(ShardedDecisionCache(decision_cache_size))
+    elif decision_cache_size:
+        AI_decisions.set_decision_cache(DecisionCache(decision_cache_size))
+    for name, (policy, maxsize) in cache_limits.items():
+        caches.configure(name, policy, maxsize)
+    if warm_up_caches:
+        caches.warm_up()
+    reporter = None
+    if metrics_interval:
+        reporter = MetricsReporter(args.games, interval=metrics_interval)
+    t = time.time()
+    accumulator = run_with_checkpoints(
+        args.output, args.games, elimination, checkpoint_every, args.resume, reporter,
+        endgame_shortcut, threads, counters
+    )
     print(f"It took {round(time.time()-t, 3)} seconds to run this.")
+    print(accumulator.report())
+    print(caches.report())
+    if AI_decisions.decision_cache is not None:
+        print(AI_decisions.decision_cache.report())
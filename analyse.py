@@ -1,40 +1,307 @@
-import pandas as pd
 import numpy as np
 import initialize
-import matplotlib.pyplot as plt
 import map
 import csv
+import outcomes
+
+# The confidence intervals of the statistics. All the statistics of
+# the analysis are functions of one table: how many games there were of
+# each winner, horseshoe win, star location and length of the game.
+# The games are counted into the table a chunk at a time, so that files
+# of 10**8 games fit in the memory. Resampling the games with
+# replacement (the bootstrap) is the same as drawing the table from the
+# multinomial distribution of its cells, so a resample takes the same
+# time for any amount of games, and a batch of resamples is one NumPy
+# call. The batches can be spread over processes.
+
+# the games can last at most this many turns (the turns are uint8)
+max_turns = 256
+
+
+def new_table(no_players=4):
+    """Returns an empty table of the counts of the games.
+
+    The axes are the winner (the index in the names), whether the
+    winner had a horseshoe, the star location and the turns.
+    """
+    return np.zeros([no_players, 2, map.no_tokens, max_turns], dtype=np.int64)
+
+
+def add_games(table, winners, horseshoes, locations, turns):
+    """Counts the games into the table.
+
+    Parameters
+    ----------
+    table : numpy array
+        The table from new_table.
+    winners, horseshoes, locations, turns : arrays of int
+        The columns of the games as integer codes, e.g. a chunk of the
+        results file.
+    """
+    columns = [np.asarray(a, dtype=np.int64) for a in (winners, horseshoes, locations, turns)]
+    codes = np.ravel_multi_index(columns, table.shape)
+    table += np.bincount(codes, minlength=table.size).reshape(table.shape)
+
+
+def mean_std(counts, values):
+    """Returns the mean and the standard deviation (ddof=1) of histograms.
+
+    The histograms are on the last axis of counts, and values are the
+    values of its bins.
+    """
+    n = counts.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (counts * values).sum(axis=-1) / n
+        variance = ((counts * values**2).sum(axis=-1) - n * mean**2) / (n - 1)
+    return mean, np.sqrt(np.maximum(variance, 0))
+
+
+def statistics(table):
+    """Returns the statistics of the games in the table.
+
+    The table can have leading axes (e.g. one for the bootstrap
+    resamples), which the statistics keep.
+
+    Returns
+    -------
+    dictionary
+        wins : the share of the games each player won
+        horseshoe : the share of the games won by a horseshoe
+        mean_turns, std_turns : the mean and the standard deviation of
+        the length of the games
+        location_mean_turns, location_std_turns : the same for each
+        location of the star
+        location_horseshoe : the share won by a horseshoe for each
+        location of the star
+        location_wins : the share each player won for each location of
+        the star (location, player)
+        turns_horseshoe : the share won by a horseshoe for each length
+        of the games
+    """
+    turns = np.arange(table.shape[-1])
+    games = table.sum(axis=(-4, -3, -2, -1))
+    # (..., location, turns)
+    by_location = table.sum(axis=(-4, -3))
+    location_games = by_location.sum(axis=-1)
+    stats = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats["wins"] = table.sum(axis=(-3, -2, -1)) / games[..., None]
+        stats["horseshoe"] = table[..., 1, :, :].sum(axis=(-3, -2, -1)) / games
+        stats["mean_turns"], stats["std_turns"] = mean_std(by_location.sum(axis=-2), turns)
+        stats["location_mean_turns"], stats["location_std_turns"] = mean_std(by_location, turns)
+        stats["location_horseshoe"] = (
+            table[..., 1, :, :].sum(axis=(-3, -1)) / location_games
+        )
+        stats["location_wins"] = (
+            np.moveaxis(table.sum(axis=(-3, -1)), -2, -1) / location_games[..., None]
+        )
+        by_turns = table.sum(axis=(-4, -2))
+        stats["turns_horseshoe"] = by_turns[..., 1, :] / by_turns.sum(axis=-2)
+    return stats
+
+
+def resample(table, resamples, seed):
+    """Returns the statistics of bootstrap resamples of the games.
+
+    Parameters
+    ----------
+    table : numpy array
+        The counts of the games.
+    resamples : int
+        How many resamples are drawn.
+    seed : int or numpy.random.SeedSequence
+        The seed of the resamples.
+    """
+    rng = np.random.default_rng(seed)
+    flat = table.ravel()
+    cells = np.flatnonzero(flat)
+    games = int(flat.sum())
+    samples = np.zeros([resamples, flat.size], dtype=np.int64)
+    # only the cells with games can have games in the resamples
+    samples[:, cells] = rng.multinomial(games, flat[cells] / games, size=resamples)
+    return statistics(samples.reshape((resamples,) + table.shape))
+
+
+def bootstrap(table, resamples=1000, seed=0, workers=None, batch=100, level=0.95):
+    """Returns the bootstrap percentile intervals of the statistics.
+
+    Parameters
+    ----------
+    table : numpy array
+        The counts of the games.
+    resamples : int, optional
+        How many resamples are drawn. Defaults to 1000.
+    seed : int, optional
+        The seed of the resamples. Defaults to 0.
+    workers : int, optional
+        The batches of the resamples are drawn in a process pool of
+        this size. Defaults to None, i.e. in this process.
+    batch : int, optional
+        How many resamples are drawn at once. Defaults to 100.
+    level : float, optional
+        The confidence level. Defaults to 0.95.
+
+    Returns
+    -------
+    dictionary
+        The lower and upper limits of each statistic (see statistics),
+        stacked on the first axis.
+    """
+    # only the turns that were played are resampled
+    width = table.shape[-1]
+    table = table[..., : np.flatnonzero(table.sum(axis=(0, 1, 2)))[-1] + 1]
+    sizes = [min(batch, resamples - x) for x in range(0, resamples, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers:
+        # the process pool is only imported for the workers
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(resample, [table] * len(sizes), sizes, seeds))
+    else:
+        parts = [resample(table, size, a) for size, a in zip(sizes, seeds)]
+    percentiles = [50 * (1 - level), 50 * (1 + level)]
+    intervals = {}
+    for key in parts[0]:
+        samples = np.concatenate([a[key] for a in parts])
+        intervals[key] = np.percentile(samples, percentiles, axis=0)
+    intervals["turns_horseshoe"] = pad(intervals["turns_horseshoe"], width)
+    return intervals
+
+
+def pad(values, length):
+    """Pads the last axis of values with NaN to the length."""
+    padded = np.full(values.shape[:-1] + (length,), np.nan)
+    padded[..., : values.shape[-1]] = values
+    return padded
+
+
+def wilson(share, n, z=1.96):
+    """Returns the Wilson score intervals of shares of n trials."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        center = (share + z**2 / (2 * n)) / (1 + z**2 / n)
+        half = z / (1 + z**2 / n) * np.sqrt(share * (1 - share) / n + z**2 / (4 * n**2))
+    return np.stack([center - half, center + half])
+
+
+def normal_mean(mean, std, n, z=1.96):
+    """Returns the normal intervals of means."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        half = z * std / np.sqrt(n)
+    return np.stack([mean - half, mean + half])
+
+
+def normal_std(std, n, z=1.96):
+    """Returns the normal intervals of standard deviations."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        half = z * std / np.sqrt(2 * (n - 1))
+    return np.stack([std - half, std + half])
+
+
+def analytic(table, z=1.96):
+    """Returns the analytic intervals of the statistics.
+
+    The shares have Wilson score intervals and the means and the
+    standard deviations normal intervals. The intervals are stacked on
+    the first axis like those of bootstrap.
+    """
+    stats = statistics(table)
+    games = table.sum()
+    location_games = table.sum(axis=(0, 1, 3))
+    turn_games = table.sum(axis=(0, 2)).sum(axis=0)
+    return {
+        "wins": wilson(stats["wins"], games, z),
+        "horseshoe": wilson(stats["horseshoe"], games, z),
+        "mean_turns": normal_mean(stats["mean_turns"], stats["std_turns"], games, z),
+        "std_turns": normal_std(stats["std_turns"], games, z),
+        "location_mean_turns": normal_mean(
+            stats["location_mean_turns"], stats["location_std_turns"], location_games, z
+        ),
+        "location_std_turns": normal_std(stats["location_std_turns"], location_games, z),
+        "location_horseshoe": wilson(stats["location_horseshoe"], location_games, z),
+        "location_wins": wilson(stats["location_wins"], location_games[:, None], z),
+        "turns_horseshoe": wilson(stats["turns_horseshoe"], turn_games, z),
+    }
+
+
+def interval(low, high, scale=1, digits=2):
+    """Returns the interval as a readable string."""
+    return f"{round(low * scale, digits)}-{round(high * scale, digits)}"
+
 
 if __name__ == "__main__":
-    df_ = pd.read_csv("statistics_big.csv")
-    df = df_.astype(dtype={'Winner':'<U4', 'Turns': np.uint8, 'Horseshoe winner': bool, 'Star location': np.uint8})
+    # pandas and matplotlib take long to import, so only when analysing
+    import pandas as pd
+    import matplotlib.pyplot as plt
+
+    filename = "statistics_big.csv"
+    # change this variable to read the file in smaller or bigger chunks
+    chunk_rows = 10**6
+    # change this variable for more or less bootstrap resamples
+    resamples = 1000
+    # change this variable to draw the resamples in a process pool of
+    # this size (None draws them in this process)
+    workers = None
+
     names = initialize.sample_names[:4]
-    victories = np.array([len(df[df['Winner'] == name]) for name in names]) / len(df)
-    horseshoes = len(df[df['Horseshoe winner']]) / len(df)
-    turns = df['Turns']
-    
+    codes = {name: x for x, name in enumerate(names)}
+    # the counters of the AIs, if the games were played with them
+    counter_columns = outcomes.columns(names)
+    counters = counter_columns[0] in pd.read_csv(filename, nrows=0).columns
+    dtypes = {'Winner': str, 'Turns': np.uint8, 'Horseshoe winner': bool, 'Star location': np.uint8}
+    if counters:
+        dtypes.update(outcomes.dtypes(names))
+        counter_sums = np.zeros(len(counter_columns))
+        counter_squares = np.zeros(len(counter_columns))
+
+    table = new_table(len(names))
+    for df in pd.read_csv(filename, dtype=dtypes, chunksize=chunk_rows):
+        add_games(
+            table, df['Winner'].map(codes).to_numpy(), df['Horseshoe winner'].to_numpy(),
+            df['Star location'].to_numpy(), df['Turns'].to_numpy()
+        )
+        if counters:
+            values = df[counter_columns].to_numpy(dtype=float)
+            counter_sums += values.sum(axis=0)
+            counter_squares += (values**2).sum(axis=0)
+    games = table.sum()
+    stats = statistics(table)
+    boot = bootstrap(table, resamples, workers=workers)
+    exact = analytic(table)
+
+    def ci(key, index=(), scale=100, digits=2):
+        """The analytic and the bootstrap intervals of a statistic."""
+        return (f"95 % CI {interval(*exact[key][(slice(None),) + index], scale, digits)}, "
+                + f"bootstrap {interval(*boot[key][(slice(None),) + index], scale, digits)}")
+
     for key, value in enumerate(names):
-        print(f"{value} won {round(victories[key]*100, 5)} % of the games.")
-    print(f"{horseshoes * 100} % of the games were won by finding a horseshoe.")
-    print(f"The game lasted on average {round(turns.mean(), 3)} and the standard deviation was {round(turns.std(), 3)}.")
+        print(f"{value} won {round(stats['wins'][key]*100, 5)} % of the games ({ci('wins', (key,))}).")
+    print(f"{stats['horseshoe'] * 100} % of the games were won by finding a horseshoe ({ci('horseshoe')}).")
+    print(f"The game lasted on average {round(stats['mean_turns'], 3)} ({ci('mean_turns', scale=1, digits=3)}) "
+          + f"and the standard deviation was {round(stats['std_turns'], 3)} ({ci('std_turns', scale=1, digits=3)}).")
+
+    if counters:
+        means = counter_sums / games
+        stds = np.sqrt(np.maximum(counter_squares / games - means**2, 0) * games / (games - 1))
+        lows, highs = normal_mean(means, stds, games)
+        for x, name in enumerate(names):
+            columns = range(x * len(outcomes.counter_names), (x + 1) * len(outcomes.counter_names))
+            print(f"{name} on average: " + ", ".join(
+                f"{counter} {round(means[c], 2)} ({interval(lows[c], highs[c])})"
+                for counter, c in zip(outcomes.counter_names, columns)
+            ) + ".")
 
-    df['Turns'].plot.hist(bins=range(2, df['Turns'].max()), align='mid')
+    # the games of each length
+    turn_counts = table.sum(axis=(0, 1, 2))
+    longest = np.flatnonzero(turn_counts)[-1] + 1
+    plt.hist(np.arange(longest), bins=range(2, longest), weights=turn_counts[:longest], align='mid')
     plt.xlabel("Number of turns")
     plt.show()
     plt.close()
 
-    turn_loc = np.zeros([30, 2])
-    horseshoe_loc = np.zeros(30)
-    winners_loc = np.zeros([30, 4])
-    for x in range(30):
-        data = df[df['Star location'] == x]
-        turn_data = data['Turns']
-        turn_loc[x] = [turn_data.mean(), turn_data.std()]
-        horseshoe_loc[x] = len(data[data['Horseshoe winner']]) / len(data)
-        winner_data = np.zeros(len(names))
-        for key, value in enumerate(names):
-            winner_data[key] = len(data[data['Winner'] == value])
-        winners_loc[x] = winner_data
+    turn_loc = np.stack([stats['location_mean_turns'], stats['location_std_turns']], axis=1)
+    horseshoe_loc = stats['location_horseshoe']
+    winners_loc = table.sum(axis=(1, 3)).T
 
     # plot: mean and std of turns per loc
     plt.plot(turn_loc[:, 0], turn_loc[:, 1], '.', label='Data')
@@ -50,7 +317,8 @@ if __name__ == "__main__":
 
     # horseshoe winners per loc
     for x in range(30):
-        print(f"In {map.full_names[x]} {round(100*horseshoe_loc[x], 2)} % were won by horseshoe winner.")
+        print(f"In {map.full_names[x]} {round(100*horseshoe_loc[x], 2)} % were won by horseshoe winner "
+              + f"({ci('location_horseshoe', (x,))}).")
     print(f"The average is {round(horseshoe_loc.mean() * 100, 2)} and the standard deviation {round(horseshoe_loc.std() * 100, 2)}")
 
     # plot: winners per loc
@@ -69,24 +337,16 @@ if __name__ == "__main__":
     plt.show()
     plt.close()
 
-    max_turns = df['Turns'].max()+1
-    turns_amount = np.zeros(max_turns)
-    horseshoe_turns = np.zeros(max_turns)
-    winners_turns = np.zeros([max_turns, 4])
-    for x in range(2, max_turns):
-        data = df[df['Turns'] == x]
-        if len(data) == 0:
-            continue
-        turns_amount[x] = len(data)
-        horseshoe_turns[x] = len(data[data['Horseshoe winner']]) / len(data)
-        winner_data = np.zeros(len(names))
-        for key, value in enumerate(names):
-            winner_data[key] = len(data[data['Winner'] == value])
-        winners_turns[x] = winner_data
+    turns_amount = turn_counts[:longest]
+    horseshoe_turns = stats['turns_horseshoe']
+    winners_turns = table.sum(axis=(1, 2)).T[:longest]
 
     # horseshoe winner per turn
-    for x in range(2, max_turns):
-        print(f"If the game lasted {x} turns which happened {int(turns_amount[x])} times, {round(horseshoe_turns[x]*100, 2)} % were won by horseshoe winner.")
+    for x in range(2, longest):
+        if turns_amount[x] == 0:
+            continue
+        print(f"If the game lasted {x} turns which happened {int(turns_amount[x])} times, {round(horseshoe_turns[x]*100, 2)} % were won by horseshoe winner "
+              + f"({ci('turns_horseshoe', (x,))}).")
 
     # plot: winners per turn
     winners = {}
@@ -94,9 +354,9 @@ if __name__ == "__main__":
         winners[value] = winners_turns[:, key]
     width = 0.4
     fig, ax = plt.subplots()
-    bottom = np.zeros(max_turns)
+    bottom = np.zeros(longest)
     for winner, win_count in winners.items():
-        p = ax.bar([x for x in range(max_turns)], win_count, width, label=winner, bottom=bottom)
+        p = ax.bar([x for x in range(longest)], win_count, width, label=winner, bottom=bottom)
         bottom += win_count
         ax.bar_label(p, label_type='center')
     ax.set_title('Number of victories by a player')
@@ -104,20 +364,18 @@ if __name__ == "__main__":
     plt.show()
     plt.close()
 
-    fieldnames = ['Location', 'Average turns', 'Standard deviation of turns', 'Horseshoe winners', 
-                  'Won by A', 'Won by B', 'Won by C', 'Won by D'] 
+    # every statistic is followed by its bootstrap interval
+    fieldnames = ['Location', 'Average turns', 'Low', 'High', 'Standard deviation of turns', 'Low', 'High',
+                  'Horseshoe winners', 'Low', 'High', 'Won by A', 'Low', 'High', 'Won by B', 'Low', 'High',
+                  'Won by C', 'Low', 'High', 'Won by D', 'Low', 'High']
     with open("location_stats.csv", "w", newline='') as file:
-        header_writer = csv.DictWriter(file, fieldnames)
-        header_writer.writeheader()
         writer = csv.writer(file)
+        writer.writerow(fieldnames)
         for x in range(30):
-            writer.writerow(
-                [map.full_names[x], 
-                 round(turn_loc[x][0], 2), 
-                 round(turn_loc[x][1], 2), 
-                 round(100*horseshoe_loc[x], 2), 
-                 round(winners_loc[x][0]/sum(winners_loc[x])*100, 2), 
-                 round(winners_loc[x][1]/sum(winners_loc[x])*100, 2), 
-                 round(winners_loc[x][2]/sum(winners_loc[x])*100, 2), 
-                 round(winners_loc[x][3]/sum(winners_loc[x])*100, 2)]
-                 )
+            row = [map.full_names[x]]
+            for key, index, scale in [('location_mean_turns', (x,), 1), ('location_std_turns', (x,), 1),
+                                      ('location_horseshoe', (x,), 100)] + \
+                    [('location_wins', (x, a), 100) for a in range(len(names))]:
+                row += [round(stats[key][index] * scale, 2)] + \
+                    [round(a * scale, 2) for a in boot[key][(slice(None),) + index]]
+            writer.writerow(row)
@@ -0,0 +1,377 @@
+import heapq
+import json
+import random
+import time
+import numpy as np
+
+# The boards are defined in JSON files (e.g. africa.json, the board of
+# the game, which map.py loads):
+#   name: the name of the board
+#   tokens: how many cities have a token, they are the first nodes
+#   nodes: [abb, full name] of each node, the crossroads have no full
+#   name and their abbs start with "nd"
+#   land, sea: abb -> the routes from it as [abb, steps]
+#   air: abb -> the abbs of the cities one can fly to
+#   beduin_squares, pirate_squares: the location strings of the
+#   ambushes and raids
+#
+# For the shortest paths the routes are compiled to CSR arrays (see
+# Board.graph): the edges of node i are indices[indptr[i]:indptr[i + 1]]
+# with the lengths weights[indptr[i]:indptr[i + 1]]. The distances are
+# then found with Dijkstra's algorithm on a heap, which also works for
+# synthetic boards with thousands of cities (see synthetic_board).
+
+
+class Board:
+    """
+    The nodes of a board and the routes between them
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        The name of the board.
+    tokens : int
+        How many cities have a token (the first nodes).
+    abbs : list of str
+        The abbreviations of the nodes.
+    full_names : list of str
+        The full names of the cities (not of the crossroads).
+    index : dictionary
+        The abb to its index in abbs.
+    land_routes, sea_routes : dictionaries
+        The abb to a list of (abb, steps).
+    air_routes : dictionary
+        The abb to a list of abbs.
+    beduin_squares, pirate_squares : list of str
+        The location strings of the ambushes and raids.
+    graphs : dictionary
+        The compiled CSR arrays of graph by (ways, sea_penalty).
+
+    Methods
+    -------
+    graph
+        Returns the routes of the ways of travel as CSR arrays
+    to_dict
+        Returns the board as the contents of a board file
+    """
+
+    def __init__(self, data):
+        """
+        Parameters
+        ----------
+        data : dictionary
+            The contents of a board file.
+        """
+        self.name = data["name"]
+        self.tokens = data["tokens"]
+        self.abbs = [a[0] for a in data["nodes"]]
+        self.full_names = [a[1] for a in data["nodes"] if a[1] is not None]
+        self.index = {a: x for x, a in enumerate(self.abbs)}
+        self.land_routes = {a: [tuple(b) for b in data["land"][a]] for a in self.abbs}
+        self.sea_routes = {a: [tuple(b) for b in data["sea"][a]] for a in self.abbs}
+        self.air_routes = {a: list(data["air"][a]) for a in self.abbs}
+        self.beduin_squares = list(data.get("beduin_squares", []))
+        self.pirate_squares = list(data.get("pirate_squares", []))
+        self.graphs = {}
+
+    def graph(self, ways=("land", "sea"), sea_penalty=1):
+        """Returns the routes of the ways of travel as CSR arrays.
+
+        Parameters
+        ----------
+        ways : tuple of str, optional
+            Which of land, sea and air are included. A flight is one
+            step long. Defaults to ("land", "sea").
+        sea_penalty : float, optional
+            The steps by sea are multiplied by this. Defaults to 1.
+
+        Returns
+        -------
+        indptr : array of int
+            The edges of the node i are from indptr[i] to indptr[i + 1].
+        indices : array of int
+            The node at the other end of each edge.
+        weights : array of float
+            The length of each edge.
+        """
+        key = (tuple(ways), sea_penalty)
+        if key not in self.graphs:
+            indptr = [0]
+            indices = []
+            weights = []
+            for abb in self.abbs:
+                if "land" in ways:
+                    for dest, steps in self.land_routes[abb]:
+                        indices.append(self.index[dest])
+                        weights.append(steps)
+                if "sea" in ways:
+                    for dest, steps in self.sea_routes[abb]:
+                        indices.append(self.index[dest])
+                        weights.append(sea_penalty * steps)
+                if "air" in ways:
+                    for dest in self.air_routes[abb]:
+                        indices.append(self.index[dest])
+                        weights.append(1)
+                indptr.append(len(indices))
+            self.graphs[key] = (
+                np.array(indptr, dtype=np.int64),
+                np.array(indices, dtype=np.int64),
+                np.array(weights, dtype=float),
+            )
+        return self.graphs[key]
+
+    def to_dict(self):
+        """Returns the board as the contents of a board file."""
+        names = self.full_names + [None] * (len(self.abbs) - len(self.full_names))
+        return {
+            "name": self.name,
+            "tokens": self.tokens,
+            "nodes": [[a, b] for a, b in zip(self.abbs, names)],
+            "land": {a: [list(b) for b in self.land_routes[a]] for a in self.abbs},
+            "sea": {a: [list(b) for b in self.sea_routes[a]] for a in self.abbs},
+            "air": {a: list(self.air_routes[a]) for a in self.abbs},
+            "beduin_squares": self.beduin_squares,
+            "pirate_squares": self.pirate_squares,
+        }
+
+
+def load_board(filename):
+    """Returns the Board of the board file."""
+    with open(filename) as file:
+        return Board(json.load(file))
+
+
+def save_board(filename, board):
+    """Writes the Board into a board file."""
+    with open(filename, "w") as file:
+        json.dump(board.to_dict(), file)
+
+
+def dijkstra(graph, source):
+    """Returns the distances from the source to all the nodes.
+
+    Parameters
+    ----------
+    graph : tuple of arrays
+        The CSR arrays from Board.graph.
+    source : int
+        The index of the node.
+
+    Returns
+    -------
+    array of float
+        The distance to each node, np.inf if it can't be reached.
+    """
+    indptr, indices, weights = (a.tolist() for a in graph)
+    dist = [np.inf] * (len(indptr) - 1)
+    dist[source] = 0
+    heap = [(0, source)]
+    while heap:
+        current_dist, current = heapq.heappop(heap)
+        if current_dist > dist[current]:
+            continue
+        for edge in range(indptr[current], indptr[current + 1]):
+            target = indices[edge]
+            new_dist = current_dist + weights[edge]
+            if new_dist < dist[target]:
+                dist[target] = new_dist
+                heapq.heappush(heap, (new_dist, target))
+    return np.array(dist)
+
+
+def scan_dijkstra(graph, source):
+    """Returns the same as dijkstra, but finds the next node by scanning.
+
+    This is how map.distances worked before the boards were compiled:
+    it takes time in proportion to the square of the amount of nodes.
+    It is kept for checking and benchmarking dijkstra.
+    """
+    indptr, indices, weights = (a.tolist() for a in graph)
+    size = len(indptr) - 1
+    dist = [np.inf] * size
+    visited = [False] * size
+    dist[source] = 0
+    for _ in range(size):
+        comp = np.inf
+        current = None
+        for x in range(size):
+            if not visited[x] and dist[x] < comp:
+                comp = dist[x]
+                current = x
+        if current is None:
+            break
+        visited[current] = True
+        for edge in range(indptr[current], indptr[current + 1]):
+            target = indices[edge]
+            dist[target] = min(dist[target], dist[current] + weights[edge])
+    return np.array(dist)
+
+
+def closest_tokens(board, unflipped, sea_penalty=1):
+    """Returns the sorted distances to the unflipped tokens from each node.
+
+    Like map.closest_tokens, but for any board. The sea lengths are
+    symmetric on the boards, so one search from each token is enough.
+    """
+    graph = board.graph(("land", "sea"), sea_penalty)
+    cities = np.array([dijkstra(graph, x) for x in range(len(unflipped)) if unflipped[x]])
+    return np.sort(cities.T)
+
+
+def synthetic_board(cities, seed=0, crossroads=0.1, ports=0.2, airports=0.05,
+                    neighbours=3, scale=60):
+    """Returns a random board, e.g. for benchmarks.
+
+    The nodes are random points on a square. Every node has a land
+    route to the closest of the nodes before it (so every node can be
+    reached by land) and to its neighbours closest ones. The ports are
+    connected by sea to their two closest ports and the airports to
+    two random airports. The length of a route is the distance of the
+    points in steps, where the side of the square is scale steps.
+
+    Parameters
+    ----------
+    cities : int
+        The amount of cities, all of them have a token.
+    seed : int, optional
+        The seed of the board. Defaults to 0.
+    crossroads : float, optional
+        The share of the crossroads of the amount of cities. Defaults
+        to 0.1.
+    ports, airports : float, optional
+        The share of the cities which are ports or airports. Default to
+        0.2 and 0.05.
+    neighbours : int, optional
+        How many closest nodes a node has land routes to. Defaults to 3.
+    scale : float, optional
+        How many steps the side of the square is long. Defaults to 60.
+
+    Returns
+    -------
+    Board
+    """
+    rng = random.Random(seed)
+    size = cities + int(cities * crossroads)
+    abbs = [f"C{x}" for x in range(cities)] + [f"nd{x}" for x in range(size - cities)]
+    points = np.array([(rng.random(), rng.random()) for _ in range(size)])
+    land = {a: {} for a in abbs}
+    sea = {a: {} for a in abbs}
+    air = {a: [] for a in abbs}
+
+    def steps(a, b):
+        return max(1, int(round(np.hypot(*(points[a] - points[b])) * scale)))
+
+    def connect(routes, a, b):
+        routes[abbs[a]][abbs[b]] = steps(a, b)
+        routes[abbs[b]][abbs[a]] = steps(a, b)
+
+    for x in range(size):
+        dists = np.hypot(*(points - points[x]).T)
+        if x > 0:
+            connect(land, x, int(np.argmin(dists[:x])))
+        dists[x] = np.inf
+        for y in np.argpartition(dists, neighbours)[:neighbours]:
+            connect(land, x, int(y))
+    port_nodes = rng.sample(range(cities), max(int(cities * ports), 3))
+    for x in port_nodes:
+        dists = np.hypot(*(points[port_nodes] - points[x]).T)
+        for y in np.argsort(dists)[1:3]:
+            connect(sea, x, port_nodes[y])
+    airport_nodes = rng.sample(range(cities), max(int(cities * airports), 3))
+    for x in airport_nodes:
+        for y in rng.sample([a for a in airport_nodes if a != x], 2):
+            if abbs[y] not in air[abbs[x]]:
+                air[abbs[x]].append(abbs[y])
+                air[abbs[y]].append(abbs[x])
+    return Board({
+        "name": f"Synthetic {cities} ({seed})",
+        "tokens": cities,
+        "nodes": [[a, f"City {x}" if x < cities else None] for x, a in enumerate(abbs)],
+        "land": {a: [[b, c] for b, c in land[a].items()] for a in abbs},
+        "sea": {a: [[b, c] for b, c in sea[a].items()] for a in abbs},
+        "air": air,
+    })
+
+
+def benchmark(sizes=(100, 1000, 5000), tokens=30, sources=20, reporter=print):
+    """Times the shortest paths and the AI scores on synthetic boards.
+
+    For each size: how long it takes to generate and compile the
+    board, one search by dijkstra (and by scan_dijkstra up to 2000
+    nodes), the distances to the closest tokens of tokens random
+    cities and the scores of 18 candidate locations by the AI (see
+    AI_decisions.token_scores).
+
+    Returns a list of dictionaries of the times in seconds.
+    """
+    # AI_decisions imports map, which loads its board with this module
+    import AI_decisions
+
+    results = []
+    for cities in sizes:
+        row = {"cities": cities}
+        t = time.perf_counter()
+        board = synthetic_board(cities)
+        row["generate"] = time.perf_counter() - t
+        t = time.perf_counter()
+        graph = board.graph(("land", "sea"), 1.75)
+        row["compile"] = time.perf_counter() - t
+        row["nodes"] = len(board.abbs)
+        row["edges"] = len(graph[1])
+        t = time.perf_counter()
+        for source in range(sources):
+            dijkstra(graph, source)
+        row["dijkstra"] = (time.perf_counter() - t) / sources
+        if len(board.abbs) <= 2000:
+            t = time.perf_counter()
+            for source in range(min(sources, 3)):
+                scan_dijkstra(graph, source)
+            row["scan_dijkstra"] = (time.perf_counter() - t) / min(sources, 3)
+        rng = random.Random(cities)
+        unflipped = [False] * len(board.abbs)
+        for x in rng.sample(range(cities), min(tokens, cities)):
+            unflipped[x] = True
+        t = time.perf_counter()
+        dists = closest_tokens(board, unflipped, 1.75)
+        row["closest_tokens"] = time.perf_counter() - t
+        candidates = np.array(rng.sample(range(len(board.abbs)), 18))
+        zeros = np.zeros(18, dtype=np.int64)
+        t = time.perf_counter()
+        for _ in range(100):
+            AI_decisions.lex_argmin(
+                AI_decisions.token_scores(candidates, candidates, zeros, zeros, dists)
+            )
+        row["ai_scores"] = (time.perf_counter() - t) / 100
+        results.append(row)
+        reporter(
+            f"{cities} cities ({row['nodes']} nodes, {row['edges']} edges): "
+            + f"generated in {round(row['generate'], 3)} s, "
+            + f"compiled in {round(row['compile'] * 1000, 2)} ms, "
+            + f"dijkstra {round(row['dijkstra'] * 1000, 3)} ms"
+            + (f" (scanning {round(row['scan_dijkstra'] * 1000, 3)} ms)"
+               if "scan_dijkstra" in row else "")
+            + f", closest tokens {round(row['closest_tokens'] * 1000, 2)} ms, "
+            + f"AI scores {round(row['ai_scores'] * 1e6, 1)} µs."
+        )
+    return results
+
+
+if __name__ == "__main__":
+    # argparse is not needed when map.py loads the board
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Makes and benchmarks boards.")
+    parser.add_argument("command", choices=["generate", "benchmark"])
+    parser.add_argument("--cities", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="the amount of cities of the board(s)")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the board")
+    parser.add_argument("--out", default="synthetic.json",
+                        help="the board file of generate")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        save_board(args.out, synthetic_board(args.cities[0], args.seed))
+    else:
+        benchmark(args.cities)
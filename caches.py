@@ -0,0 +1,220 @@
+import sys
+from functools import cache, lru_cache
+import numpy as np
+import map
+import AI_decisions
+import home_race
+import turn_probability
+
+# policies of a cached function:
+# unbounded: every result is kept (functools.cache)
+# lru: at most maxsize results, the least recently used is dropped
+# off: nothing is cached
+policies = ["unbounded", "lru", "off"]
+
+# name -> the settings of a cached function
+# module: where the function is
+# policy, maxsize: how it is cached now
+# sample: the arguments of a typical call, used for estimating the
+# memory of one entry
+# static: whether the possible arguments are known beforehand, so that
+# the cache can be warmed up
+# recursive: whether the function calls itself through the module, so
+# that it takes exponential time without a cache (see configure)
+# uncounted: the hits and misses made by the samples of stats, which
+# are not lookups of the games
+registry = {}
+
+# the smallest maxsize of lru for the recursive functions
+min_recursive_size = 6
+
+
+def register(module, name, sample, static=False, recursive=False):
+    """Adds a cached function of the module into the registry."""
+    function = getattr(module, name)
+    maxsize = function.cache_parameters()["maxsize"]
+    registry[name] = {
+        "module": module,
+        "policy": "unbounded" if maxsize is None else "lru",
+        "maxsize": maxsize,
+        "sample": sample,
+        "static": static,
+        "recursive": recursive,
+        "uncounted": (0, 0),
+        "entry_bytes": None,
+    }
+
+
+def original(name):
+    """Returns the uncached function."""
+    entry = registry[name]
+    return getattr(getattr(entry["module"], name), "__wrapped__", getattr(entry["module"], name))
+
+
+def configure(name, policy="lru", maxsize=128):
+    """Changes how the function is cached.
+
+    The function is wrapped again, so its cache is emptied and its
+    statistics are reset. Recursive functions (e.g. expected_time) call
+    themselves through the module, so they use the new cache too: they
+    can't be cached with off or with lru smaller than
+    min_recursive_size, as they would take exponential time.
+
+    Parameters
+    ----------
+    name : str
+        The name of the function in the registry.
+    policy : str, optional
+        One of unbounded, lru or off. Defaults to lru.
+    maxsize : int, optional
+        The maximum amount of results with the policy lru. Defaults to
+        128.
+
+    Raises
+    ------
+    ValueError
+        If the policy is unknown or too small for a recursive function.
+    """
+    if policy not in policies:
+        raise ValueError(f"The policy must be one of {policies}!")
+    entry = registry[name]
+    too_small = policy == "lru" and maxsize is not None and maxsize < min_recursive_size
+    if entry["recursive"] and (policy == "off" or too_small):
+        raise ValueError(
+            f"{name} is recursive, its policy must be unbounded or lru with maxsize "
+            + f"at least {min_recursive_size}!"
+        )
+    function = original(name)
+    if policy == "unbounded":
+        wrapped = cache(function)
+        maxsize = None
+    elif policy == "lru":
+        wrapped = lru_cache(maxsize)(function)
+    else:
+        wrapped = lru_cache(0)(function)
+        maxsize = 0
+    setattr(entry["module"], name, wrapped)
+    entry["uncounted"] = (0, 0)
+    entry["policy"] = policy
+    entry["maxsize"] = maxsize
+
+
+def approx_bytes(value):
+    """Returns roughly how many bytes the value takes in the memory."""
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.base is None else value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_bytes(a) + approx_bytes(b) for a, b in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approx_bytes(a) for a in value)
+    return size
+
+
+def sample_bytes(name):
+    """Returns roughly how many bytes one entry of the function takes.
+
+    The sample is calculated without the cache of the function. The
+    cached functions it calls (e.g. expected_time calls itself) still
+    count their hits and misses, which are put aside as uncounted, so
+    that stats only shows the lookups of the games.
+    """
+    before = {a: getattr(b["module"], a).cache_info() for a, b in registry.items()}
+    entry = registry[name]
+    size = approx_bytes(entry["sample"]) + approx_bytes(original(name)(*entry["sample"]))
+    for a, info in before.items():
+        after = getattr(registry[a]["module"], a).cache_info()
+        hits, misses = registry[a]["uncounted"]
+        registry[a]["uncounted"] = (
+            hits + after.hits - info.hits, misses + after.misses - info.misses
+        )
+    return size
+
+
+def stats():
+    """Returns the statistics of each cached function.
+
+    Returns
+    -------
+    dictionary
+        For each function: the policy, maxsize, whether it is static
+        (see warm_up), hits, misses, size
+        (the amount of cached results) and approximate bytes. The bytes
+        are estimated from one typical entry (the arguments and the
+        result of the sample call) times the size.
+    """
+    # the samples first, as they can make lookups in the other caches
+    for name, entry in registry.items():
+        if entry["entry_bytes"] is None:
+            entry["entry_bytes"] = sample_bytes(name)
+    result = {}
+    for name, entry in registry.items():
+        info = getattr(entry["module"], name).cache_info()
+        hits = info.hits - entry["uncounted"][0]
+        misses = info.misses - entry["uncounted"][1]
+        lookups = hits + misses
+        result[name] = {
+            "policy": entry["policy"],
+            "maxsize": entry["maxsize"],
+            "static": entry["static"],
+            "hits": hits,
+            "misses": misses,
+            "size": info.currsize,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "bytes": info.currsize * entry["entry_bytes"],
+        }
+    return result
+
+
+def report():
+    """Returns the statistics of the caches as a string."""
+    msg = "Caches:"
+    for name, value in stats().items():
+        msg += (
+            f"\n  {name} ({value['policy']}, maxsize {value['maxsize']}): "
+            + f"{value['size']} entries, ~{round(value['bytes'] / 1024, 1)} kB, "
+            + f"{value['hits']} hits, {value['misses']} misses, "
+            + f"hit rate {round(value['hit_rate'] * 100, 2)} %."
+        )
+    return msg
+
+
+def warm_up(max_money=5000):
+    """Fills the caches of the static functions beforehand.
+
+    These are the distances from every node, the expected amount of
+    dice rolls for the distances on the board, the expected times home
+    for the amounts of money up to max_money, the solved race home and
+    the probabilities to reach each node within some turns.
+    """
+    for function, args in warm_up_calls(max_money):
+        function(*args)
+
+
+def warm_up_calls(max_money=5000):
+    """Returns the calls of warm_up as (function, arguments).
+
+    E.g. speculate.py makes the calls a few at a time.
+    """
+    calls = [
+        (map.distances, (place, poor))
+        for poor in (False, True) for place in range(len(map.abbs))
+    ]
+    calls += [(map.expected, (n,)) for n in range(64)]
+    calls += [(map.expected_time, (money,)) for money in range(0, max_money + 1, 100)]
+    calls.append((home_race.solve, ()))
+    calls += [(turn_probability.reach_within, (poor,)) for poor in (False, True)]
+    return calls
+
+
+register(map, "distances", (0, False), static=True)
+# every other city has an unflipped token
+_sample_unflipped = tuple(
+    [x % 2 == 0 for x in range(map.no_tokens)] + [False] * (map.no_nodes - map.no_tokens)
+)
+register(map, "closest_tokens", (_sample_unflipped, False))
+register(map, "expected", (10,), static=True)
+register(map, "expected_time", (300,), static=True, recursive=True)
+register(AI_decisions, "route_arrays", ("Cai", "land"), static=True)
+register(AI_decisions, "_candidate", ("Cai-Egy-1-3",))
+register(turn_probability, "reach_within", (False,), static=True)
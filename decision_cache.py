@@ -0,0 +1,237 @@
+import threading
+from collections import OrderedDict
+
+# the policies how the cache decides which entry to drop when it is full
+policies = ["lru", "fifo"]
+
+
+class DecisionCache:
+    """
+    A bounded cache for the decisions of the AI
+
+    The functions choose_action_token, choose_token, choose_home and
+    choose_city in AI_decisions only depend on the candidate
+    locations, the unflipped tokens, the money (or rather a bucket of
+    it) and the AI type. The same situations repeat very often
+    especially in the beginning of the games, so the answers can be
+    looked up instead of calculated again.
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        How many decisions are stored at most.
+    policy : str
+        Which entry is dropped when the cache is full.
+        lru: the least recently used one
+        fifo: the oldest one
+    hits : int
+        How many times the decision was found in the cache.
+    misses : int
+        How many times the decision had to be calculated.
+    evictions : int
+        How many entries have been dropped because the cache was full.
+    kinds : dictionary
+        The hits and misses of each of the AI functions separately.
+
+    Methods
+    -------
+    get
+        Returns the stored decision or None
+    put
+        Stores the decision
+    stats
+        Returns the statistics of the cache
+    report
+        Returns the statistics as a readable string
+    clear
+        Empties the cache and resets the statistics
+    """
+
+    def __init__(self, maxsize=2**18, policy="lru"):
+        """
+        Parameters
+        ----------
+        maxsize : int, optional
+            How many decisions are stored at most. Defaults to 2**18.
+        policy : str, optional
+            Either lru or fifo. Defaults to lru.
+        """
+        if policy not in policies:
+            raise ValueError(f"The policy must be one of {policies}!")
+        if maxsize < 1:
+            raise ValueError("The maxsize must be at least 1!")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.kinds = {}
+
+    def get(self, key):
+        """Returns the decision for the key, None if it is not stored.
+
+        The first value of the key must be the name of the kind of
+        the decision (e.g. "token"), so that the statistics can be
+        kept for each kind separately.
+        """
+        value = self.data.get(key)
+        counts = self.kinds.get(key[0])
+        if counts is None:
+            counts = self.kinds[key[0]] = [0, 0]
+        if value is None:
+            self.misses += 1
+            counts[1] += 1
+            return None
+        self.hits += 1
+        counts[0] += 1
+        if self.policy == "lru":
+            self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Stores the decision and drops an old one if necessary."""
+        self.data[key] = value
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Returns a dictionary of the statistics of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "kinds": {
+                kind: {"hits": value[0], "misses": value[1]}
+                for kind, value in self.kinds.items()
+            },
+        }
+
+    def report(self):
+        """Returns the statistics of the cache as a string."""
+        stats = self.stats()
+        msg = (
+            f"Decision cache ({stats['policy']}): {stats['size']}/{stats['maxsize']} "
+            + f"entries, {stats['hits']} hits, {stats['misses']} misses, "
+            + f"{stats['evictions']} evictions, "
+            + f"hit rate {round(stats['hit_rate'] * 100, 2)} %."
+        )
+        for kind, value in stats["kinds"].items():
+            lookups = value["hits"] + value["misses"]
+            msg += (
+                f"\n  {kind}: {value['hits']} hits, {value['misses']} misses, "
+                + f"hit rate {round(value['hits'] / lookups * 100, 2)} %."
+            )
+        return msg
+
+    def clear(self):
+        """Empties the cache and resets the statistics."""
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.kinds = {}
+
+
+class ShardedDecisionCache(DecisionCache):
+    """
+    A DecisionCache that the threads of one process can share
+
+    A DecisionCache must not be used by several threads at once. This
+    one spreads the entries over shards by the hash of the key, and
+    every shard is a DecisionCache with a lock of its own. A lookup only
+    holds the lock of its shard, so the threads seldom wait for each
+    other, and all of them share the same decisions (and memory).
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        How many decisions are stored at most in all the shards.
+    policy : str
+        Which entry of a shard is dropped when the shard is full.
+    shards : list of DecisionCache
+        The shards, each with maxsize / len(shards) entries.
+    locks : list of threading.Lock
+        The lock of each shard.
+
+    Methods
+    -------
+    get
+        Returns the stored decision or None
+    put
+        Stores the decision
+    stats
+        Returns the statistics of all the shards together
+    report
+        Returns the statistics as a readable string
+    clear
+        Empties the cache and resets the statistics
+    """
+
+    def __init__(self, maxsize=2**18, policy="lru", shards=64):
+        """
+        Parameters
+        ----------
+        maxsize : int, optional
+            How many decisions are stored at most. Defaults to 2**18.
+        policy : str, optional
+            Either lru or fifo. Defaults to lru.
+        shards : int, optional
+            The amount of shards. Defaults to 64.
+        """
+        self.maxsize = maxsize
+        self.policy = policy
+        self.shards = [DecisionCache(max(maxsize // shards, 1), policy) for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    def get(self, key):
+        """Returns the decision for the key, None if it is not stored."""
+        x = hash(key) % len(self.shards)
+        with self.locks[x]:
+            return self.shards[x].get(key)
+
+    def put(self, key, value):
+        """Stores the decision and drops an old one if necessary."""
+        x = hash(key) % len(self.shards)
+        with self.locks[x]:
+            self.shards[x].put(key, value)
+
+    def stats(self):
+        """Returns a dictionary of the statistics of all the shards."""
+        result = {
+            "size": 0,
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "kinds": {},
+        }
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                stats = shard.stats()
+            for name in ("size", "hits", "misses", "evictions"):
+                result[name] += stats[name]
+            for kind, value in stats["kinds"].items():
+                total = result["kinds"].setdefault(kind, {"hits": 0, "misses": 0})
+                total["hits"] += value["hits"]
+                total["misses"] += value["misses"]
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+        return result
+
+    def clear(self):
+        """Empties the cache and resets the statistics."""
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard.clear()
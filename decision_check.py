@@ -0,0 +1,190 @@
+import argparse
+import random
+import re
+import sys
+import numpy as np
+import map
+import player
+import AI_decisions
+
+# The AIs score all their candidate locations at once with NumPy (see
+# the batch scoring of AI_decisions.py). This script checks that they
+# still choose what the original one-candidate-at-a-time scoring
+# chooses: the scalar choosers below are the original ones, and both
+# are asked the same random situations (a random location reached with
+# the game's own movement, random unflipped tokens, money, dice and
+# parameters of the AI). It exits with 1 if any choice differs.
+#
+# choose_home is not checked, as it is scored by the solved race home
+# (see home_race.py) and not by the original rule anymore.
+
+# the parameters of the AIs the situations are asked with
+sample_params = [
+    AI_decisions.default_params,
+    AI_decisions.AIParams(sea_coeff=2, air_coeffs=(3, 2, 1, 1, 0), sea_penalty=2.5),
+    AI_decisions.AIParams(sea_coeff=0.5, air_coeffs=(8, 5, 3, 0.5, 0), sea_penalty=1.25),
+]
+
+
+def closest_token_location(loc_str, unflipped, poor, sea_penalty=1.75):
+    """Returns the distances to the closest tokens from the location."""
+    # notice: regular min (not np.min) is utilized, so one needs to play around with the types
+    dists = map.closest_tokens(tuple(unflipped), poor, sea_penalty)
+    loc = re.split(r"-", loc_str)
+    if len(loc) == 1:
+        return [np.int64(a) for a in dists[map.abbs.index(loc[0])]]
+    first = dists[map.abbs.index(loc[0])] + int(loc[2])
+    second = dists[map.abbs.index(loc[1])] + int(loc[3])
+    return min(list(first), list(second))
+
+
+def scalar_choose_token(loc_strs, unflipped, money, params=AI_decisions.default_params):
+    """The original choose_token, one candidate at a time."""
+    poor = not money
+    dist_values = []
+    for loc in loc_strs:
+        dist_values.append(closest_token_location(loc, unflipped, poor, params.sea_penalty))
+    return dist_values.index(min(dist_values))
+
+
+def scalar_choose_action_token(options, loc, unflipped, money,
+                               params=AI_decisions.default_params):
+    """The original choose_action_token, one route at a time."""
+    poor = not money
+    if "flip" in options:
+        return "flip"
+    transport_times = [None] * len(options)
+    for index, value in enumerate(options):
+        compare = []
+        if value == "air":
+            for a in map.air_routes[loc]:
+                tester = np.array(
+                    closest_token_location(a, unflipped, money == 300, params.sea_penalty)
+                )
+                tester = tester + AI_decisions.air_coeff(money, params)
+                compare.append(list(tester))
+        else:
+            routes = map.land_routes[loc] if value == "land" else map.sea_routes[loc]
+            for a in routes:
+                new_loc = loc + "-" + a[0] + "-" + str(1) + "-" + str(a[1] - 1)
+                tester = np.array(
+                    closest_token_location(new_loc, unflipped, poor, params.sea_penalty)
+                )
+                if value == "sea":
+                    tester = tester + AI_decisions.sea_coeff(money, params)
+                compare.append(list(tester))
+        transport_times[index] = min(compare)
+    return options[transport_times.index(min(transport_times))]
+
+
+def scalar_choose_city(destination, loc_strs, unflipped, money):
+    """The original choose_city, one candidate at a time."""
+    if "Gol" in loc_strs:
+        return loc_strs.index("Gol")
+    if "Tow" in loc_strs:
+        return loc_strs.index("Tow")
+    dists = map.dist_gol if destination == "Gol" else map.dist_tow
+    cities = [len(re.split(r"-", a)) == 1 for a in loc_strs]
+    potentials = [
+        value and unflipped[map.abbs.index(loc_strs[index])]
+        for index, value in enumerate(cities)
+    ]
+    if sum(potentials) == 1:
+        return potentials.index(1)
+    distances = []
+    for a in loc_strs:
+        loc_str = re.split(r"-", a)
+        if sum(potentials) == 0:
+            if len(loc_str) == 1:  # a crossroads or a flipped city
+                distances.append(dists[map.abbs.index(loc_str[0])])
+            else:
+                dist_1 = dists[map.abbs.index(loc_str[0])] + int(loc_str[2])
+                dist_2 = dists[map.abbs.index(loc_str[1])] + int(loc_str[3])
+                distances.append(min(dist_1, dist_2))
+        elif len(loc_str) > 1 or not unflipped[map.abbs.index(a)]:
+            distances.append(np.inf)
+        else:
+            distances.append(dists[map.abbs.index(a)])
+    return distances.index(min(distances))
+
+
+def random_situation(rng):
+    """Returns a random situation of an AI.
+
+    The player is put on a random node and, half of the time, moved
+    from there with a random roll, so that it can be between the
+    nodes too. At least one token is left unflipped, as the original
+    choosers can't choose without any.
+    """
+    mover = player.Player("AI", 1, rng.choice(map.abbs), rng.randrange(0, 3100, 100))
+    if rng.random() < 0.5:
+        mover.offshore = bool(map.sea_routes.get(mover.location)) and rng.random() < 0.5
+        moves = mover.destination_options(rng.randint(1, 6))
+        if moves:
+            mover.location = rng.choice(moves)
+    unflipped = [rng.random() < rng.random() for _ in range(map.no_tokens)]
+    unflipped[rng.randrange(map.no_tokens)] = True
+    unflipped += [False] * (map.no_nodes - map.no_tokens)
+    return mover, unflipped, rng.choice(sample_params)
+
+
+def check(samples=20000, seed=0, reporter=print):
+    """Asks the batch and the scalar choosers the same random situations.
+
+    Parameters
+    ----------
+    samples : int, optional
+        How many situations are drawn. Defaults to 20000.
+    seed : int, optional
+        The seed of the situations. Defaults to 0.
+    reporter : callable, optional
+        Is told the result of each chooser. Defaults to print.
+
+    Returns
+    -------
+    bool: whether all the choices were the same
+    """
+    rng = random.Random(seed)
+    asked = {"choose_token": 0, "choose_action_token": 0, "choose_city": 0}
+    differ = dict.fromkeys(asked, 0)
+    for _ in range(samples):
+        mover, unflipped, params = random_situation(rng)
+        loc, money = mover.location, mover.money
+        if "-" not in loc and "nd" not in loc:
+            # the AIs only choose an action when there is no token to flip
+            options = [a for a in mover.turn_possibilities(unflipped) if a != "flip"]
+            if len(options) > 1:
+                asked["choose_action_token"] += 1
+                differ["choose_action_token"] += AI_decisions._choose_action_token(
+                    options, loc, unflipped, money, params
+                ) != scalar_choose_action_token(options, loc, unflipped, money, params)
+        options = mover.destination_options(rng.randint(1, 6))
+        if len(options) < 2:
+            continue
+        asked["choose_token"] += 1
+        differ["choose_token"] += AI_decisions._choose_token(
+            options, unflipped, money, params
+        ) != scalar_choose_token(options, unflipped, money, params)
+        destination = rng.choice(["Gol", "Tow"])
+        asked["choose_city"] += 1
+        differ["choose_city"] += AI_decisions._choose_city(
+            destination, options, unflipped, money
+        ) != scalar_choose_city(destination, options, unflipped, money)
+    for name in asked:
+        line = f"{name}: {differ[name]} of {asked[name]} choices differ"
+        if differ[name]:
+            line += " (FAIL)"
+        reporter(line)
+    return not any(differ.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Checks the batch scoring of the AIs against the original scoring."
+    )
+    parser.add_argument("--samples", type=int, default=20000,
+                        help="how many random situations are asked")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the situations")
+    args = parser.parse_args()
+
+    sys.exit(0 if check(args.samples, args.seed) else 1)
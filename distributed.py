@@ -0,0 +1,322 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from collections import deque
+import numpy as np
+import ai_game
+import AI_decisions
+from decision_cache import DecisionCache
+from metrics import MetricsReporter
+
+# The protocol: the messages are JSON objects, one per line.
+# worker -> coordinator:
+#   {"type": "lease"}: asks for a range of seeds
+#   {"type": "result", "chunk": i, "rows": [...]}: the rows of a lease
+# coordinator -> worker:
+#   {"type": "lease", "chunk": i, "start": s, "stop": e, "elimination": b}
+#   {"type": "wait"}: everything is leased, but not yet finished
+#   {"type": "ack"}: the result was received
+#   {"type": "done"}: all the games have been played
+
+
+class Coordinator:
+    """
+    Hands out seed ranges to the workers and collects the results
+
+    The games are split into chunks of seeds. A chunk is leased to one
+    worker at a time. If the worker disconnects (e.g. dies) or does
+    not return the result before the lease expires, the chunk is
+    leased again to another worker. As the games are deterministic
+    for a seed, it doesn't matter which worker plays a chunk, and the
+    merged results are the same as with ai_game.run_games.
+
+    ...
+
+    Attributes
+    ----------
+    chunks : list of tuples
+        The seed ranges (start, stop) of the chunks.
+    elimination : bool
+        Whether the elimination rules are on.
+    lease_timeout : float
+        In how many seconds a lease expires.
+    results : dictionary
+        The rows of each finished chunk.
+    finished : threading.Event
+        Is set when all the chunks are finished.
+
+    Methods
+    -------
+    lease
+        Returns the message with the next lease for the worker
+    complete
+        Stores the result of the chunk
+    release
+        Returns the leases of the worker that disconnected
+    data
+        Returns the merged results
+    serve
+        Serves the workers until all the games have been played
+    """
+
+    def __init__(self, no_games, chunk_size=10**3, elimination=True, lease_timeout=600):
+        """
+        Parameters
+        ----------
+        no_games : int
+            The games with the seeds 0, ..., no_games - 1 are played.
+        chunk_size : int, optional
+            How many seeds a lease has. Defaults to 1000.
+        elimination : bool, optional
+            Whether the elimination rules are on. Defaults to True.
+        lease_timeout : float, optional
+            In how many seconds a lease expires. Defaults to 600.
+        """
+        self.chunks = [
+            (start, min(start + chunk_size, no_games))
+            for start in range(0, no_games, chunk_size)
+        ]
+        self.elimination = elimination
+        self.lease_timeout = lease_timeout
+        self.todo = deque(range(len(self.chunks)))
+        # chunk -> (worker, deadline)
+        self.leases = {}
+        self.results = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        if not self.chunks:
+            self.finished.set()
+
+    def lease(self, worker):
+        """Returns the message with the next lease for the worker."""
+        with self.lock:
+            now = time.monotonic()
+            for chunk, (_, deadline) in list(self.leases.items()):
+                if deadline < now:
+                    del self.leases[chunk]
+                    self.todo.append(chunk)
+            while self.todo:
+                chunk = self.todo.popleft()
+                # a late result might have finished an expired chunk
+                if chunk in self.results or chunk in self.leases:
+                    continue
+                self.leases[chunk] = (worker, now + self.lease_timeout)
+                start, stop = self.chunks[chunk]
+                return {
+                    "type": "lease",
+                    "chunk": chunk,
+                    "start": start,
+                    "stop": stop,
+                    "elimination": self.elimination,
+                }
+            if self.finished.is_set():
+                return {"type": "done"}
+            return {"type": "wait"}
+
+    def complete(self, chunk, rows):
+        """Stores the result of the chunk, a duplicate is ignored."""
+        with self.lock:
+            self.leases.pop(chunk, None)
+            start, stop = self.chunks[chunk]
+            if chunk not in self.results and len(rows) == stop - start:
+                self.results[chunk] = rows
+            elif chunk not in self.results:
+                self.todo.append(chunk)
+            if len(self.results) == len(self.chunks):
+                self.finished.set()
+
+    def release(self, worker):
+        """Returns the leases of the worker to the front of the queue."""
+        with self.lock:
+            for chunk, (owner, _) in list(self.leases.items()):
+                if owner == worker:
+                    del self.leases[chunk]
+                    self.todo.appendleft(chunk)
+
+    def data(self):
+        """Returns the merged results in the order of the seeds."""
+        rows = [row for chunk in range(len(self.chunks)) for row in self.results[chunk]]
+        data = np.empty([len(rows), len(ai_game.fieldnames)], dtype=object)
+        for x, row in enumerate(rows):
+            data[x] = row
+        return data
+
+    def serve(self, host="", port=0, ready=None):
+        """Serves the workers until all the games have been played.
+
+        Parameters
+        ----------
+        host : str, optional
+            The address to listen to. Defaults to all the addresses.
+        port : int, optional
+            The port to listen to. Defaults to 0, i.e. any free port.
+        ready : callable, optional
+            Is called with the address of the server, when the server
+            is listening.
+        """
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                worker = uuid.uuid4().hex
+                try:
+                    for line in self.rfile:
+                        message = json.loads(line)
+                        if message["type"] == "lease":
+                            reply = coordinator.lease(worker)
+                        else:
+                            coordinator.complete(message["chunk"], message["rows"])
+                            reply = {"type": "ack"}
+                        self.wfile.write((json.dumps(reply) + "\n").encode())
+                        if reply["type"] == "done":
+                            break
+                except (ConnectionError, ValueError):
+                    pass
+                finally:
+                    coordinator.release(worker)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+            server.daemon_threads = True
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            if ready is not None:
+                ready(server.server_address)
+            self.finished.wait()
+            # give the workers a moment to hear that everything is done
+            time.sleep(0.5)
+            server.shutdown()
+
+
+def run_worker(host, port, decision_cache_size=2**18, poll=0.5, metrics_interval=None):
+    """Plays the leased games until the coordinator has no more of them.
+
+    With metrics_interval the worker writes its metrics into the files
+    metrics-<pid>.jsonl and metrics-<pid>.prom (see metrics.py). If the
+    coordinator closes the connection while the worker is waiting for
+    the last games, the worker ends normally.
+    Returns how many games this worker played.
+    """
+    if decision_cache_size:
+        AI_decisions.set_decision_cache(DecisionCache(decision_cache_size))
+    reporter = None
+    if metrics_interval:
+        reporter = MetricsReporter(
+            None, f"metrics-{os.getpid()}.jsonl", f"metrics-{os.getpid()}.prom",
+            metrics_interval,
+        )
+    played = 0
+    with socket.create_connection((host, port)) as sock:
+        file = sock.makefile("rw")
+
+        def request(message):
+            file.write(json.dumps(message) + "\n")
+            file.flush()
+            line = file.readline()
+            if not line:
+                raise ConnectionError("The coordinator closed the connection.")
+            return json.loads(line)
+
+        waiting = False
+        while True:
+            try:
+                reply = request({"type": "lease"})
+            except ConnectionError:
+                # the coordinator shuts down soon after the last result,
+                # so a waiting worker may find the connection closed
+                if waiting:
+                    break
+                raise
+            if reply["type"] == "done":
+                break
+            waiting = reply["type"] == "wait"
+            if waiting:
+                time.sleep(poll)
+                continue
+            data = ai_game.run_games(
+                reply["start"], reply["stop"], reply["elimination"], reporter
+            )
+            request({"type": "result", "chunk": reply["chunk"], "rows": data.tolist()})
+            played += len(data)
+    return played
+
+
+def _worker_process(host, port):
+    """The target of a local worker process."""
+    try:
+        run_worker(host, port)
+    except ConnectionError:
+        pass
+
+
+def run_local(no_games, workers=2, chunk_size=10**3, elimination=True, lease_timeout=600):
+    """Runs a coordinator and local worker processes on this machine.
+
+    This stands in for several hosts when testing. Returns the
+    coordinator after all the games have been played.
+    """
+    coordinator = Coordinator(no_games, chunk_size, elimination, lease_timeout)
+    processes = []
+
+    def start_workers(address):
+        for _ in range(workers):
+            process = multiprocessing.Process(
+                target=_worker_process, args=("127.0.0.1", address[1]), daemon=True
+            )
+            process.start()
+            processes.append(process)
+
+    coordinator.serve("127.0.0.1", 0, start_workers)
+    for process in processes:
+        process.join()
+    return coordinator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plays the AI games on several hosts."
+    )
+    parser.add_argument("role", choices=["coordinator", "worker", "local"])
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="the address of the coordinator")
+    parser.add_argument("--port", type=int, default=5555,
+                        help="the port of the coordinator")
+    parser.add_argument("--games", type=int, default=10**3,
+                        help="the amount of games")
+    parser.add_argument("--chunk", type=int, default=10**3,
+                        help="the amount of seeds in a lease")
+    parser.add_argument("--no-elimination", action="store_true",
+                        help="turns the elimination rules off")
+    parser.add_argument("--lease-timeout", type=float, default=600,
+                        help="in how many seconds a lease expires")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="the amount of local workers (local only)")
+    parser.add_argument("--output", default="statistics.csv",
+                        help="the file of the results")
+    parser.add_argument("--metrics", type=float, default=None,
+                        help="seconds between the metrics of a worker (worker only)")
+    args = parser.parse_args()
+
+    t = time.time()
+    if args.role == "worker":
+        played = run_worker(args.host, args.port, metrics_interval=args.metrics)
+        print(f"Played {played} games.")
+    else:
+        if args.role == "coordinator":
+            coordinator = Coordinator(
+                args.games, args.chunk, not args.no_elimination, args.lease_timeout
+            )
+            coordinator.serve("", args.port)
+        else:
+            coordinator = run_local(
+                args.games, args.workers, args.chunk,
+                not args.no_elimination, args.lease_timeout
+            )
+        ai_game.write_results(args.output, coordinator.data())
+    print(f"It took {round(time.time()-t, 3)} seconds to run this.")
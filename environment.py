@@ -0,0 +1,477 @@
+import argparse
+import random
+import time
+import numpy as np
+import initialize
+import map
+import home_race
+import vector_game
+
+# A step/observation API for driving one player of many AI games from
+# the outside, e.g. by a learning AI. The environment steps n games
+# together: at every decision of the player (the learner) the games
+# return numeric observations, a mask of the legal actions and the
+# rewards, and a policy decides for all the games in one batched call.
+#
+# The games are played by vector_game.py, which plays a turn of all the
+# games with the same NumPy operations, also the turns of the other AIs
+# between the decisions of the learner. A step costs about the same for
+# one game as for a few hundred, so with thousands of games the
+# environment makes some 40000 steps per second on one core, about ten
+# times as many as a game at a time (`python environment.py` measures
+# it). The rest of a step is mostly the turns of the slowest games,
+# which are played after the others are done. The games are the same as
+# those of game.py: learner_game plays the learner one game at a time
+# with the Game, and `python environment.py` also checks that both
+# make the same games with the same decisions.
+#
+# There are two kinds of decisions:
+# 0 action: the actions are the indices of kinds_of_action
+# 1 move: the actions are the indices of the destinations (options)
+# Flipping a token on arrival is not a decision: like the AIs, the
+# learner flips it if it has money and no Star of Africa or horseshoe.
+
+kinds_of_action = ["flip", "land", "sea", "air"]
+# the most destinations a roll of the dice (or a flight) can have on
+# the board (see home_race.board)
+max_options = max(len(a) for a in home_race.board()[2].values())
+# the other players of a game, by the rules
+max_others = initialize.max_players - 1
+
+
+def location_index(loc):
+    """Returns the index of the location string (see home_race.board)."""
+    return home_race.board()[1][loc]
+
+
+def learner_turn(game, player):
+    """Plays a turn of the learner, yields at its decisions.
+
+    This follows Game.run_turn_AI and Game.AI_movement_decision, but
+    the decisions are yielded as (kind, options) and the index of the
+    chosen option is sent back.
+    """
+    if player.special in (2, 3):
+        game.stuck(player)
+        return
+    if player.special >= 4:
+        game.slave(player)
+        return
+    if player.special == 1:
+        decision = "sea_forced"
+    else:
+        possible = player.turn_possibilities(game.unflipped)
+        if len(possible) == 1:
+            decision = possible[0]
+        else:
+            decision = possible[(yield 0, possible)]
+        # a player already on the sea has paid for the trip
+        if decision == "sea" and not player.offshore:
+            player.offshore = True
+            if player.money == 0:
+                player.special = 1
+                decision = "sea_forced"
+            else:
+                player.money -= 100
+        elif decision == "air":
+            player.money -= 300
+    if decision == "flip":
+        game.try_flip(player)
+        return
+    if decision == "air":
+        options = map.air_routes[player.location]
+    elif decision == "sea_forced":
+        options = player.destination_options(2)
+    else:
+        options = player.destination_options(game.roll())
+    choice = 0
+    if len(options) > 1:
+        choice = yield 1, options
+    game.move(player, options[choice])
+
+
+def learner_game(game, learner):
+    """Plays the game one turn at a time, yields at the decisions of the learner.
+
+    This follows Game.play, except that the turns of the learner are
+    played by learner_turn. The game ends when there is a winner or
+    the learner is eliminated. VectorEnv plays the same games.
+    """
+    while game.winner is None and learner in game.players:
+        if game.turn == len(game.players):
+            game.turn = 0
+            game.turn_no += 1
+        active = game.players[game.turn]
+        if active is not learner:
+            game.play()
+            continue
+        players = game.players
+        yield from learner_turn(game, active)
+        if game.players is not players:
+            game.turn = game.players.index(active)
+        if active.location in ("Tan", "Cai") and (active.has_star or active.has_horseshoe):
+            game.winner = active
+        game.turn += 1
+
+
+class VectorEnv:
+    """
+    Steps many AI games together for an outside policy
+
+    Every game has the AIs of initialize.init_AI, and one of them (the
+    learner) is played by the policy. Each game has its own random
+    generator, so a game is the same for the same seed and actions, no
+    matter which other games are stepped with it, and the same as the
+    game of game.py (see learner_game). A finished game is started
+    again with the next seed.
+
+    ...
+
+    Attributes
+    ----------
+    n : int
+        The amount of games.
+    games : VectorGames
+        The current games (see vector_game.py).
+    seeds : array of int
+        The seed of each current game.
+    seats : array of int
+        The seat of the learner in each game.
+    kind : array of int
+        The kind of the current decision of each game (0 action,
+        1 move).
+    possible : array of bool
+        (n, kinds_of_action) the actions of the decisions of kind 0.
+    options, counts : arrays of int
+        (n, max_options) the destinations of the decisions of kind 1
+        (see location_index), and their amounts.
+    decisions : array of int
+        The way of travel of the decisions of kind 1 (see
+        vector_game.py).
+
+    Methods
+    -------
+    reset
+        Starts all the games and returns the first observations
+    step
+        Makes the decisions and returns the next observations
+    observe
+        Returns the observations of the current decisions
+    """
+
+    def __init__(self, n, seed=0, elimination=True, ai_types=None, learner=0):
+        """
+        Parameters
+        ----------
+        n : int
+            The amount of games.
+        seed : int, optional
+            The seed of the first game, the next games have the next
+            seeds. Defaults to 0.
+        elimination : bool, optional
+            Whether the elimination rules are on. Defaults to True.
+        ai_types : list of int, optional
+            The types of the AIs (see initialize.init_AI).
+        learner : int, optional
+            The index of the learner in ai_types. Defaults to 0.
+        """
+        self.games = vector_game.VectorGames(n, elimination, ai_types)
+        if not 0 <= learner < len(self.games.ai_types):
+            raise ValueError("The learner must be one of the AIs!")
+        self.n = n
+        self.next_seed = seed
+        self.learner = learner
+        self.seeds = np.zeros(n, dtype=np.int64)
+        self.seats = np.zeros(n, dtype=np.int64)
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.possible = np.zeros((n, len(kinds_of_action)), dtype=bool)
+        self.options = np.zeros((n, max_options), dtype=np.int64)
+        self.counts = np.zeros(n, dtype=np.int64)
+        self.decisions = np.zeros(n, dtype=np.int64)
+
+    def _start(self, rows):
+        """Starts the games of the rows with the next seeds."""
+        seeds = self.next_seed + np.arange(len(rows))
+        self.next_seed += len(rows)
+        self.seeds[rows] = seeds
+        self.games.start(rows, seeds)
+        self.seats[rows] = (self.games.seat_ai[rows] == self.learner).argmax(axis=1)
+
+    def _act(self, rows, seats, decisions):
+        """Flips or travels by the decisions, returns which have to choose.
+
+        The rows with more than one destination wait for a decision of
+        kind 1, the others end the turn.
+        """
+        games = self.games
+        flip = decisions == vector_game.FLIP
+        games.try_flip(rows[flip], seats[flip])
+        travel = np.flatnonzero(~flip)
+        options, counts = games.options(rows[travel], seats[travel], decisions[travel])
+        many = counts > 1
+        waiting = travel[many]
+        self.kind[rows[waiting]] = 1
+        self.options[rows[waiting]] = 0
+        self.options[rows[waiting], : options.shape[1]] = options[many]
+        self.counts[rows[waiting]] = counts[many]
+        self.decisions[rows[waiting]] = decisions[waiting]
+        single = travel[~many]
+        games.move(rows[single], seats[single], options[~many, 0])
+        games.end_turn(np.delete(rows, waiting), np.delete(seats, waiting))
+        return np.isin(np.arange(len(rows)), waiting)
+
+    def _learner_turns(self, rows):
+        """Plays the turns of the learners up to a decision, see learner_turn.
+
+        Returns which rows wait for a decision.
+        """
+        games = self.games
+        seats = self.seats[rows]
+        special = games.special[rows, seats]
+        stuck = (special == 2) | (special == 3)
+        games.stuck(rows[stuck], seats[stuck])
+        slave = special >= 4
+        games.slave(rows[slave], seats[slave])
+        games.end_turn(rows[stuck | slave], seats[stuck | slave])
+        waiting = np.zeros(len(rows), dtype=bool)
+        free = np.flatnonzero(special == 0)
+        possible = games.possible(rows[free], seats[free])
+        many = possible.sum(axis=1) > 1
+        self.kind[rows[free[many]]] = 0
+        self.possible[rows[free[many]]] = possible[many]
+        waiting[free[many]] = True
+        single = free[~many]
+        decisions = np.where(possible[~many, vector_game.LAND], vector_game.LAND, vector_game.SEA)
+        decisions = games.pay(rows[single], seats[single], decisions)
+        acting = np.concatenate([single, np.flatnonzero(special == 1)])
+        decisions = np.concatenate(
+            [decisions, np.full(len(acting) - len(single), vector_game.FORCED)]
+        )
+        waiting[acting] = self._act(rows[acting], seats[acting], decisions)
+        return waiting
+
+    def _advance(self, rows):
+        """Plays the games of the rows to the next decisions of the learners.
+
+        Returns the rows of the games that ended.
+        """
+        games = self.games
+        ended = [rows[:0]]
+        while len(rows):
+            over = (games.winner[rows] >= 0) | ~games.alive[rows, self.seats[rows]]
+            ended.append(rows[over])
+            rows = rows[~over]
+            seats = games.begin_turn(rows)
+            learner = seats == self.seats[rows]
+            others = ~learner
+            games.play_turns(rows[others], seats[others])
+            games.end_turn(rows[others], seats[others])
+            turns = rows[learner]
+            rows = np.concatenate([rows[others], turns[~self._learner_turns(turns)]])
+        return np.sort(np.concatenate(ended))
+
+    def reset(self):
+        """Starts all the games and returns the first observations."""
+        rows = np.arange(self.n)
+        while len(rows):
+            self._start(rows)
+            rows = self._advance(rows)
+        return self.observe()
+
+    def step(self, actions):
+        """Makes the decisions and returns the next observations.
+
+        Parameters
+        ----------
+        actions : array of int
+            The chosen index of each game, it must be legal (see the
+            mask of observe).
+
+        Returns
+        -------
+        observations : dictionary
+            See observe. The observations of the finished games are
+            from their new games.
+        rewards : array of float
+            1 if the learner won the game, -1 if it lost, else 0.
+        dones : array of bool
+            Whether the game ended.
+        info : dictionary
+            seeds: the seeds of the finished games (-1 if not
+            finished), turns: the length of the finished games.
+        """
+        games = self.games
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = np.arange(self.n)
+        if actions.shape != (self.n,) or not (
+            (actions >= 0) & (actions < max_options)
+        ).all() or not self._mask()[rows, actions].all():
+            raise ValueError("The actions must be legal (see the mask of observe)!")
+        seats = self.seats
+        move = self.kind == 1
+        games.move(rows[move], seats[move], self.options[rows[move], actions[move]])
+        games.end_turn(rows[move], seats[move])
+        action = np.flatnonzero(~move)
+        decisions = games.pay(rows[action], seats[action], actions[action])
+        waiting = self._act(rows[action], seats[action], decisions)
+        ended = self._advance(np.delete(rows, action[waiting]))
+        rewards = np.zeros(self.n)
+        dones = np.zeros(self.n, dtype=bool)
+        seeds = np.full(self.n, -1, dtype=np.int64)
+        turns = np.zeros(self.n, dtype=np.int64)
+        while len(ended):
+            rewards[ended] = np.where(games.winner[ended] == self.seats[ended], 1.0, -1.0)
+            dones[ended] = True
+            seeds[ended] = self.seeds[ended]
+            turns[ended] = games.turn_no[ended]
+            self._start(ended)
+            ended = self._advance(ended)
+        return self.observe(), rewards, dones, {"seeds": seeds, "turns": turns}
+
+    def _mask(self):
+        """Returns the legal actions of the current decisions."""
+        mask = np.zeros((self.n, max_options), dtype=bool)
+        action = self.kind == 0
+        mask[action, : len(kinds_of_action)] = self.possible[action]
+        mask[~action] = np.arange(max_options) < self.counts[~action, None]
+        return mask
+
+    def observe(self):
+        """Returns the observations of the current decisions.
+
+        Returns
+        -------
+        dictionary of arrays, the first axis is the game
+            kind: the kind of the decision (0 action, 1 move).
+            mask: (n, max_options) the legal actions.
+            options: (n, max_options) the index of each destination
+            (see location_index), -1 if not a destination.
+            location: the index of the location of the learner.
+            money, special, offshore, has_star, has_horseshoe: of the
+            learner.
+            others: (n, max_others) the locations of the other players
+            in the order of the turns after the learner, -1 if there is
+            no such player.
+            unflipped: (n, map.no_nodes) whether the node has an
+            unflipped token.
+            star_found, horseshoes_found, cape_visit, turn_no: of the
+            game.
+        """
+        games = self.games
+        rows = np.arange(self.n)
+        mask = self._mask()
+        location = games.location[rows, self.seats]
+        # a player who paid for the sea (or has to go by sea) is on it
+        # before moving
+        offshore = games.tables["at_sea"][location] | (
+            (self.kind == 1)
+            & np.isin(self.decisions, [vector_game.SEA, vector_game.FORCED])
+        )
+        players = len(games.ai_types)
+        seats = (self.seats[:, None] + 1 + np.arange(players - 1)) % players
+        alive = games.alive[rows[:, None], seats]
+        order = np.argsort(~alive, axis=1, kind="stable")
+        seats = np.take_along_axis(seats, order, axis=1)
+        others = np.full((self.n, max_others), -1, dtype=np.int64)
+        others[:, : players - 1] = np.where(
+            np.take_along_axis(alive, order, axis=1), games.location[rows[:, None], seats], -1
+        )
+        return {
+            "kind": self.kind.copy(),
+            "mask": mask,
+            "options": np.where(mask & (self.kind == 1)[:, None], self.options, -1),
+            "location": location,
+            "money": games.money[rows, self.seats],
+            "special": games.special[rows, self.seats],
+            "offshore": offshore,
+            "has_star": games.has_star[rows, self.seats],
+            "has_horseshoe": games.has_horseshoe[rows, self.seats],
+            "others": others,
+            "unflipped": games.unflipped.copy(),
+            "star_found": games.star_found.copy(),
+            "horseshoes_found": games.horseshoes_found.astype(np.int8),
+            "cape_visit": games.cape_visit.copy(),
+            "turn_no": games.turn_no.copy(),
+        }
+
+
+def fixed_choice(turn_no, location, money, legal):
+    """A policy for the check: the legal action number (...) % legal."""
+    return (7 * turn_no + location + money // 100) % legal
+
+
+def check(n=200, steps=400, elimination=True, ai_types=None, learner=0):
+    """Steps the environment, returns the seeds that differ from game.py.
+
+    The learner plays by fixed_choice in both, and the rewards and the
+    lengths of the finished games are compared with learner_game.
+    """
+    env = VectorEnv(n, 0, elimination, ai_types, learner)
+    obs = env.reset()
+    results = {}
+    for _ in range(steps):
+        choice = fixed_choice(
+            obs["turn_no"], obs["location"], obs["money"], obs["mask"].sum(axis=1)
+        )
+        # the choice-th legal action of each game
+        actions = np.argmax(np.cumsum(obs["mask"], axis=1) > choice[:, None], axis=1)
+        obs, rewards, dones, info = env.step(actions)
+        for x in np.flatnonzero(dones):
+            results[int(info["seeds"][x])] = (rewards[x], int(info["turns"][x]))
+    differ = []
+    name = initialize.player_name(learner)
+    for seed, result in sorted(results.items()):
+        game = initialize.init_AI(elimination, ai_types, rng=random.Random(seed))
+        player = next(a for a in game.players if a.name == name)
+        run = learner_game(game, player)
+        try:
+            kind, options = next(run)
+            while True:
+                choice = fixed_choice(
+                    game.turn_no, location_index(player.location), player.money, len(options)
+                )
+                kind, options = run.send(int(choice))
+        except StopIteration:
+            pass
+        reward = 1.0 if game.winner is player else -1.0
+        if (reward, game.turn_no) != result:
+            differ.append(seed)
+    return differ, len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures the steps per second of VectorEnv and checks it against game.py."
+    )
+    parser.add_argument("--games", type=int, default=4096, help="how many games at once")
+    parser.add_argument("--steps", type=int, default=200, help="how many steps")
+    parser.add_argument(
+        "--check", type=int, default=200,
+        help="how many games to check against game.py (0 for none)",
+    )
+    args = parser.parse_args()
+    env = VectorEnv(args.games)
+    rng = np.random.default_rng(0)
+    obs = env.reset()
+    finished = 0
+    t = time.perf_counter()
+    for _ in range(args.steps):
+        # a random legal action
+        actions = (rng.random(obs["mask"].shape) * obs["mask"]).argmax(axis=1)
+        obs, rewards, dones, info = env.step(actions)
+        finished += dones.sum()
+    elapsed = time.perf_counter() - t
+    print(
+        f"{args.games * args.steps / elapsed:.0f} steps per second with {args.games} games "
+        f"({finished} games finished)"
+    )
+    if args.check:
+        differ, checked = check(args.check, args.steps)
+        if differ:
+            print(f"{len(differ)} of {checked} games differ from game.py, e.g. {differ[:10]}")
+            raise SystemExit(1)
+        print(f"All the {checked} finished games are the same as in game.py.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 import random
 import time
 import re
-import map, player, AI_decisions
+import map, player, AI_decisions, home_race, outcomes
+
+# the tokens of the cities before they are shuffled (see the Game
+# object documentation)
+initial_tokens = [1] * 12 + [2] * 5 + [3] * 3 + [4] * 4 + [5] * 3 + [6] * 2 + [7]
+# the pounds of the gems (twice as much in Gold Coast)
+token_values = {4: 300, 5: 600, 6: 1000}
+
 
 class Game:
     """
@@ -52,17 +59,53 @@ class Game:
         If the Star of Africa is found and all the horseshoes are
         found, if True, then all the rest of the players, i.e. players
         who can't win anymore, will lose. Defaults to True.
+    endgame_shortcut : bool, optional
+        If True, the race home of an AI game is not played when nothing
+        but the race is left (see home_race.is_pure_race), but the
+        winner and the length of the game are sampled from the exact
+        distributions of the race. Defaults to False.
+    ask : callable, optional
+        Asks the human whose turn it is: is called with the prompt and
+        returns the answer. Defaults to input.
+    say : callable, optional
+        Tells the humans what happens: is called with the message.
+        Defaults to print.
+    delay : float, optional
+        How many seconds a human turn waits before the options are
+        shown, so that the players can read what happened. Defaults to
+        3.
+    rng : random.Random, optional
+        The random generator of the game (the dice and the tokens).
+        Defaults to None, i.e. the module random. With a generator of
+        its own a game doesn't touch the random state of the others,
+        e.g. when games are played in threads.
+    counters : OutcomeCounters, optional
+        Counts what happens to each player, e.g. the robberies and the
+        turns lost (see outcomes.py). Defaults to None, i.e. nothing
+        is counted.
+    occupancy : Occupancy, optional
+        Counts where the players spend their turns (see occupancy.py),
+        e.g. over many games. Defaults to None, i.e. nothing is
+        counted.
 
     Methods
     -------
     play
         Runs the game and takes care of the order of turns
+    play_steps
+        play as a generator, which yields the questions to the humans
+    answer
+        Answers the questions of the steps with ask
     run_turn
         The human player decides which action to take.
         For AI corresponds to run_turn_AI and AI_turn_decision.
+    turn_steps
+        run_turn as a generator
     movement_decision
         The human player decides where to travel.
         For AI corresponds to AI_movement_decision
+    movement_steps
+        movement_decision as a generator
     run_turn_AI
         The AI player sees which action the player must take or if
         that needs to be decided
@@ -71,13 +114,24 @@ class Game:
         multiple options
     AI_movement_decision
         The AI player decides where to travel
+    roll
+        Rolls the dice
+    chances
+        Prints the chances of the players to win from here
     flip
         Flips the token where the player is
     move
         Moves the player to the new location
+    flip_steps
+        Asks the human whether to flip the token after moving
+    count_flip
+        Counts a flipped token into the counters
+    count_travel
+        Counts a turn by plane or by ship into the counters
     """
 
-    def __init__(self, players, human_game, elimination=True):
+    def __init__(self, players, human_game, elimination=True, endgame_shortcut=False,
+                 ask=input, say=print, delay=3, rng=None, counters=None, occupancy=None):
         """
         Parameters
         ----------
@@ -87,37 +141,90 @@ class Game:
         self.players = players
         self.turn = 0
         self.turn_no = 1
-        self.tokens = [1] * 12 + [2] * 5 + [3] * 3 + [4] * 4 + [5] * 3 + [6] * 2 + [7]
-        random.shuffle(self.tokens)
-        self.unflipped = [True] * 30 + [False] * 12
+        self.tokens = list(initial_tokens)
+        self.rng = rng
+        (rng or random).shuffle(self.tokens)
+        self.unflipped = [True] * map.no_tokens + [False] * (map.no_nodes - map.no_tokens)
         self.horseshoes_found = 0
         self.star_found = False
         self.winner = None
         self.cape_visit = False
         self.human_game = human_game
         self.elimination = elimination
+        self.endgame_shortcut = endgame_shortcut
+        self.ask = ask
+        self.say = say
+        self.delay = delay
+        self.counters = counters
+        self.occupancy = occupancy
 
     def play(self):
-        """Runs the game and takes care of the turns."""
+        """Plays the turn of the next player, asks the humans with ask.
+
+        Returns a short summary of the turn.
+        """
+        return self.answer(self.play_steps())
+
+    def play_steps(self):
+        """Plays the turn of the next player, yields the questions.
+
+        This is play as a generator: every question to a human is
+        yielded as the prompt, and the answer is sent back (see answer).
+        E.g. game_server.py awaits the answers between the steps, so
+        that no thread waits for a human. Returns the summary of play.
+        """
+        if self.endgame_shortcut and home_race.is_pure_race(self):
+            home_race.finish_race(self, self.rng or random)
+            return f"{self.winner.name} won the race home on the turn {self.turn_no}."
         if self.turn == len(self.players):
             self.turn = 0
             self.turn_no += 1
         active = self.players[self.turn]
+        players = self.players
         if active.AI_type:
             self.run_turn_AI(active)
         else:
-            self.run_turn(active)
-        # If any players are eliminated, the order might be messed up. Therefore this.
-        self.turn = self.players.index(active)
+            yield from self.turn_steps(active)
+        # If any players are eliminated, the order might be messed up.
+        # Therefore this, but only then: the players are eliminated at
+        # most once in a game, so a turn doesn't depend on how many
+        # players there are.
+        if self.players is not players:
+            self.turn = self.players.index(active)
         if active.location in ("Tan", "Cai") and (active.has_star or active.has_horseshoe):
             self.winner = active
         self.turn += 1
         msg = f"{active.name}, {active.money}, {active.location}"
         return msg
 
+    def answer(self, questions):
+        """Answers the questions of the steps with ask.
+
+        Args
+        ----
+        questions : generator
+            E.g. play_steps: yields the prompts and gets the answers.
+
+        Returns what the generator returns.
+        """
+        answer = None
+        while True:
+            try:
+                prompt = questions.send(answer)
+            except StopIteration as end:
+                return end.value
+            answer = self.ask(prompt)
+
     def run_turn(self, player):
         """This function takes care of deciding for a human.
 
+        The questions are asked with ask, see turn_steps.
+        """
+        return self.answer(self.turn_steps(player))
+
+    def turn_steps(self, player):
+        """This function takes care of deciding for a human.
+
         This function will ask the player (if the player has a choice)
         what he/she would like to do and calls the respective function
         accordingly. It also checks that the player doesn't have a
@@ -131,88 +238,99 @@ class Game:
 
         Returns None
         """
-        print(f"\nIt is {player.name}'s turn!")
-        print(f"You have {player.money} pounds.")
-        print("You are in the following location: " +
+        self.say(f"\nIt is {player.name}'s turn!")
+        self.say(f"You have {player.money} pounds.")
+        self.say("You are in the following location: " +
             f"{map.locstr(player.location, player.offshore, self.unflipped)}.\n")
-        time.sleep(3)
+        if self.delay:
+            time.sleep(self.delay)
         if player.special == 0:
             possible = player.turn_possibilities(self.unflipped)
             if len(possible) == 1:
                 if "land" in possible:
-                    print("You need to travel by land.")
-                    self.movement_decision(player, "land")
+                    self.say("You need to travel by land.")
+                    yield from self.movement_steps(player, "land")
                 else:
-                    print("You need to travel by sea.")
+                    self.say("You need to travel by sea.")
                     if not player.offshore:
                         player.offshore = True
                         if player.money == 0:
                             player.special = 1
-                            self.movement_decision(player, "sea_forced")
+                            yield from self.movement_steps(player, "sea_forced")
                         else:
                             player.money -= 100
-                            self.movement_decision(player, "sea")
+                            yield from self.movement_steps(player, "sea")
                     else:
-                        self.movement_decision(player, "sea")
+                        yield from self.movement_steps(player, "sea")
             else:
                 while True:
                     for _, value in enumerate(possible):
                         if value == "flip":
-                            print(
+                            self.say(
                                 "If you want to try to flip the token in " +
                                     f"{map.abb_to_full[player.location]}, write flip."
                             )
                         elif value == "land":
-                            print("If you want to travel by land, write land.")
+                            self.say("If you want to travel by land, write land.")
                         elif value == "sea":
-                            print("If you want to travel by sea, write sea.")
+                            self.say("If you want to travel by sea, write sea.")
                         else:
-                            print("If you want to travel by plane, write air.")
-                    decision = input(
-                        "Which option would you like? (You can also write tokens.) "
+                            self.say("If you want to travel by plane, write air.")
+                    decision = yield (
+                        "Which option would you like? " +
+                            "(You can also write tokens or chances.) "
                     )
                     match decision:
-                        case "flip":
-                            print(self.try_flip(player))
+                        case "flip" if "flip" in possible:
+                            self.say(self.try_flip(player))
                             break
-                        case "land":
-                            self.movement_decision(player, "land")
+                        case "land" if "land" in possible:
+                            yield from self.movement_steps(player, "land")
                             break
                         # player cannot be already offshore
-                        case "sea":
+                        case "sea" if "sea" in possible:
                             player.offshore = True
                             if player.money == 0:
                                 player.special = 1
-                                self.movement_decision(player, "sea_forced")
+                                yield from self.movement_steps(player, "sea_forced")
                             else:
                                 player.money -= 100
-                                self.movement_decision(player, "sea")
+                                yield from self.movement_steps(player, "sea")
                             break
-                        case "air":
+                        case "air" if "air" in possible:
                             player.money -= 300
-                            self.movement_decision(player, "air")
+                            yield from self.movement_steps(player, "air")
                             break
                         case "tokens":
                             self.token_location()
+                        case "chances":
+                            self.chances()
                         case "cheat":
                             self.cheat()
                         case _:
-                            print(
+                            self.say(
                                 "You need to choose one of the aforementioned options" +
                                     "(or write tokens)! "
                             )
         elif player.special == 1:
-            print("You need to travel by sea.")
-            self.movement_decision(player, "sea_forced")
+            self.say("You need to travel by sea.")
+            yield from self.movement_steps(player, "sea_forced")
         elif player.special in (2, 3):
-            print(self.stuck(player))
+            self.say(self.stuck(player))
         else:
-            print(self.slave(player))
+            self.say(self.slave(player))
         return None
 
     def movement_decision(self, player: player.Player, decision):
         """This function chooses the destination for a human.
 
+        The questions are asked with ask, see movement_steps.
+        """
+        return self.answer(self.movement_steps(player, decision))
+
+    def movement_steps(self, player: player.Player, decision):
+        """This function chooses the destination for a human.
+
         This function will look for the available destination options
         by calling the function destination_options, ask the player
         which of the destination options the player prefers and calls
@@ -230,34 +348,39 @@ class Game:
 
         Returns None
         """
+        if self.counters is not None:
+            self.count_travel(player, decision)
+        if self.occupancy is not None:
+            self.occupancy.travel(decision)
         if decision == "air":
             options = map.air_routes[player.location]
         elif decision == "sea_forced":
-            print(
+            self.say(
                 "\nYou have no money, so you are travelling at a steady pace of two steps per turn."
             )
             options = player.destination_options(2)
         else:
-            roll = random.randint(1, 6)
-            print(f"\nYou rolled a {roll}.\n")
+            roll = self.roll()
+            self.say(f"\nYou rolled a {roll}.\n")
             options = player.destination_options(roll)
         while True:
             for index, value in enumerate(options):
-                print(
+                self.say(
                     f"Write {index} if you want to move to the following location: " +
                         f"{map.locstr(value, player.offshore, self.unflipped)}."
                 )
-            decision = input(
+            decision = yield (
                 "Where would you like to travel? (You can also write tokens.) "
             )
             if decision.isnumeric() and 0 <= int(decision) < len(options):
                 self.move(player, options[int(decision)])
+                yield from self.flip_steps(player)
                 break
             if decision == "tokens":
                 self.token_location()
             if decision == "cheat":
                 self.cheat()
-            print("You need to write one of those numbers (or write tokens)!\n")
+            self.say("You need to write one of those numbers (or write tokens)!\n")
         return None
 
     def run_turn_AI(self, player):
@@ -277,9 +400,9 @@ class Game:
         Returns None
         """
         if self.human_game:
-            print(f"\nIt is {player.name}'s turn!")
-            print(f"{player.name} has {player.money} pounds.")
-            print(
+            self.say(f"\nIt is {player.name}'s turn!")
+            self.say(f"{player.name} has {player.money} pounds.")
+            self.say(
                 f"{player.name} is in the following location: " +
                     f"{map.locstr(player.location, player.offshore, self.unflipped)}.\n"
             )
@@ -308,11 +431,11 @@ class Game:
         elif player.special in (2, 3):
             msg = self.stuck(player)
             if self.human_game:
-                print(msg)
+                self.say(msg)
         else:
             msg = self.slave(player)
             if self.human_game:
-                print(msg)
+                self.say(msg)
         return None
 
     def AI_turn_decision(self, player, options):
@@ -337,11 +460,12 @@ class Game:
         result : str
             The action the AI chooses.
         """
+        params = player.params or AI_decisions.default_params
         if player.has_star or player.has_horseshoe:
-            result = map.expected_time(player.money)[player.location][1]
+            result = home_race.best_action(player.location, player.money)
         elif self.star_found:
             result = AI_decisions.choose_action_token(
-                options, player.location, self.unflipped, player.money
+                options, player.location, self.unflipped, player.money, params
             )
         else:
             # check if the strategy needs to be changed
@@ -355,7 +479,7 @@ class Game:
             # player.AI_type == 1
             else:
                 result = AI_decisions.choose_action_token(
-                    options, player.location, self.unflipped, player.money
+                    options, player.location, self.unflipped, player.money, params
                 )
         if result == "sea":
             player.offshore = True
@@ -390,30 +514,39 @@ class Game:
         #time.sleep(3)
         if decision == "flip":
             if self.human_game:
-                print(f"{player.name} is trying to flip a token.")
-                print(self.try_flip(player))
+                self.say(f"{player.name} is trying to flip a token.")
+                self.say(self.try_flip(player))
             else:
                 self.try_flip(player)
         else:
+            if self.counters is not None:
+                self.count_travel(player, decision)
+            if self.occupancy is not None:
+                self.occupancy.travel(decision)
             if decision == "air":
                 if self.human_game:
-                    print(f"{player.name} is travelling by plane.")
+                    self.say(f"{player.name} is travelling by plane.")
                 options = map.air_routes[player.location]
             elif decision == "sea_forced":
                 if self.human_game:
-                    print(f"{player.name} is travelling by ship.")
+                    self.say(f"{player.name} is travelling by ship.")
                 options = player.destination_options(2)
             else:
                 if self.human_game and decision == "sea":
-                    print(f"{player.name} is travelling by ship.")
+                    self.say(f"{player.name} is travelling by ship.")
                 elif self.human_game and decision == "land":
-                    print(f"{player.name} is travelling by land.")
-                roll = random.randint(1, 6)
+                    self.say(f"{player.name} is travelling by land.")
+                roll = self.roll()
                 options = player.destination_options(roll)
+            params = player.params or AI_decisions.default_params
             if player.has_star or player.has_horseshoe:
-                choice = AI_decisions.choose_home(options, player.money)
+                choice = AI_decisions.choose_home(
+                    options, player.money, decision == "sea_forced"
+                )
             elif self.star_found:
-                choice = AI_decisions.choose_token(options, self.unflipped, player.money)
+                choice = AI_decisions.choose_token(
+                    options, self.unflipped, player.money, params
+                )
             else:
                 # check if the strategy needs to be changed
                 if player.AI_type == 2 and self.cape_visit:
@@ -431,10 +564,12 @@ class Game:
                         )
                 # player.AI_type == 1
                 else:
-                    choice = AI_decisions.choose_token(options, self.unflipped, player.money)
+                    choice = AI_decisions.choose_token(
+                        options, self.unflipped, player.money, params
+                    )
             new_loc = options[choice]
             if self.human_game:
-                print(
+                self.say(
                     f"{player.name} will travel to the following location: " +
                         f"{map.locstr(new_loc, player.offshore, self.unflipped)}"
                 )
@@ -463,6 +598,8 @@ class Game:
             A message that explains what happened
         """
         token_no = self.tokens[map.abbs.index(player.location)]
+        if self.counters is not None:
+            self.count_flip(player, token_no)
         match token_no:
             case 1:
                 msg = "You found nothing. "
@@ -476,13 +613,14 @@ class Game:
                     player.has_horseshoe = True
                     # Elimination
                     if self.horseshoes_found == 5 and self.elimination:
-                        eliminated = []
-                        for x in self.players:
-                            if not (x.has_horseshoe or x.has_star):
-                                eliminated.append(x)
-                        for x in eliminated:
-                            self.players.remove(x)
+                        eliminated = [
+                            x for x in self.players if not (x.has_horseshoe or x.has_star)
+                        ]
                         if eliminated:
+                            # a new list, so that play notices the elimination
+                            self.players = [
+                                x for x in self.players if x.has_horseshoe or x.has_star
+                            ]
                             msg += "\nThis was the last horseshoe, so the players who "
                             msg += "don't have a horsehoe or the Star of Africa will be eliminated!!"
                             msg += "\nThe following player(s) got eliminated: "
@@ -530,9 +668,34 @@ class Game:
         self.unflipped[map.abbs.index(player.location)] = False
         return msg
 
+    def count_flip(self, player, token_no):
+        """Counts the token the player flips (before it is flipped)."""
+        self.counters.add(player, outcomes.FLIPS)
+        if token_no == 3:
+            self.counters.add(player, outcomes.ROBBERIES)
+            self.counters.add(player, outcomes.ROBBED, player.money)
+        elif token_no in (4, 5, 6):
+            self.counters.add(
+                player, outcomes.EARNED,
+                token_values[token_no] * (2 if player.location == "Gol" else 1)
+            )
+
+    def count_travel(self, player, decision):
+        """Counts a turn travelled by plane or by ship."""
+        if decision == "air":
+            self.counters.add(player, outcomes.FLIGHTS)
+        elif decision in ("sea", "sea_forced"):
+            self.counters.add(player, outcomes.SEA_TURNS)
+
+    def roll(self):
+        """Rolls the dice with the random generator of the game."""
+        return (self.rng or random).randint(1, 6)
+
     def try_flip(self, player: player.Player):
         """Trying to flip a token in a city. Works if 4-6 is rolled."""
-        x = random.randint(1, 6)
+        if self.occupancy is not None:
+            self.occupancy.count_flip()
+        x = self.roll()
         msg = f"\nYou tried to flip the token and you rolled a {x}. "
         if x > 3:
             msg += f"\n{self.flip(player)}"
@@ -544,10 +707,10 @@ class Game:
         """This function will move the player and check for flip.
 
         The player is moved to the new location and if the player is in
-        a city with an unflipped token and has at least 100 pounds, the
-        player is asked whether the player wants to flip the token. AI
+        a city with an unflipped token and has at least 100 pounds, AI
         will always choose to flip the token if the AI does not have
-        the Star of Africa or a horseshoe.
+        the Star of Africa or a horseshoe. A human is asked afterwards
+        whether the player wants to flip the token (see flip_steps).
         This function will also take care of the 500 pounds paid to the
         first person in Cape Town and if the player gets stuck (=raided
         by pirates or ambushed by beduins).
@@ -562,59 +725,75 @@ class Game:
         Returns None
         """
         player.location = new_loc
+        if self.occupancy is not None:
+            self.occupancy.move(new_loc, player.offshore)
         if len(re.split(r"-", new_loc)) == 1 and ("nd" not in new_loc):
             player.offshore = False
             player.special = 0
             if new_loc == "Tow" and not self.cape_visit:
                 if self.human_game and player.AI_type:
-                    print(
+                    self.say(
                         f"{player.name} was the first player to visit Cape Town and got 500 pounds."
                     )
                 elif self.human_game:
-                    print(
+                    self.say(
                         "You were the first player to visit Cape Town! You get 500 pounds!"
                     )
                 self.cape_visit = True
                 player.money += 500
+                if self.counters is not None:
+                    self.counters.add(player, outcomes.EARNED, 500)
             if self.unflipped[map.abbs.index(new_loc)] and player.money >= 100:
-                if player.AI_type:
-                    if not (player.has_star or player.has_horseshoe):
-                        player.money -= 100
-                        msg = self.flip(player)
-                        if self.human_game:
-                            print(msg)
-                else:
-                    action = input(
-                        f"Would you like to flip the token in {map.abb_to_full[new_loc]}? " +
-                            "Write (y)es or (n)o. "
-                    )
-                    while True:
-                        if action[0].lower() == "y":
-                            player.money -= 100
-                            print(self.flip(player))
-                            break
-                        if action[0].lower() == "n":
-                            break
-                        print("You need to write y or n!")
+                if player.AI_type and not (player.has_star or player.has_horseshoe):
+                    player.money -= 100
+                    msg = self.flip(player)
+                    if self.human_game:
+                        self.say(msg)
         else:
-            if new_loc in ["Sah-Darf-2-6", "Darf-Sah-6-2"]:
+            if new_loc in map.beduin_squares:
                 player.special = 2
-            elif new_loc in [
-                "Sth-nd7-1-8",
-                "nd7-Sth-8-1",
-                "Sth-nd9-1-7",
-                "Sth-nd9-7-1",
-            ]:
+            elif new_loc in map.pirate_squares:
                 player.special = 3
         return None
 
+    def flip_steps(self, player: player.Player):
+        """Asks the human after move whether to flip the token there.
+
+        The human is asked if the player is in a city with an unflipped
+        token and has at least 100 pounds. The question is yielded (see
+        play_steps).
+        """
+        loc = player.location
+        if "-" in loc or "nd" in loc or not self.unflipped[map.abbs.index(loc)]:
+            return
+        if player.money < 100:
+            return
+        while True:
+            action = yield (
+                f"Would you like to flip the token in {map.abb_to_full[loc]}? " +
+                    "Write (y)es or (n)o. "
+            )
+            if action[:1].lower() == "y":
+                player.money -= 100
+                self.say(self.flip(player))
+                break
+            if action[:1].lower() == "n":
+                break
+            self.say("You need to write y or n!")
+
     def stuck(self, player: player.Player):
         """Player being ambushed by beduins or pirates."""
+        if self.counters is not None:
+            self.counters.add(
+                player, outcomes.BEDUIN_TURNS if player.special == 2 else outcomes.PIRATE_TURNS
+            )
+        if self.occupancy is not None:
+            self.occupancy.count_stuck(player.location, player.offshore)
         if player.special == 2:
             msg = "You are ambushed by the beduins!"
         else:
             msg = "Your ship is raided by the pirates!"
-        x = random.randint(1, 6)
+        x = self.roll()
         msg += f"\nYou rolled a {x}."
         if x < 3:
             msg += "\nYou managed to escape! You can move freely next turn."
@@ -625,6 +804,10 @@ class Game:
 
     def slave(self, player: player.Player):
         """Player working as a slave in Slave Coast."""
+        if self.counters is not None:
+            self.counters.add(player, outcomes.SLAVE_TURNS)
+        if self.occupancy is not None:
+            self.occupancy.count_slave()
         msg = "You are working as a slave. "
         if player.special == 4:
             msg += "You are free to move next turn."
@@ -639,15 +822,29 @@ class Game:
 
     def token_location(self):
         """Prints which cities have unflipped tokens and which haven't."""
-        for x in range(30):
+        for x in range(map.no_tokens):
             if self.unflipped[x]:
-                print(map.full_names[x] + ": not flipped")
+                self.say(map.full_names[x] + ": not flipped")
             else:
-                print(map.full_names[x] + ": flipped")
+                self.say(map.full_names[x] + ": flipped")
+        return None
+
+    def chances(self):
+        """Prints the chances of the players to win from here.
+
+        The rest of the game is played many times from the beginning of
+        the current turn, with the AI playing for the humans (see
+        win_probability.py).
+        """
+        # the process pool of the simulations is only imported when needed
+        import win_probability
+
+        self.say("Simulating the rest of the game...")
+        self.say(win_probability.report(win_probability.estimate(self)))
         return None
 
     def cheat(self):
         """Prints the tokens of the cities."""
-        for x in range(30):
-            print(f"{map.full_names[x]}: {self.tokens[x]}")
+        for x in range(map.no_tokens):
+            self.say(f"{map.full_names[x]}: {self.tokens[x]}")
         return None
\ No newline at end of file
@@ -0,0 +1,444 @@
+import argparse
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+import game
+import initialize
+import player
+
+# A server for playing the game with humans over the network. The
+# server hosts many tables at once in one process. The clients talk in
+# plain text lines (e.g. with nc localhost 5556): the server writes the
+# messages of the game and the questions, and the client answers a
+# question with one line.
+#
+# A table plays its game in steps (see Game.play_steps): a step plays
+# the game until the next question to a human, and it is run in a small
+# pool of threads, so the turns of the AIs never block the event loop.
+# The answer is awaited on the event loop, so a human who is thinking
+# holds no thread, and a human who doesn't answer within the timeout
+# ends the game. Every table has a random generator of its own, so the
+# dice of one table don't depend on the others, and the chances command
+# of a table plays its simulations in the pool of worker processes
+# shared by the whole server (see win_probability.get_pool).
+
+
+class Connection:
+    """
+    The connection of a human client
+
+    ...
+
+    Attributes
+    ----------
+    reader : asyncio.StreamReader
+    writer : asyncio.StreamWriter
+    reading : asyncio.Task
+        The read of the next line, None if no one is reading.
+
+    Methods
+    -------
+    write
+        Writes the message to the client
+    read_line
+        Reads the next line from the client
+    ask
+        Asks the client and returns the answer
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reading = None
+
+    def write(self, msg):
+        """Writes the message to the client, if it is still connected."""
+        if not self.writer.is_closing():
+            self.writer.write(msg.encode())
+
+    async def read_line(self):
+        """Reads the next line from the client without the newline.
+
+        The line is read by a task of its own, which goes on if the
+        waiting is cancelled (e.g. by a timeout), so that the next
+        read_line gets the same line.
+        """
+        if self.reading is None:
+            self.reading = asyncio.ensure_future(self.reader.readline())
+        try:
+            line = await asyncio.shield(self.reading)
+        finally:
+            if self.reading.done():
+                self.reading = None
+        if not line:
+            raise ConnectionError("The client disconnected.")
+        return line.decode().strip()
+
+    async def ask(self, prompt, timeout=None):
+        """Asks the client and returns the answer without the newline.
+
+        Raises TimeoutError if there is no answer within timeout
+        seconds (None waits for ever).
+        """
+        self.write(prompt + "\n")
+        await self.writer.drain()
+        return await asyncio.wait_for(self.read_line(), timeout)
+
+
+class Table:
+    """
+    A table of one game with humans and AIs
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        The name of the table.
+    humans : int
+        How many humans play at the table, None if not yet configured
+        (or closed).
+    ai_types : list of int
+        The types of the AIs at the table.
+    elimination : bool
+        Whether the elimination rules are on.
+    loop : asyncio event loop
+        The loop of the server.
+    executor : ThreadPoolExecutor
+        Runs the steps of the game.
+    timeout : float
+        How many seconds a human has for an answer, None for no limit.
+    players : list of Player
+        The players who have joined.
+    connections : dictionary
+        The name of a human to its Connection.
+    game : Game
+        The game, None before it starts.
+    steps : generator
+        The steps of the current turn (see Game.play_steps), None
+        between the turns.
+    rng : random.Random
+        The random generator of the game (the order of the players,
+        the tokens and the dice).
+    configured : asyncio.Event
+        Is set when the first human has told how many play.
+    started : asyncio.Event
+        Is set when the game has started.
+    finished : asyncio.Event
+        Is set when the game has ended.
+
+    Methods
+    -------
+    configure
+        Sets how many humans and which AIs play at the table
+    join
+        Adds a human to the table
+    leave
+        Removes a human who left before the game started
+    is_full
+        Whether all the humans have joined
+    run
+        Plays the game
+    step
+        Plays the game until the next question (in the executor)
+    say
+        Tells every human at the table (also from the executor)
+    """
+
+    def __init__(self, name, elimination, loop, executor, timeout=None):
+        self.name = name
+        self.humans = None
+        self.ai_types = []
+        self.elimination = elimination
+        self.loop = loop
+        self.executor = executor
+        self.timeout = timeout
+        self.players = []
+        self.connections = {}
+        self.game = None
+        self.steps = None
+        self.rng = random.Random()
+        self.configured = asyncio.Event()
+        self.started = asyncio.Event()
+        self.finished = asyncio.Event()
+
+    def configure(self, humans, ai_types):
+        """Sets the players of the table, None if the table is closed."""
+        self.humans = humans
+        self.ai_types = ai_types
+        self.configured.set()
+
+    def join(self, name, starting_loc, connection):
+        """Adds a human to the table."""
+        self.players.append(player.Player(name, 0, starting_loc))
+        self.connections[name] = connection
+
+    def leave(self, name):
+        """Removes a human who left before the game started."""
+        self.players = [a for a in self.players if a.name != name]
+        del self.connections[name]
+
+    def is_full(self):
+        """Whether all the humans have joined."""
+        return self.humans is not None and len(self.connections) == self.humans
+
+    async def run(self):
+        """Plays the game, asks the humans between the steps."""
+        names = [a for a in initialize.sample_names if a not in self.connections]
+        starting_locs = initialize.default_starting_locs(self.ai_types)
+        players = self.players + [
+            player.Player(names[x], ai_type, starting_locs[x])
+            for x, ai_type in enumerate(self.ai_types)
+        ]
+        self.rng.shuffle(players)
+        self.game = game.Game(players, True, self.elimination, say=self.say, delay=0, rng=self.rng)
+        self.started.set()
+        try:
+            prompt = await self.loop.run_in_executor(self.executor, self.step, None)
+            while prompt is not None:
+                active = self.game.players[self.game.turn]
+                try:
+                    answer = await self.connections[active.name].ask(prompt, self.timeout)
+                except TimeoutError:
+                    self.say(f"\n{active.name} didn't answer in time, so the game ended.")
+                    return
+                prompt = await self.loop.run_in_executor(self.executor, self.step, answer)
+            self.say(f"\nPlayer {self.game.winner.name} won the game!")
+            self.say(f"The game lasted {self.game.turn_no} turns.")
+        except ConnectionError:
+            self.say("\nA player left, so the game ended.")
+        finally:
+            # after the messages, which are written by the loop too
+            self.loop.call_soon_threadsafe(self.finished.set)
+
+    def step(self, answer):
+        """Plays the game until the next question and returns it.
+
+        The answer goes to the question of the previous step (None for
+        the first step). This is run in the executor, so that the turns
+        of the AIs don't block the event loop. Returns None when the
+        game has ended.
+        """
+        while True:
+            if self.steps is None:
+                if self.game.winner is not None:
+                    return None
+                self.steps = self.game.play_steps()
+            try:
+                return self.steps.send(answer)
+            except StopIteration:
+                self.steps = None
+                answer = None
+
+    def say(self, msg):
+        """Tells every human at the table."""
+        for connection in self.connections.values():
+            self.loop.call_soon_threadsafe(connection.write, msg + "\n")
+
+
+class GameServer:
+    """
+    Hosts the tables and welcomes the clients
+
+    A client is asked for its name and the table it wants to join. The
+    first one at a table decides how many humans and AIs play there,
+    and the game starts when all the humans have joined.
+
+    ...
+
+    Attributes
+    ----------
+    tables : dictionary
+        The name of a table to the Table, which is waiting for players.
+    open_tables : int
+        How many tables are waiting for players or playing.
+    max_tables : int
+        The most open tables, more are refused.
+    executor : ThreadPoolExecutor
+        Runs the steps of the games.
+    elimination : bool
+        Whether the elimination rules are on.
+    timeout : float
+        How many seconds a human has for an answer in the game, None
+        for no limit.
+
+    Methods
+    -------
+    handle
+        Serves one client
+    wait_for_start
+        Waits for the game of a table to start
+    serve
+        Serves the clients until cancelled
+    """
+
+    def __init__(self, max_tables=1000, elimination=True, timeout=600, workers=None):
+        """
+        Parameters
+        ----------
+        max_tables : int, optional
+            How many tables can be open at the same time. Defaults to
+            1000.
+        elimination : bool, optional
+            Whether the elimination rules are on. Defaults to True.
+        timeout : float, optional
+            How many seconds a human has for an answer in the game,
+            None for no limit. Defaults to 600.
+        workers : int, optional
+            The amount of threads that play the steps of the games.
+            Defaults to that of ThreadPoolExecutor.
+        """
+        self.tables = {}
+        self.open_tables = 0
+        self.max_tables = max_tables
+        self.executor = ThreadPoolExecutor(workers)
+        self.elimination = elimination
+        self.timeout = timeout
+
+    async def ask_number(self, connection, prompt, low, high):
+        """Asks until the answer is a number between low and high."""
+        while True:
+            answer = await connection.ask(prompt)
+            if answer.isnumeric() and low <= int(answer) <= high:
+                return int(answer)
+            connection.write(f"The number must be between {low} and {high}!\n")
+
+    async def wait_for_start(self, connection, table):
+        """Waits for the game of the table to start.
+
+        What the client writes in the meantime is not an answer, and
+        if the client disconnects, ConnectionError is raised so that
+        its seat is freed.
+        """
+        started = asyncio.ensure_future(table.started.wait())
+        try:
+            while True:
+                reading = asyncio.ensure_future(connection.read_line())
+                done, _ = await asyncio.wait(
+                    {started, reading}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if started in done:
+                    # the line that is being read goes to the game
+                    reading.cancel()
+                    return
+                reading.result()
+                connection.write("The game hasn't started yet.\n")
+        finally:
+            started.cancel()
+
+    async def handle(self, reader, writer):
+        """Serves one client until its game has ended."""
+        connection = Connection(reader, writer)
+        loop = asyncio.get_running_loop()
+        table = None
+        name = None
+        try:
+            table_name = await connection.ask("Which table would you like to join? ")
+            table = self.tables.get(table_name)
+            if table is None:
+                if self.open_tables >= self.max_tables:
+                    connection.write("All the tables are taken, please try again later.\n")
+                    return
+                # the table is reserved at once, so that the others who
+                # join it wait for it to be configured
+                table = Table(table_name, self.elimination, loop, self.executor, self.timeout)
+                self.tables[table_name] = table
+                self.open_tables += 1
+                try:
+                    humans = await self.ask_number(
+                        connection, "How many humans are playing at the table (1-6)? ", 1, 6
+                    )
+                    ais = await self.ask_number(
+                        connection, f"How many AIs are playing (0-{6 - humans})? ", 0, 6 - humans
+                    )
+                except ConnectionError:
+                    del self.tables[table_name]
+                    self.open_tables -= 1
+                    table.configure(None, [])
+                    raise
+                # the AIs are of the type 1 (the closest token)
+                table.configure(humans, [1] * ais)
+            await table.configured.wait()
+            if table.humans is None:
+                connection.write("The table was closed.\n")
+                return
+            while True:
+                answer = await connection.ask("Your name: ")
+                if answer and answer not in table.connections:
+                    break
+                connection.write("That name is taken!\n")
+            while True:
+                starting_loc = await connection.ask(
+                    "Do you start from (T)angier or (C)airo? Write T or C: "
+                )
+                if starting_loc[:1].lower() in ("t", "c"):
+                    break
+                connection.write("The starting location must be T or C!\n")
+            if table.is_full():
+                connection.write("The table is full.\n")
+                return
+            name = answer
+            table.join(name, "Tan" if starting_loc[:1].lower() == "t" else "Cai", connection)
+            if table.is_full():
+                if self.tables.get(table_name) is table:
+                    del self.tables[table_name]
+                try:
+                    await table.run()
+                finally:
+                    self.open_tables -= 1
+            else:
+                connection.write("Waiting for the other players...\n")
+                await self.wait_for_start(connection, table)
+            await table.finished.wait()
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            if name is not None and not table.started.is_set():
+                table.leave(name)
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=5556, path=None, ready=None):
+        """Serves the clients over TCP (or a Unix socket) until cancelled.
+
+        Parameters
+        ----------
+        host : str, optional
+            The address to listen to. Defaults to 127.0.0.1.
+        port : int, optional
+            The port to listen to, 0 for any free port. Defaults to
+            5556.
+        path : str, optional
+            If given, the server listens to this Unix socket instead.
+        ready : callable, optional
+            Is called with the address of the server, when the server
+            is listening.
+        """
+        # many clients may connect at once
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path, backlog=1024)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        if ready is not None:
+            ready(server.sockets[0].getsockname())
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hosts games for humans over the network.")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen to")
+    parser.add_argument("--port", type=int, default=5556, help="the port to listen to")
+    parser.add_argument("--unix", default=None, help="listens to this Unix socket instead")
+    parser.add_argument("--max-tables", type=int, default=1000,
+                        help="how many tables can be open at the same time")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="how many seconds a human has for an answer, 0 for no limit")
+    parser.add_argument("--no-elimination", action="store_true",
+                        help="turns the elimination rules off")
+    args = parser.parse_args()
+    game_server = GameServer(args.max_tables, not args.no_elimination, args.timeout or None)
+    try:
+        asyncio.run(game_server.serve(args.host, args.port, args.unix,
+                                      lambda a: print(f"Listening to {a}.")))
+    except KeyboardInterrupt:
+        pass
@@ -1,8 +1,14 @@
 import initialize
+import speculate
 
 if __name__ == "__main__":
     elimination = True
+    # change this variable if you don't want the AIs to precompute
+    # their decisions while the humans think (see speculate.py)
+    speculation = True
     game = initialize.init_human(elimination)
+    if speculation:
+        game.ask = speculate.Speculator(game, game.ask)
     while game.winner is None:
         game.play()
     print(f"\nPlayer {game.winner.name} won the game!")
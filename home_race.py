@@ -0,0 +1,571 @@
+from functools import cache
+import numpy as np
+import map
+import player
+
+# The race home after the Star of Africa (or a horseshoe) is found is
+# solved exactly as a Markov decision process. The state of a player
+# is the location string, the money and the special status. Every turn
+# costs one, and the game's own movement (Player.destination_options)
+# gives the possible destinations of each roll of the dice. The value
+# of a state is the expected amount of turns to Cairo or Tangier when
+# the player plays optimally, and the policy tells which way to travel.
+#
+# Simplifications: the money is capped at max_money (more money is as
+# good as that), and the 500 pounds of the first visit to Cape Town are
+# not counted, as they depend on the other players.
+
+# the money is counted in hundreds up to this
+max_money = 30
+# the special statuses in the states: 0 free, 1 travelling by sea with
+# no money, 2 ambushed by the beduins, 3 raided by the pirates
+specials = 4
+homes = ("Cai", "Tan")
+actions = ["land", "sea", "air"]
+
+
+def is_city(loc):
+    """Whether the location string is a city (not a crossroads)."""
+    return "-" not in loc and "nd" not in loc
+
+
+@cache
+def _sea_edges():
+    """Returns the set of the edges (a, b, length) by sea."""
+    return {
+        (a, b[0], b[1]) for a, routes in map.sea_routes.items() for b in routes
+    }
+
+
+def offshore(loc):
+    """Whether a player in the location (not a city) is on the sea."""
+    if "-" not in loc:
+        return loc in ("nd6", "nd7", "nd8", "nd9")
+    a, b, x, y = loc.split("-")
+    return (a, b, int(x) + int(y)) in _sea_edges()
+
+
+def _options(loc, steps, at_sea):
+    """Returns the destinations of the game for the steps."""
+    mover = player.Player("", 1, loc)
+    mover.offshore = at_sea
+    return mover.destination_options(steps)
+
+
+def special_after(loc, special):
+    """Returns the special status after moving to the location."""
+    if is_city(loc):
+        return 0
+    if loc in map.beduin_squares:
+        return 2
+    if loc in map.pirate_squares:
+        return 3
+    return special
+
+
+@cache
+def board():
+    """Returns the states and the transitions of the race.
+
+    Returns
+    -------
+    locs : list of str
+        All the location strings that can be reached.
+    index : dictionary
+        The location string to its index in locs.
+    moves : dictionary
+        The destinations of each (loc, way, steps), where way is land,
+        sea or air (steps 0).
+    """
+    locs = list(map.abbs)
+    index = {a: x for x, a in enumerate(locs)}
+    moves = {}
+    queue = list(locs)
+    while queue:
+        loc = queue.pop()
+        if is_city(loc):
+            ways = []
+            if map.land_routes[loc]:
+                ways.append("land")
+            if map.sea_routes[loc]:
+                ways.append("sea")
+            if map.air_routes[loc]:
+                moves[(loc, "air", 0)] = list(map.air_routes[loc])
+        else:
+            ways = ["sea" if offshore(loc) else "land"]
+        for way in ways:
+            for steps in range(1, 7):
+                dests = _options(loc, steps, way == "sea")
+                moves[(loc, way, steps)] = dests
+                for dest in dests:
+                    if dest not in index:
+                        index[dest] = len(locs)
+                        locs.append(dest)
+                        queue.append(dest)
+    return locs, index, moves
+
+
+def _table(rows, sentinel):
+    """Returns the lists of indices as a padded array."""
+    width = max([len(a) for a in rows] + [1])
+    table = np.full((len(rows), width), sentinel, dtype=np.int64)
+    for x, row in enumerate(rows):
+        table[x, : len(row)] = row
+    return table
+
+
+@cache
+def transitions():
+    """Returns the transitions of the race as index arrays.
+
+    The states are flattened as loc * specials + special, and the index
+    specials * len(locs) is a sentinel with an infinite value, used for
+    padding. The arrays are (locs, 6, destinations) for the dice and
+    (locs, destinations) for the forced sea travel and the flights.
+    """
+    locs, index, moves = board()
+    sentinel = specials * len(locs)
+
+    def flat(dest, special):
+        return index[dest] * specials + special_after(dest, special)
+
+    def dice_table(way):
+        rows = []
+        for loc in locs:
+            for steps in range(1, 7):
+                dests = moves.get((loc, way, steps), [])
+                rows.append([flat(a, 0) for a in dests])
+        return _table(rows, sentinel).reshape(len(locs), 6, -1)
+
+    forced = []
+    air = []
+    for loc in locs:
+        if is_city(loc) and not map.sea_routes[loc]:
+            forced.append([])
+        elif is_city(loc) or offshore(loc):
+            forced.append([flat(a, 1) for a in _options(loc, 2, True)])
+        else:
+            forced.append([])
+        air.append([flat(a, 0) for a in moves.get((loc, "air", 0), [])])
+    city = np.array([is_city(a) for a in locs])
+    at_sea = np.array([not is_city(a) and offshore(a) for a in locs])
+    has_land = np.array([is_city(a) and bool(map.land_routes[a]) for a in locs])
+    has_sea = np.array([is_city(a) and bool(map.sea_routes[a]) for a in locs])
+    has_air = np.array([is_city(a) and bool(map.air_routes[a]) for a in locs])
+    home = np.array([a in homes for a in locs])
+    return {
+        "land": dice_table("land"),
+        "sea": dice_table("sea"),
+        "forced": _table(forced, sentinel),
+        "air": _table(air, sentinel),
+        "city": city,
+        "at_sea": at_sea,
+        "has_land": has_land,
+        "has_sea": has_sea,
+        "has_air": has_air,
+        "home": home,
+    }
+
+
+def _dice_value(values, table):
+    """Returns one turn plus the mean over the dice of the best move."""
+    return 1 + values[table].min(axis=2).mean(axis=1)
+
+
+def _step(level, values, lower, tr):
+    """Returns the Q-values of the actions and the new values."""
+    q = np.full((len(tr["city"]), len(actions)), np.inf)
+    q[:, 0] = _dice_value(values, tr["land"])
+    if level >= 1:
+        paid = _dice_value(lower[level - 1], tr["sea"])
+    else:
+        paid = 1 + values[tr["forced"]].min(axis=1)
+    free = _dice_value(values, tr["sea"])
+    q[:, 1] = np.where(tr["city"], paid, free)
+    if level >= 3:
+        q[:, 2] = 1 + lower[level - 3][tr["air"]].min(axis=1)
+    # which actions are possible in each location
+    possible = np.stack(
+        [
+            np.where(tr["city"], tr["has_land"], ~tr["at_sea"]),
+            np.where(tr["city"], tr["has_sea"], tr["at_sea"]),
+            tr["has_air"] & (level >= 3),
+        ],
+        axis=1,
+    )
+    q = np.where(possible, q, np.inf)
+    free_value = np.where(tr["home"], 0, q.min(axis=1))
+    forced_value = np.where(
+        tr["at_sea"], 1 + values[tr["forced"]].min(axis=1), free_value
+    )
+    forced_value = np.where(tr["home"], 0, forced_value)
+    new = np.empty_like(values)
+    new[:-1] = np.stack(
+        [free_value, forced_value, 3 + free_value, 3 + free_value], axis=1
+    ).ravel()
+    new[-1] = np.inf
+    return q, new
+
+
+@cache
+def solve(tolerance=1e-10):
+    """Solves the race home with value iteration.
+
+    Returns
+    -------
+    values : array of float
+        The expected amount of turns home, (money levels, flat states)
+        with the sentinel as the last value.
+    policy : array of int
+        The best action (see actions) in each location when free,
+        (money levels, locs), -1 if there is nothing to decide.
+    """
+    tr = transitions()
+    size = len(tr["city"])
+    values = np.full((max_money + 1, size * specials + 1), np.inf)
+    policy = np.full((max_money + 1, size), -1, dtype=np.int64)
+    for level in range(max_money + 1):
+        # the values with less money are an upper bound
+        current = values[level - 1].copy() if level else np.full(size * specials + 1, 1e6)
+        current[-1] = np.inf
+        while True:
+            q, new = _step(level, current, values, tr)
+            new = np.minimum(new, 1e6)
+            new[-1] = np.inf
+            change = np.abs(new[:-1] - current[:-1]).max()
+            current = new
+            if change < tolerance:
+                break
+        values[level] = current
+        policy[level] = np.where(np.isfinite(q).any(axis=1), q.argmin(axis=1), -1)
+    return values, policy
+
+
+def level(money):
+    """Returns the money level of the amount of money."""
+    return min(money // 100, max_money)
+
+
+def scores(loc_strs, money, forced=False):
+    """Returns the expected turns home after moving to the locations.
+
+    Parameters
+    ----------
+    loc_strs : list of str
+        The locations the player could reach this turn.
+    money : int
+        How much money the player has after paying for this turn.
+    forced : bool, optional
+        Whether the player is travelling by sea with no money. Defaults
+        to False.
+
+    Returns
+    -------
+    array of float
+    """
+    values, _ = solve()
+    _, index, _ = board()
+    special = 1 if forced else 0
+    states = [index[a] * specials + special_after(a, special) for a in loc_strs]
+    return values[level(money)][states]
+
+
+def best_action(loc, money):
+    """Returns the best way to travel home from the city: land, sea or air."""
+    _, policy = solve()
+    _, index, _ = board()
+    return actions[policy[level(money)][index[loc]]]
+
+
+def expected_turns(loc, money, special=0):
+    """Returns the expected turns home at the beginning of a turn.
+
+    A player working as a slave (special 4-6) first waits the turns.
+    """
+    values, _ = solve()
+    _, index, _ = board()
+    if special >= 4:
+        return special - 3 + expected_turns(loc, money)
+    return values[level(money)][index[loc] * specials + special]
+
+
+# The race outcome: when the Star of Africa and all the horseshoes are
+# found, the players who can still win just race home and nothing they
+# do affects the others. The turns each of them needs follow the
+# policy above, so the distributions of the turns can be calculated
+# and the winner sampled from them instead of playing the race.
+
+# the distributions cover this many turns; the probability to need
+# more is below 1e-15
+race_turns = 120
+
+
+def _successors(money_level):
+    """Returns the six equally likely successors of each state.
+
+    The successors are flat indices into the stacked distributions of
+    the money levels (money_level, money_level - 1, money_level - 3).
+    """
+    values, policy = solve()
+    tr = transitions()
+    size = len(tr["city"])
+    n = size * specials
+
+    def chosen(table, level):
+        # the destination choose_home picks: the first one of the best
+        picked = np.take_along_axis(
+            table, values[level][table].argmin(axis=-1)[..., None], axis=-1
+        )[..., 0]
+        # the rows without destinations are never used
+        return np.where(picked == n, 0, picked)
+
+    land = chosen(tr["land"], money_level)
+    free_sea = chosen(tr["sea"], money_level)
+    forced = np.repeat(chosen(tr["forced"], money_level)[:, None], 6, axis=1)
+    if money_level >= 1:
+        paid_sea = chosen(tr["sea"], money_level - 1) + n
+    else:
+        paid_sea = forced
+    if money_level >= 3:
+        air = np.repeat(chosen(tr["air"], money_level - 3)[:, None], 6, axis=1) + 2 * n
+    else:
+        air = forced
+    action = policy[money_level]
+    free = np.where(
+        tr["city"][:, None],
+        np.where((action == 0)[:, None], land, np.where((action == 1)[:, None], paid_sea, air)),
+        np.where(tr["at_sea"][:, None], free_sea, land),
+    )
+    own = np.arange(size) * specials
+    succ = np.empty((size, specials, 6), dtype=np.int64)
+    succ[:, 0] = free
+    succ[:, 1] = np.where(tr["at_sea"][:, None], forced, free)
+    # the player escapes with 1 or 2
+    for special in (2, 3):
+        succ[:, special, :2] = own[:, None]
+        succ[:, special, 2:] = (own + special)[:, None]
+    succ[tr["home"]] = (own[tr["home"], None, None] + np.arange(specials)[:, None])
+    return succ.reshape(n, 6)
+
+
+_race_cdfs = {}
+
+
+def race_cdf(money_level):
+    """Returns the probabilities to be home within the turns.
+
+    Returns
+    -------
+    array of float
+        (flat states, race_turns + 1): the probability that the player
+        in the state (at the beginning of the turn) is home within t
+        turns.
+    """
+    if money_level in _race_cdfs:
+        return _race_cdfs[money_level]
+    tr = transitions()
+    n = len(tr["city"]) * specials
+    lower = [race_cdf(a) if a >= 0 else np.zeros((n, race_turns + 1))
+             for a in (money_level - 1, money_level - 3)]
+    succ = _successors(money_level)
+    cdf = np.zeros((n, race_turns + 1))
+    cdf[:, 0] = np.repeat(tr["home"], specials)
+    for t in range(1, race_turns + 1):
+        stacked = np.concatenate([cdf[:, t - 1], lower[0][:, t - 1], lower[1][:, t - 1]])
+        cdf[:, t] = stacked[succ].mean(axis=1)
+    cdf.flags.writeable = False
+    _race_cdfs[money_level] = cdf
+    return cdf
+
+
+def turns_pmf(location, money, special=0):
+    """Returns the distribution of the turns home of a player.
+
+    Returns
+    -------
+    array of float
+        The probability to get home exactly on the turn t.
+    """
+    _, index, _ = board()
+    wait = 0
+    if special >= 4:
+        # a slave first waits the turns
+        wait = special - 3
+        special = 0
+    cdf = race_cdf(level(money))[index[location] * specials + special]
+    pmf = np.diff(cdf, prepend=0)
+    return np.concatenate([np.zeros(wait), pmf])[: race_turns + 1]
+
+
+def racers(game):
+    """Returns the players of the game who can still win."""
+    return [a for a in game.players if a.has_star or a.has_horseshoe]
+
+
+def is_pure_race(game):
+    """Whether the rest of the game is a race home of independent players.
+
+    This is the case when the Star of Africa and all the horseshoes are
+    found (nobody else can win anymore) and Cape Town has been visited
+    (no one gets the 500 pounds anymore). The money of the players must
+    be within the solved money levels, and all of them must be AIs.
+    """
+    return (
+        not game.human_game
+        and game.star_found
+        and game.horseshoes_found == 5
+        and game.cape_visit
+        and all(a.money <= 100 * max_money for a in racers(game))
+    )
+
+
+def _rounds(game):
+    """Returns the racers and the round of their first turn."""
+    turn, turn_no = game.turn, game.turn_no
+    if turn == len(game.players):
+        turn, turn_no = 0, turn_no + 1
+    result = []
+    for seat, racer in enumerate(game.players):
+        if racer.has_star or racer.has_horseshoe:
+            # the players before the turn have already played this round
+            result.append((seat, racer, turn_no + (seat < turn)))
+    return result
+
+
+def race_outcome(game):
+    """Returns the exact outcome distribution of the race.
+
+    Returns
+    -------
+    wins : dictionary
+        The probability of each racer (the name) to win.
+    turn_no : array of float
+        The probability that the game ends on the turn t.
+    """
+    seats = _rounds(game)
+    first = min(a[2] for a in seats)
+    length = race_turns + 3
+    # the probability of each racer to be home on the round first + r
+    pmfs = []
+    for seat, racer, start in seats:
+        pmf = np.zeros(length)
+        dist = turns_pmf(racer.location, racer.money, racer.special)[1:]
+        shift = start - first
+        pmf[shift : shift + len(dist)] = dist[: length - shift]
+        pmfs.append(pmf)
+    wins = {}
+    ends = np.zeros(length)
+    for x, (seat, racer, _) in enumerate(seats):
+        chance = pmfs[x].copy()
+        for y, (other, _, _) in enumerate(seats):
+            if y == x:
+                continue
+            within = np.cumsum(pmfs[y])
+            # the ones before in the order must not be home in the round
+            if other < seat:
+                chance *= 1 - within
+            else:
+                chance *= 1 - np.concatenate([[0], within[:-1]])
+        wins[racer.name] = float(chance.sum())
+        ends += chance
+    turn_no = np.zeros(first + length)
+    turn_no[first:] = ends
+    return wins, turn_no
+
+
+def finish_race(game, rng):
+    """Samples the winner of the race and ends the game.
+
+    Every racer's turns home are sampled from the distribution of
+    their state; the one who gets home on the earliest round wins, and
+    in the same round the one who moves first. Sets the winner and the
+    turn_no of the game.
+
+    Parameters
+    ----------
+    game : Game
+        A game where is_pure_race is True.
+    rng : random.Random or module random
+        The random number generator.
+    """
+    best = None
+    for seat, racer, start in _rounds(game):
+        pmf = turns_pmf(racer.location, racer.money, racer.special)
+        turns = int(np.searchsorted(np.cumsum(pmf), rng.random()))
+        turns = max(turns, 1)
+        end = (start + turns - 1, seat)
+        if best is None or end < best[0]:
+            best = (end, racer)
+    (turn_no, seat), winner = best
+    game.turn_no = turn_no
+    game.turn = seat + 1
+    game.winner = winner
+
+
+def check_endgame(no_games=2000, elimination=True):
+    """Checks that the shortcut gives the same statistics as playing.
+
+    The AI games are played until the race home begins. From there the
+    race is both played to the end and finished with the shortcut, and
+    both are compared with the exact outcome distribution: the sums of
+    the differences between the win of the favourite and its
+    probability, and between the last turn and its expected value,
+    divided by their standard deviations. These z-scores should be
+    standard normal variables if the shortcut is right.
+
+    Returns
+    -------
+    dictionary
+        The amount of races and the z-scores of the wins and the turns
+        of the played and the shortcut races.
+    """
+    import copy
+    import random
+    import initialize
+
+    sums = {a: np.zeros(4) for a in ("played", "shortcut")}
+    races = 0
+    for x in range(no_games):
+        random.seed(x)
+        game = initialize.init_AI(elimination)
+        while game.winner is None and not is_pure_race(game):
+            game.play()
+        if game.winner is not None:
+            continue
+        races += 1
+        wins, turn_no = race_outcome(game)
+        favourite = max(wins, key=wins.get)
+        chance = wins[favourite]
+        turns = np.arange(len(turn_no))
+        mean = (turns * turn_no).sum()
+        variance = ((turns - mean) ** 2 * turn_no).sum()
+        played = copy.deepcopy(game)
+        while played.winner is None:
+            played.play()
+        shortcut = copy.deepcopy(game)
+        finish_race(shortcut, random)
+        for name, result in (("played", played), ("shortcut", shortcut)):
+            sums[name] += [
+                (result.winner.name == favourite) - chance,
+                chance * (1 - chance),
+                result.turn_no - mean,
+                variance,
+            ]
+    result = {"races": races}
+    for name, (win_diff, win_var, turn_diff, turn_var) in sums.items():
+        result[f"{name}_wins_z"] = float(win_diff / win_var**0.5) if win_var else 0.0
+        result[f"{name}_turns_z"] = float(turn_diff / turn_var**0.5) if turn_var else 0.0
+    return result
+
+
+if __name__ == "__main__":
+    result = check_endgame()
+    print(f"{result['races']} races were checked.")
+    for name in ("played", "shortcut"):
+        print(f"The {name} races: z-score of the favourite winning "
+              + f"{round(result[name + '_wins_z'], 3)}, of the game length "
+              + f"{round(result[name + '_turns_z'], 3)}.")
+    if max(abs(a) for a in list(result.values())[1:]) > 4:
+        print("The shortcut does NOT match the played games!")
+    else:
+        print("The shortcut matches the played games.")
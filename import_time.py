@@ -0,0 +1,96 @@
+import argparse
+import statistics
+import subprocess
+import sys
+
+# The workers of the process pools (ai_game.py, sweep.py, tuner.py,
+# distributed.py) import the engine again in every new process, so the
+# engine should import fast. NumPy is the one heavy dependency of the
+# engine (the scoring of the AI, the race home and the shortest paths
+# are vectorized), everything else is imported only by the features
+# that need it: win_probability.py by Game.chances, pandas and
+# matplotlib by analysing, argparse by the command lines.
+#
+# This script imports each module of the engine in a fresh interpreter
+# after numpy, measures how long the import takes and checks that no
+# heavy module was imported with it. It exits with 1 if the budget is
+# exceeded, so it can guard the import time of the engine.
+
+# the modules of the engine that the workers import
+engine_modules = ["ai_game", "game", "initialize", "map", "player", "AI_decisions", "home_race"]
+# the modules that the engine should not import
+heavy_modules = [
+    "pandas", "matplotlib", "asyncio", "multiprocessing", "concurrent.futures.process",
+    "argparse", "win_probability",
+]
+
+probe = """
+import sys, time
+import numpy
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+print(" ".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def import_time(module, repeats=5):
+    """Measures the import of the module in fresh interpreters.
+
+    Parameters
+    ----------
+    module : str
+        The name of the module.
+    repeats : int, optional
+        How many interpreters are started. Defaults to 5.
+
+    Returns
+    -------
+    milliseconds : float
+        The median time of the import on top of numpy.
+    heavy : list of str
+        The heavy modules that were imported with the module.
+    """
+    times = []
+    heavy = set()
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", probe.format(module=module, heavy=heavy_modules)],
+            capture_output=True, text=True, check=True,
+        ).stdout.split("\n")
+        times.append(float(output[0]) * 1000)
+        heavy.update(output[1].split())
+    return statistics.median(times), sorted(heavy)
+
+
+def check(modules=engine_modules, budget=30.0, repeats=5, reporter=print):
+    """Checks the import time of the modules against the budget.
+
+    Returns True if every module imports within budget milliseconds
+    and without the heavy modules.
+    """
+    ok = True
+    for module in modules:
+        milliseconds, heavy = import_time(module, repeats)
+        line = f"{module}: {round(milliseconds, 1)} ms"
+        if heavy:
+            line += f", imports {', '.join(heavy)}"
+        if milliseconds > budget or heavy:
+            line += " (FAIL)"
+            ok = False
+        reporter(line)
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Checks that the engine imports fast and without heavy modules."
+    )
+    parser.add_argument("modules", nargs="*", default=engine_modules,
+                        help="the modules to check, the engine by default")
+    parser.add_argument("--budget", type=float, default=30.0,
+                        help="the largest allowed import time in milliseconds on top of numpy")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="how many fresh interpreters are timed per module")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.modules, args.budget, args.repeats) else 1)
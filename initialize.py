@@ -1,31 +1,44 @@
 import random
-import player, game
+import player, game, outcomes
 
 sample_names = ["Amy", "Bea", "Cory", "Dave", "Emma", "Fox"]
+# the most players a game can have by the rules
+max_players = 6
+# the types of the AIs of the AI game
+default_ai_types = [1, 1, 2, 3]
 
-def init_human(elimination=True):
+
+def player_name(x):
+    """Returns the name of the AI x, also beyond the sample names."""
+    if x < len(sample_names):
+        return sample_names[x]
+    return f"AI {x + 1}"
+
+def init_human(elimination=True, ask=input, say=print, delay=3):
     """
     Initializes the game.
 
     Asks the number of players, their names and
     their starting locations. Randomizes the starting order.
-    Check the variable elimination from the Game object documentation.
+    Check the variables elimination, ask, say and delay from the Game
+    object documentation.
 
     Returns a game object with players.
     """
     while True:
-        no_players = int(input("How many players are playing the game (1-6): "))
-        if 1 <= no_players <= 6:
+        no_players = ask(f"How many players are playing the game (1-{max_players}): ")
+        if no_players.isnumeric() and 1 <= int(no_players) <= max_players:
+            no_players = int(no_players)
             break
-        print("The amount of players must be between 1 and 6!")
+        say(f"The amount of players must be between 1 and {max_players}!")
     players = []
     for x in range(no_players):
         while True:
-            decision = input(f"\nIs the player {x+1} a (h)uman or a (c)omputer? ")
+            decision = ask(f"\nIs the player {x+1} a (h)uman or a (c)omputer? ")
 
-            if decision[0].lower() == "c":
+            if decision[:1].lower() == "c":
                 while True:
-                    name = input("Is this computer random (0) or type 1-4? ")
+                    name = ask("Is this computer random (0) or type 1-4? ")
                     match name:
                         case "0":
                             ai_type = random.randint(1, 4)
@@ -52,38 +65,106 @@ def init_human(elimination=True):
                             players.append(player.Player(sample_names[x], 3, "Tan"))
                             break
                         case _:
-                            print("Write a number between 0 and 4!")
+                            say("Write a number between 0 and 4!")
                 break
 
-            if decision[0].lower() == "h":
-                name = input("The name of the player: ")
+            if decision[:1].lower() == "h":
+                name = ask("The name of the player: ")
                 while True:
-                    starting_loc = input(
+                    starting_loc = ask(
                         f"Does {name} start from (T)angier or (C)airo? Write T or C: "
                     )
-                    if starting_loc[0].lower() == "t":
+                    if starting_loc[:1].lower() == "t":
                         starting_loc = "Tan"
                         break
-                    if starting_loc[0].lower() == "c":
+                    if starting_loc[:1].lower() == "c":
                         starting_loc = "Cai"
                         break
-                    print("The starting location must be T or C!")
+                    say("The starting location must be T or C!")
                 players.append(player.Player(name, 0, starting_loc))
                 break
 
-            print("The player needs to be h or c!")
+            say("The player needs to be h or c!")
     random.shuffle(players)
-    return game.Game(players, True, elimination)
+    return game.Game(players, True, elimination, ask=ask, say=say, delay=delay)
 
 
-def init_AI(elimination=True):
-    """Initializes the game when there are only AI players."""
+def init_AI(elimination=True, ai_types=None, starting_locs=None, money=300,
+            endgame_shortcut=False, params=None, max_players=max_players, rng=None, counters=False,
+            occupancy=None):
+    """Initializes the game when there are only AI players.
 
+    By default the game has the four AIs of the AI game: Amy (type 1
+    from Cairo), Bea (type 1 from Tangier), Cory (type 2 from Cairo)
+    and Dave (type 3 from Tangier).
+
+    Parameters
+    ----------
+    elimination : bool, optional
+        Check the variable elimination from the Game object
+        documentation. Defaults to True.
+    ai_types : list of int, optional
+        The types of the AIs, 1-6 of them (or up to max_players). They
+        are named with sample_names in the order, and the AIs after the
+        sixth are named AI 7, AI 8 and so on.
+    starting_locs : list of str, optional
+        The starting locations (Cai or Tan) of the AIs. By default a
+        type 2 starts from Cairo, a type 3 from Tangier and the type 1s
+        from Cairo and Tangier by turns.
+    money : int, optional
+        How much money each AI has in the beginning. Defaults to 300.
+    endgame_shortcut : bool, optional
+        Check the variable endgame_shortcut from the Game object
+        documentation. Defaults to False.
+    params : list of AIParams, optional
+        The parameters of the AIs (see AI_decisions.AIParams) in the
+        order of ai_types, None for the defaults.
+    max_players : int, optional
+        The most AIs a game can have. None sets no limit, e.g. for
+        stress tests with hundreds of AIs (see many_players.py).
+        Defaults to the rules, i.e. the module variable max_players.
+    rng : random.Random, optional
+        The random generator of the game (see the Game object
+        documentation). Defaults to None, i.e. the module random.
+    counters : bool, optional
+        Whether the game counts what happens to each AI (see
+        outcomes.py). The rows of the counters are in the order of
+        ai_types. Defaults to False.
+    occupancy : Occupancy, optional
+        Counts where the AIs spend their turns (see occupancy.py).
+        Defaults to None.
+    """
+    if ai_types is None:
+        ai_types = default_ai_types
+        if starting_locs is None:
+            starting_locs = ["Cai", "Tan", "Cai", "Tan"]
+    if not ai_types or max_players is not None and len(ai_types) > max_players:
+        raise ValueError(f"The amount of players must be between 1 and {max_players}!")
+    if starting_locs is None:
+        starting_locs = default_starting_locs(ai_types)
+    if params is None:
+        params = [None] * len(ai_types)
     players = [
-        player.Player(sample_names[0], 1, "Cai"),
-        player.Player(sample_names[1], 1, "Tan"),
-        player.Player(sample_names[2], 2, "Cai"),
-        player.Player(sample_names[3], 3, "Tan"),
+        player.Player(player_name(x), ai_type, starting_locs[x], money, params[x])
+        for x, ai_type in enumerate(ai_types)
     ]
-    random.shuffle(players)
-    return game.Game(players, False, elimination)
+    # the counters keep the order of the AIs, not that of the turns
+    counters = outcomes.OutcomeCounters(players) if counters else None
+    (rng or random).shuffle(players)
+    return game.Game(players, False, elimination, endgame_shortcut, rng=rng, counters=counters,
+                     occupancy=occupancy)
+
+
+def default_starting_locs(ai_types):
+    """Returns the starting locations that suit the types of the AIs."""
+    starting_locs = []
+    type_1s = 0
+    for ai_type in ai_types:
+        if ai_type == 2:
+            starting_locs.append("Cai")
+        elif ai_type == 3:
+            starting_locs.append("Tan")
+        else:
+            starting_locs.append(["Cai", "Tan"][type_1s % 2])
+            type_1s += 1
+    return starting_locs
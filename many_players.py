@@ -0,0 +1,77 @@
+import argparse
+import random
+import time
+import initialize
+
+# Games with hundreds or thousands of AIs, e.g. for stress tests. The
+# rules are the same as with six players, but there is no limit to the
+# amount of players (see initialize.init_AI). The turn order costs the
+# same for every turn no matter how many players there are: Game.play
+# only looks up the seat of the player again when some players were
+# eliminated, which happens at most once in a game. So the time of a
+# player's turn should stay flat as the amount of players grows, which
+# benchmark measures.
+
+# the mix of the AI types, repeated to the amount of players
+ai_mix = [1, 1, 2, 3]
+
+
+def play_game(seed, no_players, elimination=True):
+    """Plays one AI game with the amount of players.
+
+    Returns
+    -------
+    winner : str
+        The name of the winner.
+    turn_no : int
+        The turn (round) the game ended on.
+    player_turns : int
+        How many turns of single players were played.
+    """
+    random.seed(seed)
+    ai_types = [ai_mix[x % len(ai_mix)] for x in range(no_players)]
+    game = initialize.init_AI(elimination, ai_types, max_players=None)
+    player_turns = 0
+    while game.winner is None:
+        game.play()
+        player_turns += 1
+    return game.winner.name, game.turn_no, player_turns
+
+
+def benchmark(counts=(4, 16, 64, 256, 1024, 4096), player_turns=50000, elimination=True,
+              reporter=print):
+    """Times a player's turn with different amounts of players.
+
+    For each amount, games are played with the seeds 0, 1, ... until
+    at least player_turns turns have been played.
+
+    Returns a list of (amount of players, games, player turns,
+    microseconds per player turn).
+    """
+    results = []
+    for no_players in counts:
+        games = turns = 0
+        t = time.perf_counter()
+        while turns < player_turns:
+            turns += play_game(games, no_players, elimination)[2]
+            games += 1
+        micros = (time.perf_counter() - t) / turns * 10**6
+        results.append((no_players, games, turns, micros))
+        reporter(f"{no_players} players: {games} games, {turns} player turns, "
+                 + f"{round(micros, 1)} µs per player turn.")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Times the AI games with many players."
+    )
+    parser.add_argument("--players", type=int, nargs="+",
+                        default=[4, 16, 64, 256, 1024, 4096],
+                        help="the amounts of players")
+    parser.add_argument("--turns", type=int, default=50000,
+                        help="how many player turns are played with each amount")
+    parser.add_argument("--no-elimination", action="store_true",
+                        help="turns the elimination rules off")
+    args = parser.parse_args()
+    benchmark(args.players, args.turns, not args.no_elimination)
@@ -1,90 +1,24 @@
 from functools import cache, lru_cache
-import numpy as np
+import os
 import re
+import numpy as np
+import board
+
+# the board of the game is defined in africa.json (see board.py)
+africa = board.load_board(os.path.join(os.path.dirname(os.path.abspath(__file__)), "africa.json"))
 
 # exceptions: four Capes, two locations starting with Dar
-abbs = [
-    "Add",
-    "Ain",
-    "Bah",
-    "Can",
-    "Con",
-    "Dare",
-    "Darf",
-    "Dra",
-    "Egy",
-    "Gol",
-    "Gua",
-    "Kan",
-    "Lak",
-    "Mor",
-    "Moz",
-    "Oco",
-    "Sah",
-    "Sie",
-    "Sla",
-    "Sth",
-    "Stm",
-    "Sua",
-    "Tam",
-    "Tim",
-    "Tow",
-    "Tri",
-    "Tun",
-    "Ver",
-    "Vic",
-    "Wha",
-    "Cai",
-    "Tan",
-    "nd0",
-    "nd1",
-    "nd2",
-    "nd3",
-    "nd4",
-    "nd5",
-    "nd6",
-    "nd7",
-    "nd8",
-    "nd9",
-]
-
-full_names = [
-    "Addis Abeba",
-    "Ain-Galaka",
-    "Bahr El Ghasal",
-    "Canary Islands",
-    "Congo",
-    "Daressalam",
-    "Dar-Fur",
-    "Dragon Mountain",
-    "Egypt",
-    "Gold Coast",
-    "Cape Guardafui",
-    "Kandjama",
-    "Lake Victoria",
-    "Morocco",
-    "Mozambique",
-    "Ocomba",
-    "Sahara",
-    "Sierra Leone",
-    "Slave Coast",
-    "St. Helena",
-    "Cape St. Marie",
-    "Suakin",
-    "Tamatave",
-    "Timbuktu",
-    "Capetown",
-    "Tripoli",
-    "Tunis",
-    "Cape Verde",
-    "Victoria Falls",
-    "Whalefish Bay",
-    "Cairo",
-    "Tangier",
-]
+abbs = africa.abbs
+full_names = africa.full_names
+# the cities with a token are the first no_tokens of abbs, then come
+# Cairo and Tangier and the crossroads
+no_tokens = africa.tokens
+no_nodes = len(abbs)
 
 # dictionary: abbreviation to full name
-abb_to_full = {abbs[x]: full_names[x] for x in range(32)}
+abb_to_full = dict(zip(abbs, full_names))
+# dictionary: abbreviation to its index in abbs
+abb_index = africa.index
 
 # There are 10 crossroads ("nodes") in total on the map, marked as ndX
 # e.g. node 0 is nd0
@@ -101,153 +35,35 @@ abb_to_full = {abbs[x]: full_names[x] for x in range(32)}
 # Node 8: between Congo, Gold Coast and Slave Coast
 # Node 9: between Cape Town, St. Helena and Whalefish Bay
 
-land_routes = {
-    "Add": [("Gua", 3), ("Lak", 3), ("Sua", 3)],
-    "Ain": [("Darf", 4), ("nd2", 4)],
-    "Bah": [("Darf", 2), ("Lak", 2)],
-    "Can": [],
-    "Con": [("Kan", 3), ("Oco", 4), ("nd4", 8)],
-    "Dare": [("Gua", 6), ("nd3", 1)],
-    "Darf": [("Ain", 4), ("Bah", 2), ("Egy", 3), ("Sah", 8), ("Sua", 4), ("nd2", 4)],
-    "Dra": [("Vic", 3), ("nd5", 2)],
-    "Egy": [("Darf", 3), ("Tri", 6), ("Cai", 4)],
-    "Gol": [("nd1", 2)],
-    "Gua": [("Add", 3), ("Dare", 6)],
-    "Kan": [("Con", 3), ("nd2", 2)],
-    "Lak": [("Add", 3), ("Bah", 2), ("Oco", 4), ("nd3", 4)],
-    "Mor": [("Ver", 8), ("nd0", 1)],
-    "Moz": [("nd3", 2), ("nd4", 2)],
-    "Oco": [("Con", 4), ("Lak", 4)],
-    "Sah": [("Darf", 8), ("nd0", 4)],
-    "Sie": [("Ver", 4), ("nd1", 3)],
-    "Sla": [("Tim", 5), ("nd2", 3)],
-    "Sth": [],
-    "Stm": [("Tam", 4)],
-    "Sua": [("Add", 3), ("Darf", 4)],
-    "Tam": [("Stm", 4)],
-    "Tim": [("Sla", 5), ("nd1", 2)],
-    "Tow": [("Wha", 4)],
-    "Tri": [("Egy", 6), ("Tun", 3)],
-    "Tun": [("Tri", 3), ("Tan", 5)],
-    "Ver": [("Mor", 8), ("Sie", 4)],
-    "Vic": [("Dra", 3), ("Wha", 4), ("nd5", 2)],
-    "Wha": [("Tow", 4), ("Vic", 4)],
-    "Cai": [("Egy", 4)],
-    "Tan": [("Tun", 5), ("nd0", 1)],
-    "nd0": [("Mor", 1), ("Sah", 4), ("Tan", 1)],
-    "nd1": [("Gol", 2), ("Sie", 3), ("Tim", 2)],
-    "nd2": [("Ain", 4), ("Darf", 4), ("Kan", 2), ("Sla", 3)],
-    "nd3": [("Dare", 1), ("Lak", 4), ("Moz", 2)],
-    "nd4": [("Con", 8), ("Moz", 2), ("nd5", 1)],
-    "nd5": [("Dra", 2), ("Vic", 2), ("nd4", 1)],
-    "nd6": [],
-    "nd7": [],
-    "nd8": [],
-    "nd9": [],
-}
-
-sea_routes = {
-    "Add": [],
-    "Ain": [],
-    "Bah": [],
-    "Can": [("Ver", 5), ("Tan", 3)],
-    "Con": [("Wha", 5), ("nd8", 4)],
-    "Dare": [],
-    "Darf": [],
-    "Dra": [],
-    "Egy": [],
-    "Gol": [("Sie", 5), ("nd8", 3)],
-    "Gua": [("Moz", 8), ("Sua", 5), ("Tam", 8)],
-    "Kan": [],
-    "Lak": [],
-    "Mor": [],
-    "Moz": [("Gua", 8), ("Stm", 3)],
-    "Oco": [],
-    "Sah": [],
-    "Sie": [("Gol", 5), ("nd7", 2)],
-    "Sla": [("nd8", 1)],
-    "Sth": [("nd7", 9), ("nd9", 8)],
-    "Stm": [("Moz", 3), ("Tow", 8)],
-    "Sua": [("Gua", 5), ("Cai", 4)],
-    "Tam": [("Gua", 8)],
-    "Tim": [],
-    "Tow": [("Stm", 8), ("nd9", 2)],
-    "Tri": [("nd6", 1)],
-    "Tun": [("Tan", 3), ("nd6", 2)],
-    "Ver": [("Can", 5), ("nd7", 1)],
-    "Vic": [],
-    "Wha": [("Con", 5), ("nd9", 3)],
-    "Cai": [("Sua", 4), ("nd6", 3)],
-    "Tan": [("Can", 3), ("Tun", 3)],
-    "nd0": [],
-    "nd1": [],
-    "nd2": [],
-    "nd3": [],
-    "nd4": [],
-    "nd5": [],
-    "nd6": [("Tri", 1), ("Tun", 2), ("Cai", 3)],
-    "nd7": [("Sie", 2), ("Sth", 9), ("Ver", 1)],
-    "nd8": [("Con", 4), ("Gol", 3), ("Sla", 1)],
-    "nd9": [("Sth", 8), ("Tow", 2), ("Wha", 3)],
-}
-
-air_routes = {
-    "Add": [],
-    "Ain": [],
-    "Bah": [],
-    "Can": [],
-    "Con": ["Gol", "Wha"],
-    "Dare": [],
-    "Darf": ["Oco", "Sua", "Tri"],
-    "Dra": ["Lak", "Tow"],
-    "Egy": [],
-    "Gol": ["Con", "Mor", "Tri", "Wha"],
-    "Gua": ["Lak", "Tam"],
-    "Kan": [],
-    "Lak": ["Dra", "Gua", "Sua"],
-    "Mor": ["Gol", "Sie", "Tan"],
-    "Moz": [],
-    "Oco": ["Darf", "Tow"],
-    "Sah": [],
-    "Sie": ["Mor", "Sth"],
-    "Sla": [],
-    "Sth": ["Sie", "Tow"],
-    "Stm": ["Tow"],
-    "Sua": ["Darf", "Lak", "Cai"],
-    "Tam": ["Gua", "Tow"],
-    "Tim": [],
-    "Tow": ["Dra", "Oco", "Sth", "Stm", "Tam", "Wha"],
-    "Tri": ["Darf", "Gol", "Tan"],
-    "Tun": [],
-    "Ver": [],
-    "Vic": [],
-    "Wha": ["Con", "Gol", "Tow"],
-    "Cai": ["Sua"],
-    "Tan": ["Mor", "Tri"],
-    "nd0": [],
-    "nd1": [],
-    "nd2": [],
-    "nd3": [],
-    "nd4": [],
-    "nd5": [],
-    "nd6": [],
-    "nd7": [],
-    "nd8": [],
-    "nd9": [],
-}
+# the routes from each node: land_routes and sea_routes have the
+# destinations with the amount of steps, air_routes just the destinations
+land_routes = africa.land_routes
+sea_routes = africa.sea_routes
+air_routes = africa.air_routes
+
+# the location strings where the beduins ambush and the pirates raid
+beduin_squares = africa.beduin_squares
+pirate_squares = africa.pirate_squares
+
+
+# The caches of this module are shared by the threads of
+# ai_game.run_games. The functools caches can be called from several
+# threads at once, and the static ones are filled before the threads
+# start (see caches.warm_up), so that the threads only read them.
 
 
 @cache
-def distances(place, poor):
+def distances(place, poor, sea_penalty=1.75):
     """Returns a list of distances to other nodes in the map.
 
     This function takes in a number refering to abbs and the player's
     financial status (whether the player has money or not) and returns
     a list of distances to all the different nodes in the board. If the
     player has money, the distance is simply the amount of steps to the
-    node. If not, the distance through the sea is multiplied by 1.75
-    (reflecting the fact that the movement through the sea is then
-    slower.) The distances are calculated using Dijkstra's algorithm.
+    node. If not, the distance through the sea is multiplied by
+    sea_penalty (reflecting the fact that the movement through the sea
+    is then slower.) The distances are calculated using Dijkstra's
+    algorithm on the compiled board (see board.py).
 
     Parameters
     ----------
@@ -257,37 +73,20 @@ def distances(place, poor):
         Addis Abeba).
     poor : bool
         If the player has money or not.
+    sea_penalty : float, optional
+        How many times longer the sea is without money. Defaults to
+        1.75 (see AI_decisions.AIParams).
 
     Returns
     -------
     dist: a list of the distances to other nodes in the map
     """
-    size = 42
-    dist = [np.inf] * size
-    visited = [False] * size
-    dist[place] = 0
-    while not all(visited):
-        comp = np.inf
-        current = 0
-        for x in range(size):
-            if not visited[x] and dist[x] < comp:
-                comp = dist[x]
-                current = x
-        for dest in land_routes[abbs[current]]:
-            target = abbs.index(dest[0])
-            dist[target] = min(dist[target], dist[current] + dest[1])
-        for dest in sea_routes[abbs[current]]:
-            target = abbs.index(dest[0])
-            if poor:
-                dist[target] = min(dist[target], dist[current] + 1.75 * dest[1])
-            else:
-                dist[target] = min(dist[target], dist[current] + dest[1])
-        visited[current] = True
-    return dist
+    graph = africa.graph(("land", "sea"), sea_penalty if poor else 1)
+    return board.dijkstra(graph, place).tolist()
 
 
 @lru_cache
-def closest_tokens(unflipped, poor):
+def closest_tokens(unflipped, poor, sea_penalty=1.75):
     """Returns the distance of all nodes to the closest tokens.
 
     This function utilises the function distances and calculates the
@@ -304,104 +103,22 @@ def closest_tokens(unflipped, poor):
         which cities have an unflipped token.
     poor : bool
         If the player has money or not.
+    sea_penalty : float, optional
+        See distances. Defaults to 1.75.
 
     Returns
     -------
     List of lists: the sorted distance to all the unflipped tokens from
     each node in order.
     """
-    cities = np.array([distances(x, poor) for x in range(42) if unflipped[x]])
+    cities = np.array([distances(x, poor, sea_penalty) for x in range(no_nodes) if unflipped[x]])
     return np.sort(np.transpose(cities))
 
 
-dist_gol = [
-    23,
-    16,
-    18,
-    np.inf,
-    17,
-    25,
-    16,
-    28,
-    19,
-    0,
-    26,
-    14,
-    20,
-    17,
-    26,
-    21,
-    22,
-    5,
-    9,
-    np.inf,
-    np.inf,
-    20,
-    np.inf,
-    4,
-    36,
-    25,
-    24,
-    9,
-    28,
-    32,
-    23,
-    19,
-    18,
-    2,
-    12,
-    24,
-    25,
-    26,
-    np.inf,
-    np.inf,
-    np.inf,
-    np.inf,
-]
-dist_tow = [
-    22,
-    27,
-    21,
-    np.inf,
-    19,
-    16,
-    23,
-    11,
-    26,
-    36,
-    22,
-    22,
-    19,
-    36,
-    13,
-    23,
-    31,
-    37,
-    27,
-    np.inf,
-    np.inf,
-    25,
-    np.inf,
-    32,
-    0,
-    32,
-    35,
-    41,
-    8,
-    4,
-    30,
-    36,
-    35,
-    34,
-    24,
-    15,
-    11,
-    10,
-    np.inf,
-    np.inf,
-    np.inf,
-    np.inf,
-]
+# the distances by land to Gold Coast and Cape Town, where the AIs of
+# the types 2 and 3 travel (np.inf if there is no way by land)
+dist_gol = board.dijkstra(africa.graph(("land",)), abb_index["Gol"]).tolist()
+dist_tow = board.dijkstra(africa.graph(("land",)), abb_index["Tow"]).tolist()
 
 
 @cache
@@ -409,23 +126,18 @@ def expected(n):
     """Returns the expected amount of dice rolls for the distance n."""
     if n < 1:
         return 0
-    return (
-        1
-        / 6
-        * (
-            expected(n - 1)
-            + expected(n - 2)
-            + expected(n - 3)
-            + expected(n - 4)
-            + expected(n - 5)
-            + expected(n - 6)
-            + 6
-        )
-    )
+    # the values of the distances n-6...n-1, built up from the distance 1
+    # (not recursively, so that it is fast with any cache, see caches.py)
+    last = [0] * 6
+    for _ in range(n):
+        last = last[1:] + [
+            1 / 6 * (last[5] + last[4] + last[3] + last[2] + last[1] + last[0] + 6)
+        ]
+    return last[5]
 
 
 @cache
-def expected_time(money):
+def expected_time(money, chain_cutoff=31):
     """Returns the expected amount of turns to home for each location.
 
     This method uses the Dijkstra's algorithm and calculates the
@@ -433,10 +145,18 @@ def expected_time(money):
     board to either Cairo or Tangier (the closer one) with a given
     amount of money.
 
+    Legacy: the AIs no longer use this for the race home, which is
+    solved exactly by home_race.py, so it is not tuned with the
+    parameters of the AIs (see AI_decisions.AIParams). It is kept as
+    the approximation of the race the AIs used before.
+
     Parameters
     ----------
     money : int
         The amount of money the player can spend.
+    chain_cutoff : int, optional
+        How many steps by land a chain of moves can have before the
+        dice rolls are counted from its start again. Defaults to 31.
 
     Returns
     -------
@@ -450,17 +170,18 @@ def expected_time(money):
         continue by land travel, the second value the amount of steps
         to there.
     """
-    size = 42
+    size = no_nodes
     dist = [np.inf] * size
     visited = [False] * size
-    dist[30] = 0
-    dist[31] = 0
+    homes = [abb_index["Tan"], abb_index["Cai"]]
+    for home in homes:
+        dist[home] = 0
     travel_way = [""] * size
     # each element: first the target (or itself), then how many steps
     # describes the "chain" effect for land moving and sea moving in nodes
     chain = [None] * size
-    chain[30] = np.array([30, 0])
-    chain[31] = np.array([31, 0])
+    for home in homes:
+        chain[home] = np.array([home, 0])
     while not all(visited):
         comp = np.inf
         current = 0
@@ -471,7 +192,7 @@ def expected_time(money):
         for dest in land_routes[abbs[current]]:
             target = abbs.index(dest[0])
             benchmark = dist[target]
-            if chain[current] is not None and chain[current][1] + dest[1] < 31:
+            if chain[current] is not None and chain[current][1] + dest[1] < chain_cutoff:
                 dist[target] = min(
                     benchmark,
                     dist[current] + expected(dest[1]),
@@ -500,7 +221,7 @@ def expected_time(money):
                 if "nd" in abbs[current]:
                     dist[target] = min(
                         benchmark,
-                        expected_time(money - 100)[abbs[chain[current][0]]][0]
+                        expected_time(money - 100, chain_cutoff)[abbs[chain[current][0]]][0]
                         + expected(chain[current][1] + dest[1]),
                     )
                 # one doesn't need to pay in nodes, only in the harbour when one leaves
@@ -509,7 +230,7 @@ def expected_time(money):
                 else:
                     dist[target] = min(
                         benchmark,
-                        expected_time(money - 100)[abbs[current]][0]
+                        expected_time(money - 100, chain_cutoff)[abbs[current]][0]
                         + expected(dest[1]),
                     )
             if dist[target] != benchmark:
@@ -523,13 +244,13 @@ def expected_time(money):
                 target = abbs.index(dest)
                 benchmark = dist[target]
                 dist[target] = min(
-                    benchmark, expected_time(money - 300)[abbs[current]][0] + 1
+                    benchmark, expected_time(money - 300, chain_cutoff)[abbs[current]][0] + 1
                 )
                 if dist[target] != benchmark:
                     chain[target] = np.array([target, 0])
                     travel_way[target] = "air"
         visited[current] = True
-    return {abbs[x]: (dist[x], travel_way[x], chain[x]) for x in range(42)}
+    return {abbs[x]: (dist[x], travel_way[x], chain[x]) for x in range(no_nodes)}
 
 
 def locstr(location, offshore, unflipped):
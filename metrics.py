@@ -0,0 +1,170 @@
+import json
+import os
+import time
+from collections import deque
+import AI_decisions
+import caches
+
+
+def cache_stats():
+    """Returns the hits, misses, size and bytes of the caches."""
+    stats = {
+        name: {a: value[a] for a in ("hits", "misses", "size", "hit_rate", "bytes")}
+        for name, value in caches.stats().items()
+    }
+    if AI_decisions.decision_cache is not None:
+        decision = AI_decisions.decision_cache.stats()
+        stats["decisions"] = {
+            "hits": decision["hits"],
+            "misses": decision["misses"],
+            "size": decision["size"],
+            "hit_rate": decision["hit_rate"],
+            "bytes": None,
+        }
+    return stats
+
+
+class MetricsReporter:
+    """
+    Reports the progress of a run while it is going
+
+    The reporter is called after every game, but it only writes the
+    metrics every interval seconds, so that the reporting costs next
+    to nothing. The metrics are appended into a JSON-lines file and
+    written into a Prometheus text file, which a local scraper (e.g.
+    the textfile collector of the node exporter) can read.
+
+    ...
+
+    Attributes
+    ----------
+    total : int
+        How many games the run plays in total, None if not known.
+    done : int
+        How many games have been completed.
+    worker : str
+        The label of the worker (process) in the metrics.
+    interval : float
+        How many seconds there are between the reports.
+    turns : deque of int
+        The lengths of the latest games for the rolling mean.
+
+    Methods
+    -------
+    game
+        Is called after every game with the row of the game
+    snapshot
+        Returns the current metrics as a dictionary
+    write
+        Writes the current metrics into the files
+    """
+
+    def __init__(self, total, jsonl="metrics.jsonl", prom="metrics.prom",
+                 interval=10, worker=None, done=0, window=10**3):
+        """
+        Parameters
+        ----------
+        total : int
+            How many games the run plays in total, None if not known
+            (e.g. a worker of distributed.py).
+        jsonl : str, optional
+            The JSON-lines file, None if not written.
+        prom : str, optional
+            The Prometheus text file, None if not written.
+        interval : float, optional
+            How many seconds there are between the reports. Defaults
+            to 10.
+        worker : str, optional
+            The label of the worker. Defaults to the process id.
+        done : int, optional
+            How many games were completed before (e.g. when the run
+            continues from a checkpoint). Defaults to 0.
+        window : int, optional
+            Over how many latest games the rolling mean of the game
+            length is calculated. Defaults to 1000.
+        """
+        self.total = total
+        self.jsonl = jsonl
+        self.prom = prom
+        self.interval = interval
+        self.worker = worker if worker is not None else str(os.getpid())
+        self.done = done
+        self.turns = deque(maxlen=window)
+        self.turns_sum = 0
+        self.start_done = done
+        self.start = time.monotonic()
+        self.next_report = self.start + interval
+
+    def game(self, row):
+        """Adds the game (a row of ai_game) and reports if it is time."""
+        self.done += 1
+        if len(self.turns) == self.turns.maxlen:
+            self.turns_sum -= self.turns[0]
+        self.turns.append(row[1])
+        self.turns_sum += row[1]
+        if time.monotonic() >= self.next_report:
+            self.write()
+
+    def snapshot(self):
+        """Returns the current metrics as a dictionary."""
+        now = time.monotonic()
+        elapsed = now - self.start
+        rate = (self.done - self.start_done) / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = (self.total - self.done) / rate
+        return {
+            "time": time.time(),
+            "worker": self.worker,
+            "games_completed": self.done,
+            "games_total": self.total,
+            "games_per_second": rate,
+            "eta_seconds": eta,
+            "rolling_mean_turns": self.turns_sum / len(self.turns) if self.turns else None,
+            "elapsed_seconds": elapsed,
+            "caches": cache_stats(),
+        }
+
+    def write(self):
+        """Writes the current metrics into the files."""
+        metrics = self.snapshot()
+        if self.jsonl is not None:
+            with open(self.jsonl, "a") as file:
+                file.write(json.dumps(metrics) + "\n")
+        if self.prom is not None:
+            label = f'worker="{self.worker}"'
+            lines = [
+                "# TYPE star_games_completed counter",
+                f"star_games_completed{{{label}}} {metrics['games_completed']}",
+                "# TYPE star_games_per_second gauge",
+                f"star_games_per_second{{{label}}} {metrics['games_per_second']}",
+            ]
+            if metrics["games_total"] is not None:
+                lines += [
+                    "# TYPE star_games_total gauge",
+                    f"star_games_total{{{label}}} {metrics['games_total']}",
+                ]
+            if metrics["eta_seconds"] is not None:
+                lines += [
+                    "# TYPE star_eta_seconds gauge",
+                    f"star_eta_seconds{{{label}}} {metrics['eta_seconds']}",
+                ]
+            if metrics["rolling_mean_turns"] is not None:
+                lines += [
+                    "# TYPE star_rolling_mean_turns gauge",
+                    f"star_rolling_mean_turns{{{label}}} {metrics['rolling_mean_turns']}",
+                ]
+            for kind in ("hits", "misses", "size", "hit_rate", "bytes"):
+                lines.append(f"# TYPE star_cache_{kind} gauge")
+                for cache, stats in metrics["caches"].items():
+                    if stats[kind] is None:
+                        continue
+                    lines.append(
+                        f'star_cache_{kind}{{{label},cache="{cache}"}} {stats[kind]}'
+                    )
+            # write and rename, so that the scraper never reads half a file
+            with open(self.prom + ".tmp", "w") as file:
+                file.write("\n".join(lines) + "\n")
+            os.replace(self.prom + ".tmp", self.prom)
+        self.next_report = time.monotonic() + self.interval
+        return metrics
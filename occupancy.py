@@ -0,0 +1,258 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import map
+import ai_game
+
+# Where the AIs spend their turns. An Occupancy counts into
+# preallocated arrays, which Game.move, Game.stuck, Game.slave,
+# Game.try_flip and the movement decisions add to when the game has one
+# (see initialize.init_AI), so a turn costs a look-up of its square and
+# one or two additions. The same Occupancy counts all the games of a
+# process:
+#   squares: the moves that ended on each square, by the way of travel
+#   edges: the moves that ended between the two nodes of each route
+#   stuck: the turns stuck with the beduins or the pirates on each square
+#   turns: all the turns by what was done in them (see turn_kinds)
+# The squares are the nodes (in the order of map.abbs) and then the
+# squares between them, route by route. The counts of many games, e.g.
+# of the workers of a process pool, are added together with merge.
+
+ways = ["land", "sea", "air"]
+turn_kinds = ["land", "sea", "air", "flip", "stuck", "slave"]
+LAND, SEA, AIR, FLIP, STUCK, SLAVE = range(len(turn_kinds))
+
+
+def node_name(x):
+    """Returns the full name of the node, the abb for a crossroads."""
+    if x < len(map.full_names):
+        return map.full_names[x]
+    return map.abbs[x]
+
+
+def build_squares():
+    """Numbers the squares and the routes of the board.
+
+    Returns
+    -------
+    square_index : dictionary
+        (location string, offshore) -> the index of the square. Both
+        location strings of a square between nodes are included.
+    square_edge : list of int
+        The route of each square, -1 for the nodes.
+    edge_names : list of str
+        The name of each route, e.g. "Cairo - Egypt (land)".
+    """
+    square_index = {}
+    for abb in map.abbs:
+        square_index[(abb, False)] = square_index[(abb, True)] = map.abb_index[abb]
+    square_edge = [-1] * map.no_nodes
+    edge_names = []
+    for offshore, routes in ((False, map.land_routes), (True, map.sea_routes)):
+        for first in map.abbs:
+            for second, steps in routes[first]:
+                # every route once, from the node that comes first
+                if map.abb_index[second] < map.abb_index[first]:
+                    continue
+                edge = len(edge_names)
+                edge_names.append(
+                    f"{node_name(map.abb_index[first])} - {node_name(map.abb_index[second])} "
+                    + f"({ways[offshore]})"
+                )
+                for step in range(1, steps):
+                    square = len(square_edge)
+                    square_index[(f"{first}-{second}-{step}-{steps - step}", offshore)] = square
+                    square_index[(f"{second}-{first}-{steps - step}-{step}", offshore)] = square
+                    square_edge.append(edge)
+    return square_index, square_edge, edge_names
+
+
+square_index, square_edge, edge_names = build_squares()
+no_squares = len(square_edge)
+
+
+def square_name(square):
+    """Returns a readable name of the square."""
+    if square < map.no_nodes:
+        return node_name(square)
+    edge = square_edge[square]
+    step = square - square_edge.index(edge) + 1
+    return f"{edge_names[edge]} step {step}"
+
+
+class Occupancy:
+    """
+    The counts of where the players spend their turns
+
+    ...
+
+    Attributes
+    ----------
+    squares : numpy array
+        The moves that ended on each square (a row) by each of ways (a
+        column).
+    edges : numpy array
+        The moves that ended between the nodes of each route.
+    stuck : numpy array
+        The turns stuck with the beduins or the pirates on each square.
+    turns : numpy array
+        The turns of each of turn_kinds.
+    way : int
+        The way of the move that is being made (an index of ways).
+
+    Methods
+    -------
+    travel
+        Counts a turn of travel and remembers its way
+    move
+        Counts the square where a move ended
+    count_flip
+        Counts a turn of trying to flip a token
+    count_slave
+        Counts a turn as a slave
+    count_stuck
+        Counts a turn stuck on the square
+    merge
+        Adds the counts of another Occupancy
+    save
+        Saves the counts into a .npz file
+    load
+        Loads the counts of a .npz file (a class method)
+    report
+        Returns a readable summary of the counts
+    """
+
+    def __init__(self):
+        self.squares = np.zeros([no_squares, len(ways)], dtype=np.int64)
+        self.edges = np.zeros(len(edge_names), dtype=np.int64)
+        self.stuck = np.zeros(no_squares, dtype=np.int64)
+        self.turns = np.zeros(len(turn_kinds), dtype=np.int64)
+        self.way = LAND
+
+    def travel(self, decision):
+        """Counts a turn of travel (land, sea, sea_forced or air)."""
+        if decision == "air":
+            self.way = AIR
+        elif decision == "land":
+            self.way = LAND
+        else:
+            self.way = SEA
+        self.turns[self.way] += 1
+
+    def move(self, new_loc, offshore):
+        """Counts the square where a move by self.way ended."""
+        square = square_index[(new_loc, offshore)]
+        self.squares[square, self.way] += 1
+        if square >= map.no_nodes:
+            self.edges[square_edge[square]] += 1
+
+    def count_flip(self):
+        """Counts a turn of trying to flip a token."""
+        self.turns[FLIP] += 1
+
+    def count_slave(self):
+        """Counts a turn as a slave."""
+        self.turns[SLAVE] += 1
+
+    def count_stuck(self, loc, offshore):
+        """Counts a turn stuck with the beduins or the pirates."""
+        self.stuck[square_index[(loc, offshore)]] += 1
+        self.turns[STUCK] += 1
+
+    def merge(self, other):
+        """Adds the counts of the other Occupancy to these."""
+        self.squares += other.squares
+        self.edges += other.edges
+        self.stuck += other.stuck
+        self.turns += other.turns
+        return self
+
+    def save(self, filename):
+        """Saves the counts into a .npz file."""
+        np.savez_compressed(
+            filename, squares=self.squares, edges=self.edges, stuck=self.stuck, turns=self.turns
+        )
+
+    @classmethod
+    def load(cls, filename):
+        """Returns the counts saved into the .npz file."""
+        occupancy = cls()
+        with np.load(filename) as data:
+            for name in ("squares", "edges", "stuck", "turns"):
+                getattr(occupancy, name)[:] = data[name]
+        return occupancy
+
+    def report(self, top=10):
+        """Returns a readable summary of the counts.
+
+        The shares of the kinds of turns, and the squares, cities,
+        routes and stuck squares with the most turns.
+        """
+        total = self.turns.sum()
+        if not total:
+            return "No turns have been counted."
+        msg = "The turns were spent: " + ", ".join(
+            f"{kind} {round(count / total * 100, 2)} %"
+            for kind, count in zip(turn_kinds, self.turns)
+        ) + ".\n"
+        moves = self.squares.sum(axis=1)
+        msg += f"The squares where the most moves ended (of {moves.sum()}):\n"
+        for square in np.argsort(-moves, kind="stable")[:top]:
+            by_way = ", ".join(
+                f"{way} {count}" for way, count in zip(ways, self.squares[square]) if count
+            )
+            msg += f"  {square_name(square)}: {moves[square]} ({by_way})\n"
+        cities = moves[: len(map.full_names)]
+        msg += "The cities where the most moves ended:\n"
+        for x in np.argsort(-cities, kind="stable")[:top]:
+            msg += f"  {map.full_names[x]}: {cities[x]}\n"
+        msg += "The routes where the most moves ended:\n"
+        for edge in np.argsort(-self.edges, kind="stable")[:top]:
+            msg += f"  {edge_names[edge]}: {self.edges[edge]}\n"
+        msg += "Where the players got stuck:\n"
+        for square in np.flatnonzero(self.stuck):
+            msg += f"  {square_name(square)}: {self.stuck[square]} turns\n"
+        return msg
+
+
+def count_games(start, stop, elimination=True):
+    """Plays the games with the seeds start, ..., stop - 1.
+
+    Returns the Occupancy of the games.
+    """
+    occupancy = Occupancy()
+    ai_game.run_games(start, stop, elimination, occupancy=occupancy)
+    return occupancy
+
+
+def count_pool(no_games, elimination=True, workers=None, chunk=1000):
+    """Counts the games in a process pool and merges the counts."""
+    occupancy = Occupancy()
+    with ProcessPoolExecutor(workers) as pool:
+        starts = range(0, no_games, chunk)
+        stops = [min(start + chunk, no_games) for start in starts]
+        for part in pool.map(count_games, starts, stops, [elimination] * len(starts)):
+            occupancy.merge(part)
+    return occupancy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Counts where the AIs spend their turns."
+    )
+    parser.add_argument("--games", type=int, default=10000, help="the amount of games")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the amount of worker processes, all the cores by default")
+    parser.add_argument("--no-elimination", action="store_true",
+                        help="turns the elimination rules off")
+    parser.add_argument("--out", default="occupancy.npz", help="the file of the counts")
+    parser.add_argument("--top", type=int, default=10,
+                        help="how many squares, cities and routes are listed")
+    args = parser.parse_args()
+
+    t = time.time()
+    occupancy = count_pool(args.games, not args.no_elimination, args.workers)
+    occupancy.save(args.out)
+    print(occupancy.report(args.top))
+    print(f"It took {round(time.time()-t, 3)} seconds to run this.")
@@ -0,0 +1,92 @@
+import numpy as np
+
+# Counters of what happened to each player in a game, e.g. for the
+# questions about money, robberies and the turns lost that the four
+# columns of the results can't answer. The counters of a game are one
+# preallocated array (a row for each player), which Game.flip,
+# Game.move, Game.stuck, Game.slave and the movement decisions add to,
+# so counting costs one addition into the array per event. A game
+# only counts if it has counters (see initialize.init_AI), otherwise
+# the hooks cost a check of None.
+#
+# The money spent is not counted, as it follows from the others: the
+# starting money + earned - robbed - money.
+
+# the counters of a player, the indices of the columns of the array
+counter_names = [
+    "flips",         # tokens flipped
+    "robberies",     # robbers found
+    "robbed",        # pounds lost to the robbers
+    "earned",        # pounds found in the tokens and got in Cape Town
+    "flights",       # turns travelled by plane
+    "sea turns",     # turns travelled by ship
+    "beduin turns",  # turns stuck with the beduins
+    "pirate turns",  # turns stuck with the pirates
+    "slave turns",   # turns as a slave in Slave Coast
+    "money",         # the money at the end of the game
+]
+FLIPS, ROBBERIES, ROBBED, EARNED, FLIGHTS, SEA_TURNS, BEDUIN_TURNS, PIRATE_TURNS, \
+    SLAVE_TURNS, MONEY = range(len(counter_names))
+# the type of the columns
+dtype = np.int32
+
+
+def columns(names):
+    """Returns the names of the columns of the counters of the players."""
+    return [f"{name} {counter}" for name in names for counter in counter_names]
+
+
+def dtypes(names):
+    """Returns the types of the columns of the players, e.g. for pandas."""
+    return {column: dtype for column in columns(names)}
+
+
+class OutcomeCounters:
+    """
+    The counters of the players of a game
+
+    ...
+
+    Attributes
+    ----------
+    players : list of Player objects
+        The players in the order of the rows, i.e. in the order they
+        were created, not in the order of the turns.
+    rows : dictionary
+        The row of each player.
+    counts : numpy array
+        The counters, a row for each player and a column for each of
+        counter_names.
+
+    Methods
+    -------
+    add
+        Adds to a counter of a player
+    finish
+        Records the money of the players at the end of the game
+    values
+        Returns the counters as a flat list of ints (the columns)
+    """
+
+    def __init__(self, players):
+        """
+        Parameters
+        ----------
+        players : list of Player objects
+            The players of the game.
+        """
+        self.players = list(players)
+        self.rows = {player: x for x, player in enumerate(self.players)}
+        self.counts = np.zeros([len(self.players), len(counter_names)], dtype=dtype)
+
+    def add(self, player, counter, amount=1):
+        """Adds the amount to the counter (e.g. FLIPS) of the player."""
+        self.counts[self.rows[player], counter] += amount
+
+    def finish(self):
+        """Records the money of the players at the end of the game."""
+        self.counts[:, MONEY] = [player.money for player in self.players]
+
+    def values(self):
+        """Returns the counters of the players one after another."""
+        return self.counts.ravel().tolist()
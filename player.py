@@ -50,6 +50,9 @@ class Player:
         is ambushed by beduins, 3 if the player's ship is raided by
         pirates, 4-6 if the player is working as a slave: 6 if still
         for three turns, 5 if for two turns and 4 if for one turn
+    params : AIParams
+        The parameters of the AI (see AI_decisions.AIParams), None for
+        the defaults.
 
     Methods
     -------
@@ -61,7 +64,7 @@ class Player:
         the player is going by land or by sea.
     """
 
-    def __init__(self, name, AI_type, starting_loc):
+    def __init__(self, name, AI_type, starting_loc, money=300, params=None):
         """
         Parameters
         ----------
@@ -72,15 +75,22 @@ class Player:
             human (0)
         starting_loc : str
             Whether the player starts from Tangier or Cairo
+        money : int, optional
+            How much money the player has in the beginning. Defaults
+            to 300.
+        params : AIParams, optional
+            The parameters of the AI. Defaults to None, i.e. the
+            default parameters.
         """
         self.name = name
         self.AI_type = AI_type
         self.location = starting_loc
-        self.money = 300
+        self.money = money
         self.has_star = False
         self.has_horseshoe = False
         self.offshore = False
         self.special = 0
+        self.params = params
 
 
     def turn_possibilities(self, unflipped):
@@ -0,0 +1,375 @@
+import argparse
+import random
+import struct
+import numpy as np
+import game
+import initialize
+import map
+import player
+import home_race
+
+# A compact log of AI games, from which any turn of any game can be
+# shown without playing the game again.
+#
+# A turn (one player's turn) is saved as 4 bytes: what the player who
+# had the turn looked like after it (location, money, status) and
+# whether a token was flipped. Everything else follows from that: which
+# token was flipped (the tokens are in the header of the game), who was
+# eliminated, who won. Every K turns there is a keyframe with the full
+# state of the game, so turn t is found by taking the keyframe before
+# it and applying at most K - 1 turns.
+#
+# The file (e.g. replays.bin) has the games one after another:
+#   header: seed, turns, K, players, elimination, the tokens (one per
+#   city with a token, see map.no_tokens), the names of the players
+#   keyframes: turns // K + 1 of them
+#   turns: a uint32 per turn
+# The index file (replays.bin.idx) has the byte offset of each game.
+
+_header = struct.Struct(f"<QIHHB{map.no_tokens}B")
+# per player: location, money / 100, flags (special, offshore, star,
+# horseshoe, in the game), AI type
+_keyframe_player = struct.Struct("<HHBB")
+# turn, turn_no, unflipped (a bit per city with a token),
+# horseshoes_found, flags (star_found, cape_visit), winner (seat + 1, 0
+# if none)
+_unflipped_bytes = (map.no_tokens + 7) // 8
+_keyframe_game = struct.Struct(f"<HI{_unflipped_bytes}sBBH")
+# the most players and money a log can hold: the players are counted
+# in 16 bits and the money in hundreds in the 13 bits of a turn
+max_players = 2**16 - 2
+max_money = (2**13 - 1) * 100
+# the most money a player can get in a game: all the gems, one of them
+# doubled in Gold Coast, and the first visit to Cape Town
+most_gained = (
+    sum(game.token_values.get(a, 0) for a in game.initial_tokens)
+    + max(game.token_values.values()) + 500
+)
+
+
+def encode_turn(player, flipped):
+    """Returns the turn of the player as an integer of 32 bits.
+
+    Bits 0-8 the location (see home_race.board), 9-11 special, 12
+    offshore, 13 has_star, 14 has_horseshoe, 15 whether a token was
+    flipped, 16-18 the AI type and 19-31 the money in hundreds.
+    """
+    if not 0 <= player.money <= max_money or player.money % 100:
+        raise ValueError(f"{player.name} has {player.money} pounds, which can't be logged!")
+    return (
+        home_race.board()[1][player.location]
+        | player.special << 9
+        | player.offshore << 12
+        | player.has_star << 13
+        | player.has_horseshoe << 14
+        | flipped << 15
+        | player.AI_type << 16
+        | player.money // 100 << 19
+    )
+
+
+def encode_keyframe(state, seats):
+    """Returns the full state of the game as bytes.
+
+    seats is the list of all the players in the order of the turns,
+    including the eliminated ones.
+    """
+    index = home_race.board()[1]
+    data = b""
+    for player in seats:
+        flags = (
+            player.special
+            | player.offshore << 3
+            | player.has_star << 4
+            | player.has_horseshoe << 5
+            | (player in state.players) << 6
+        )
+        data += _keyframe_player.pack(
+            index[player.location], player.money // 100, flags, player.AI_type
+        )
+    unflipped = sum(1 << x for x in range(map.no_tokens) if state.unflipped[x])
+    winner = seats.index(state.winner) + 1 if state.winner is not None else 0
+    return data + _keyframe_game.pack(
+        state.turn, state.turn_no, unflipped.to_bytes(_unflipped_bytes, "little"),
+        state.horseshoes_found,
+        state.star_found | state.cape_visit << 1, winner,
+    )
+
+
+def decode_keyframe(data, names, tokens, elimination):
+    """Returns the game and all its players (seats) from a keyframe."""
+    locs = home_race.board()[0]
+    seats = []
+    size = _keyframe_player.size
+    for x, name in enumerate(names):
+        loc, money, flags, ai_type = _keyframe_player.unpack_from(data, x * size)
+        seat = player.Player(name, ai_type, locs[loc], money * 100)
+        seat.special = flags & 7
+        seat.offshore = bool(flags >> 3 & 1)
+        seat.has_star = bool(flags >> 4 & 1)
+        seat.has_horseshoe = bool(flags >> 5 & 1)
+        seat.alive = bool(flags >> 6 & 1)
+        seats.append(seat)
+    turn, turn_no, unflipped, horseshoes, flags, winner = _keyframe_game.unpack_from(
+        data, len(names) * size
+    )
+    # the Game shuffles the tokens with a generator of its own, so that
+    # the random state of the caller is not touched
+    state = game.Game([a for a in seats if a.alive], False, elimination, rng=random.Random())
+    for seat in seats:
+        del seat.alive
+    state.tokens = list(tokens)
+    state.turn = turn
+    state.turn_no = turn_no
+    unflipped = int.from_bytes(unflipped, "little")
+    state.unflipped = [bool(unflipped >> x & 1) for x in range(map.no_tokens)] + [False] * (
+        map.no_nodes - map.no_tokens
+    )
+    state.horseshoes_found = horseshoes
+    state.star_found = bool(flags & 1)
+    state.cape_visit = bool(flags >> 1 & 1)
+    state.winner = seats[winner - 1] if winner else None
+    return state, seats
+
+
+def apply_turn(state, code):
+    """Applies the encoded turn to the game, like Game.play would."""
+    if state.turn == len(state.players):
+        state.turn = 0
+        state.turn_no += 1
+    active = state.players[state.turn]
+    players = state.players
+    active.location = home_race.board()[0][code & 511]
+    active.special = code >> 9 & 7
+    active.offshore = bool(code >> 12 & 1)
+    active.has_star = bool(code >> 13 & 1)
+    active.has_horseshoe = bool(code >> 14 & 1)
+    active.AI_type = code >> 16 & 7
+    active.money = (code >> 19) * 100
+    if active.location == "Tow":
+        state.cape_visit = True
+    if code >> 15 & 1:
+        place = map.abbs.index(active.location)
+        state.unflipped[place] = False
+        token = state.tokens[place]
+        if token == 2:
+            state.horseshoes_found += 1
+            if state.star_found and state.horseshoes_found == 5 and state.elimination:
+                state.players = [a for a in state.players if a.has_star or a.has_horseshoe]
+        elif token == 7:
+            state.star_found = True
+            if state.horseshoes_found == 5 and state.elimination:
+                state.winner = active
+    if state.players is not players:
+        state.turn = state.players.index(active)
+    if active.location in ("Tan", "Cai") and (active.has_star or active.has_horseshoe):
+        state.winner = active
+    state.turn += 1
+
+
+def check_setup(setup):
+    """Raises a ValueError if the games of the setup can't be logged.
+
+    The money of the players, with all they can get in a game, the
+    amount of players and the locations of the board must fit into the
+    fields of the log.
+    """
+    if len(home_race.board()[0]) > 2**9:
+        raise ValueError("The board has too many locations to be logged!")
+    ai_types = setup.get("ai_types") or initialize.default_ai_types
+    if len(ai_types) > max_players:
+        raise ValueError(f"A log can have at most {max_players} players!")
+    money = setup.get("money", 300)
+    if money < 0 or money % 100:
+        raise ValueError("The money must be a multiple of 100 pounds!")
+    if money + most_gained > max_money:
+        raise ValueError(
+            f"A log can have at most {max_money - most_gained} pounds of starting money!"
+        )
+    if setup.get("endgame_shortcut"):
+        raise ValueError("The race home must be played turn by turn to be logged!")
+
+
+def record_game(seed, elimination=True, every=32, **setup):
+    """Plays the AI game and returns its log as bytes.
+
+    Parameters
+    ----------
+    seed : int
+        The seed of the game.
+    elimination : bool, optional
+        Whether the elimination rules are on. Defaults to True.
+    every : int, optional
+        How many turns there are between the keyframes (K). Defaults
+        to 32.
+    setup : optional
+        Passed to initialize.init_AI (not endgame_shortcut, as the
+        race would not be played turn by turn).
+    """
+    check_setup(setup)
+    state = initialize.init_AI(elimination, rng=random.Random(seed), **setup)
+    seats = list(state.players)
+    keyframes = [encode_keyframe(state, seats)]
+    turns = []
+    while state.winner is None:
+        active = state.players[state.turn % len(state.players)]
+        unflipped = sum(state.unflipped)
+        state.play()
+        turns.append(encode_turn(active, sum(state.unflipped) != unflipped))
+        if len(turns) % every == 0:
+            keyframes.append(encode_keyframe(state, seats))
+    names = b"".join(
+        struct.pack("<B", len(a.name.encode())) + a.name.encode() for a in seats
+    )
+    header = _header.pack(seed, len(turns), every, len(seats), elimination, *state.tokens)
+    return header + names + b"".join(keyframes) + np.array(turns, dtype="<u4").tobytes()
+
+
+class GameLog:
+    """
+    The log of one game, which can show any turn of it
+
+    ...
+
+    Attributes
+    ----------
+    seed : int
+        The seed of the game.
+    turns : int
+        How many turns (of single players) the game had.
+    every : int
+        How many turns there are between the keyframes.
+    names : list of str
+        The names of the players in the order of the turns.
+
+    Methods
+    -------
+    state
+        Returns the game after the turn t
+    """
+
+    def __init__(self, data):
+        """
+        Parameters
+        ----------
+        data : bytes
+            The log from record_game.
+        """
+        seed, turns, every, no_players, elimination, *tokens = _header.unpack_from(data)
+        self.seed = seed
+        self.turns = turns
+        self.every = every
+        self.elimination = bool(elimination)
+        self.tokens = tokens
+        offset = _header.size
+        self.names = []
+        for _ in range(no_players):
+            length = data[offset]
+            self.names.append(data[offset + 1 : offset + 1 + length].decode())
+            offset += 1 + length
+        self.keyframe_size = no_players * _keyframe_player.size + _keyframe_game.size
+        self.keyframes = data[offset : offset + (turns // every + 1) * self.keyframe_size]
+        offset += len(self.keyframes)
+        self.codes = np.frombuffer(data, dtype="<u4", count=turns, offset=offset)
+
+    def state(self, t):
+        """Returns the game (a new Game) after the turn t.
+
+        The turn 0 is the beginning of the game. At most every - 1
+        turns are applied to the keyframe before t.
+        """
+        if not 0 <= t <= self.turns:
+            raise ValueError(f"The turn must be between 0 and {self.turns}!")
+        k = t // self.every
+        start = k * self.keyframe_size
+        state, _ = decode_keyframe(
+            self.keyframes[start : start + self.keyframe_size],
+            self.names, self.tokens, self.elimination,
+        )
+        for code in self.codes[k * self.every : t]:
+            apply_turn(state, int(code))
+        return state
+
+
+def write_logs(filename, seeds, elimination=True, every=32):
+    """Plays the games and writes their logs and the index file.
+
+    Returns the amount of bytes and turns written.
+    """
+    offsets = []
+    size = turns = 0
+    with open(filename, "wb") as file:
+        for seed in seeds:
+            data = record_game(seed, elimination, every)
+            offsets.append(size)
+            file.write(data)
+            size += len(data)
+            turns += _header.unpack_from(data)[1]
+    np.array(offsets, dtype="<u8").tofile(filename + ".idx")
+    return size, turns
+
+
+def read_log(filename, x):
+    """Returns the GameLog of the game x (the x-th game) in the file."""
+    offsets = np.fromfile(filename + ".idx", dtype="<u8")
+    start = int(offsets[x])
+    with open(filename, "rb") as file:
+        file.seek(start)
+        if x + 1 < len(offsets):
+            data = file.read(int(offsets[x + 1]) - start)
+        else:
+            data = file.read()
+    return GameLog(data)
+
+
+def describe(state, t):
+    """Returns the state of the game as a readable string."""
+    msg = f"Turn {t} (round {state.turn_no}):"
+    for player in state.players:
+        msg += (
+            f"\n  {player.name}: {player.location}, {player.money} pounds"
+            + (", special " + str(player.special) if player.special else "")
+            + (", has the Star of Africa" if player.has_star else "")
+            + (", has a horseshoe" if player.has_horseshoe else "")
+        )
+    msg += f"\n  {sum(state.unflipped)} tokens unflipped, "
+    msg += f"{state.horseshoes_found} horseshoes found"
+    if state.winner is not None:
+        msg += f"\n  {state.winner.name} won the game."
+    return msg
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Records and shows the logs of AI games.")
+    parser.add_argument("command", choices=["record", "show"])
+    parser.add_argument("file", help="the log file, e.g. replays.bin")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="how many games are recorded")
+    parser.add_argument("--every", type=int, default=32,
+                        help="how many turns there are between the keyframes")
+    parser.add_argument("--no-elimination", action="store_true",
+                        help="turns the elimination rules off")
+    parser.add_argument("--game", type=int, default=0, help="which game is shown")
+    parser.add_argument("--turn", type=int, default=0, help="from which turn")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        size, turns = write_logs(
+            args.file, range(args.games), not args.no_elimination, args.every
+        )
+        print(f"{args.games} games, {turns} turns, {size} bytes "
+              + f"({round(size / turns, 2)} bytes per turn).")
+    else:
+        log = read_log(args.file, args.game)
+        t = args.turn
+        while True:
+            print(describe(log.state(t), t))
+            command = input("(n)ext, (p)revious, a turn number or (q)uit: ")
+            if command[:1].lower() == "q":
+                break
+            if command[:1].lower() == "n":
+                t = min(t + 1, log.turns)
+            elif command[:1].lower() == "p":
+                t = max(t - 1, 0)
+            elif command.isnumeric():
+                t = min(int(command), log.turns)
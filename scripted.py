@@ -0,0 +1,218 @@
+import argparse
+import json
+import random
+import re
+import time
+import initialize
+
+# The games with humans can be played without anyone at the keyboard:
+# the answers of the humans are read from a script, and the game runs
+# with no delay. A game is the same for the same seed and answers, so
+# recorded scripts can be replayed e.g. for profiling or load testing
+# the code of the human games like the AI games.
+#
+# The scripts are saved as JSON lines, one game per line:
+# {"seed": ..., "elimination": ..., "answers": [...]}
+
+
+class Script:
+    """
+    Answers the questions of the game from a list of answers
+
+    Can be given to the game as ask. When the answers run out, EOFError
+    is raised, like input does at the end of the input.
+
+    ...
+
+    Attributes
+    ----------
+    answers : list of str
+        The answers in the order of the questions.
+    position : int
+        How many answers have been given.
+    """
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.position = 0
+
+    def __call__(self, prompt):
+        if self.position >= len(self.answers):
+            raise EOFError("The script has no more answers.")
+        answer = self.answers[self.position]
+        self.position += 1
+        return answer
+
+
+class ScriptedHuman:
+    """
+    Makes up the answers of the humans, e.g. for recording scripts
+
+    Reads the options from what the game says and picks one of them at
+    random. Now and then it writes something wrong or asks for the
+    tokens, so that those paths of the game are played too. The answers
+    are recorded.
+
+    ...
+
+    Attributes
+    ----------
+    rng : random.Random
+        The random generator of the answers, not the one of the game.
+    players : list of str
+        The answer to "human or computer" for each player, e.g.
+        ["h", "c", "c"].
+    mistakes : float
+        The probability of a wrong answer.
+    answers : list of str
+        The answers given so far.
+
+    Methods
+    -------
+    say
+        Is given to the game as say, reads the options
+    ask
+        Is given to the game as ask, answers the question
+    """
+
+    def __init__(self, rng, players, mistakes=0.05):
+        self.rng = rng
+        self.players = players
+        self.mistakes = mistakes
+        self.answers = []
+        self.actions = []
+        self.destinations = 0
+        self.next_player = 0
+
+    def say(self, msg):
+        """Reads the options of the next question from the message."""
+        for line in msg.split("\n"):
+            action = re.search(r"write (flip|land|sea|air)\.$", line)
+            if action:
+                self.actions.append(action.group(1))
+            if line.startswith("Write ") and "if you want to move" in line:
+                self.destinations += 1
+
+    def _answer(self, prompt):
+        if prompt.startswith("How many players"):
+            return str(len(self.players))
+        if "a (h)uman or a (c)omputer" in prompt:
+            self.next_player += 1
+            return self.players[self.next_player - 1]
+        if prompt.startswith("Is this computer"):
+            return str(self.rng.randint(0, 4))
+        if prompt.startswith("The name of the player"):
+            return f"Human {self.next_player}"
+        if prompt.startswith("Does "):
+            return self.rng.choice(["T", "C"])
+        if prompt.startswith("Which option"):
+            if self.rng.random() < self.mistakes:
+                return self.rng.choice(["tokens", "swim"])
+            return self.rng.choice(self.actions)
+        if prompt.startswith("Where would you like"):
+            if self.rng.random() < self.mistakes:
+                return str(self.destinations)
+            return str(self.rng.randrange(self.destinations))
+        if prompt.startswith("Would you like to flip"):
+            if self.rng.random() < self.mistakes:
+                return "maybe"
+            return self.rng.choice(["y", "n"])
+        raise ValueError(f"Unknown question: {prompt}")
+
+    def ask(self, prompt):
+        """Answers the question and records the answer."""
+        answer = self._answer(prompt.strip())
+        # the game tells the options again before the next question
+        self.actions = []
+        self.destinations = 0
+        self.answers.append(answer)
+        return answer
+
+
+def quiet(msg):
+    """A say that throws the messages away."""
+
+
+def play_script(seed, answers, elimination=True, say=quiet):
+    """Plays a game with the answers of a script.
+
+    Returns
+    -------
+    list
+        The name of the winner, the amount of turns and whether the
+        winner found a horseshoe, like a row of ai_game.
+    """
+    random.seed(seed)
+    game = initialize.init_human(elimination, Script(answers), say, 0)
+    while game.winner is None:
+        game.play()
+    return [game.winner.name, game.turn_no, game.winner.has_horseshoe]
+
+
+def record_script(seed, players, elimination=True, mistakes=0.05):
+    """Plays a game with made up answers and returns its script.
+
+    Parameters
+    ----------
+    seed : int
+        The seed of the game (and of the answers).
+    players : list of str
+        "h" for a human and "c" for a computer, 1-6 of them.
+    elimination : bool, optional
+        Whether the elimination rules are on. Defaults to True.
+    mistakes : float, optional
+        The probability of a wrong answer. Defaults to 0.05.
+
+    Returns
+    -------
+    dictionary
+        The seed, elimination, answers and the result of the game.
+    """
+    human = ScriptedHuman(random.Random(seed), players, mistakes)
+    random.seed(seed)
+    game = initialize.init_human(elimination, human.ask, human.say, 0)
+    while game.winner is None:
+        game.play()
+    return {
+        "seed": seed,
+        "elimination": elimination,
+        "answers": human.answers,
+        "result": [game.winner.name, game.turn_no, game.winner.has_horseshoe],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Records and replays the answers of human games."
+    )
+    parser.add_argument("command", choices=["record", "replay"])
+    parser.add_argument("file", help="the JSON-lines file of the scripts")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="how many games are recorded")
+    parser.add_argument("--humans", type=int, default=2,
+                        help="how many humans are in a recorded game")
+    parser.add_argument("--ais", type=int, default=2,
+                        help="how many AIs are in a recorded game")
+    args = parser.parse_args()
+
+    t = time.time()
+    if args.command == "record":
+        with open(args.file, "w") as file:
+            for seed in range(args.games):
+                players = ["h"] * args.humans + ["c"] * args.ais
+                random.Random(seed).shuffle(players)
+                file.write(json.dumps(record_script(seed, players)) + "\n")
+        games = args.games
+    else:
+        games = 0
+        different = 0
+        with open(args.file) as file:
+            for line in file:
+                script = json.loads(line)
+                result = play_script(script["seed"], script["answers"], script["elimination"])
+                different += result != script["result"]
+                games += 1
+        print(f"{different} of the {games} games did not end as recorded.")
+    elapsed = time.time() - t
+    print(f"It took {round(elapsed, 3)} seconds to play {games} games "
+          + f"({round(games / elapsed * 60)} games per minute).")
@@ -0,0 +1,416 @@
+import argparse
+import random
+import time
+from functools import cache
+import numpy as np
+import map
+import game
+import initialize
+
+# The layout of the AI game of a seed is decided by the first calls of
+# its random generator (random.Random(seed), see ai_game.play_game):
+# initialize.init_AI shuffles the players into the order of the turns
+# and Game.__init__ then shuffles the tokens of the cities. The catalog
+# reproduces only these two shuffles for many seeds at once, so that
+# seeds with a given layout (e.g. the star in Egypt, a robber in Slave
+# Coast, Amy first) can be found without playing or even setting up the
+# games. The same holds for random.seed(seed), e.g. in many_players.py.
+#
+# Python seeds its Mersenne Twister from the 32-bit words of the seed
+# (init_by_array), which is a chain of 1247 steps over the 624 words of
+# the state. Here the chain is run for a chunk of seeds at once, a NumPy
+# operation over the chunk for each step, and then the first outputs of
+# the generator are tempered the same way. random.shuffle draws with
+# rejection (getrandbits of the bit length, again if too big), so the
+# seeds use a different amount of the outputs: each seed has its own
+# position in the outputs. The rare seeds that would need more than
+# the drawn outputs are shuffled with random.Random instead.
+#
+# The catalog stores the order of the seats (the indices of the AIs of
+# ai_types) as uint8 and the tokens of the 30 cities as 4 bits each, 19
+# bytes per seed with four AIs.
+
+mt_size = 624
+mt_shift = 397
+# how many outputs of the generator are drawn for each seed
+outputs_per_seed = 96
+
+
+@cache
+def base_state():
+    """Returns the state of init_genrand(19650218), where every seed starts."""
+    state = [19650218]
+    for x in range(1, mt_size):
+        state.append((1812433253 * (state[-1] ^ (state[-1] >> 30)) + x) & 0xFFFFFFFF)
+    return np.array(state, dtype=np.uint32)
+
+
+def seeded_states(seeds):
+    """Returns the states of random.Random(seed) for the seeds.
+
+    The states are those of init_by_array with the key [seed], before
+    the first twist: a row for each word and a column for each seed.
+    """
+    seeds = np.asarray(seeds, dtype=np.uint32)
+    state = np.repeat(base_state()[:, None], len(seeds), axis=1)
+    with np.errstate(over="ignore"):
+        for x in list(range(1, mt_size)) + [0]:
+            if x == 0:
+                # the index wraps around to 1 with a copy of the last word
+                state[0] = state[mt_size - 1]
+                x = 1
+            previous = state[x - 1]
+            state[x] = (state[x] ^ ((previous ^ (previous >> 30)) * np.uint32(1664525))) + seeds
+        for x in list(range(2, mt_size)) + [0]:
+            if x == 0:
+                state[0] = state[mt_size - 1]
+                x = 1
+            previous = state[x - 1]
+            state[x] = (
+                (state[x] ^ ((previous ^ (previous >> 30)) * np.uint32(1566083941)))
+                - np.uint32(x)
+            )
+    state[0] = 0x80000000
+    return state
+
+
+def _next_words(state, current, following, shifted):
+    """Returns the twisted words of the rows current of the state."""
+    y = (state[current] & np.uint32(0x80000000)) | (state[following] & np.uint32(0x7FFFFFFF))
+    return state[shifted] ^ (y >> 1) ^ ((y & 1) * np.uint32(0x9908B0DF))
+
+
+def twist(state):
+    """Twists the states (see seeded_states) in place.
+
+    Each word depends on the word mt_shift ahead, which for the last
+    words is already twisted, so the twist is done in chunks of
+    mt_size - mt_shift words.
+    """
+    chunk = mt_size - mt_shift
+    for start in range(0, mt_size - 1, chunk):
+        stop = min(start + chunk, mt_size - 1)
+        rows = np.arange(start, stop)
+        state[rows] = _next_words(state, rows, rows + 1, (rows + mt_shift) % mt_size)
+    state[mt_size - 1] = _next_words(state, mt_size - 1, 0, mt_shift - 1)
+    return state
+
+
+def temper(y):
+    """Returns the outputs of the generator from the twisted words."""
+    y = y ^ (y >> 11)
+    y ^= (y << 7) & np.uint32(0x9D2C5680)
+    y ^= (y << 15) & np.uint32(0xEFC60000)
+    return y ^ (y >> 18)
+
+
+def random_outputs(seeds, count=outputs_per_seed):
+    """Returns the first outputs of random.Random(seed) for the seeds.
+
+    Parameters
+    ----------
+    seeds : array of int
+        The seeds, 0 <= seed < 2**32.
+    count : int, optional
+        How many outputs of each seed. Defaults to outputs_per_seed.
+
+    Returns
+    -------
+    numpy array
+        The outputs of getrandbits(32), a row for each output and a
+        column for each seed.
+    """
+    state = seeded_states(seeds)
+    # the first outputs only need the first words of the twist
+    rows = np.arange(count)
+    return temper(_next_words(state, rows, rows + 1, rows + mt_shift))
+
+
+def shuffle(items, outputs, position):
+    """Shuffles the rows of items like random.shuffle.
+
+    Parameters
+    ----------
+    items : numpy array
+        A row of items for each seed, shuffled in place.
+    outputs : numpy array
+        The outputs of the generators (see random_outputs).
+    position : numpy array
+        The next output of each seed, moved forward in place.
+
+    Returns
+    -------
+    numpy array
+        Whether a seed ran out of the outputs.
+    """
+    columns = np.arange(items.shape[0])
+    last = len(outputs) - 1
+    for x in range(items.shape[1] - 1, 0, -1):
+        # _randbelow(x + 1)
+        shift = 32 - (x + 1).bit_length()
+        draw = outputs[np.minimum(position, last), columns] >> shift
+        position += 1
+        again = np.flatnonzero(draw > x)
+        while len(again):
+            draw[again] = outputs[np.minimum(position[again], last), again] >> shift
+            position[again] += 1
+            again = again[draw[again] > x]
+        swapped = items[columns, draw]
+        items[columns, draw] = items[:, x]
+        items[:, x] = swapped
+    return position > len(outputs)
+
+
+def python_setup(seed, no_players=4):
+    """Returns the seats and the tokens of the seed with random.Random."""
+    rng = random.Random(seed)
+    seats = list(range(no_players))
+    rng.shuffle(seats)
+    tokens = list(game.initial_tokens)
+    rng.shuffle(tokens)
+    return seats, tokens
+
+
+def setups(seeds, no_players=4):
+    """Returns the layouts of the AI games of the seeds.
+
+    Returns
+    -------
+    seats : numpy array
+        For each seed the indices of the AIs (in the order of ai_types)
+        in the order of the turns.
+    tokens : numpy array
+        For each seed the tokens of the cities (see game.Game).
+    """
+    seeds = np.asarray(seeds, dtype=np.int64)
+    if len(seeds) and (seeds.min() < 0 or seeds.max() >= 2**32):
+        raise ValueError("The seeds must be between 0 and 2**32 - 1!")
+    outputs = random_outputs(seeds)
+    position = np.zeros(len(seeds), dtype=np.int64)
+    seats = np.tile(np.arange(no_players, dtype=np.uint8), (len(seeds), 1))
+    tokens = np.tile(np.array(game.initial_tokens, dtype=np.uint8), (len(seeds), 1))
+    short = shuffle(seats, outputs, position) | shuffle(tokens, outputs, position)
+    for x in np.flatnonzero(short):
+        seats[x], tokens[x] = python_setup(int(seeds[x]), no_players)
+    return seats, tokens
+
+
+def pack(tokens):
+    """Packs the tokens of the cities into 4 bits each."""
+    return tokens[:, 0::2] | (tokens[:, 1::2] << 4)
+
+
+def build_chunk(start, stop, no_players=4):
+    """Returns the seats and the packed tokens of the seeds start, ..., stop - 1."""
+    seats, tokens = setups(np.arange(start, stop), no_players)
+    return seats, pack(tokens)
+
+
+class Catalog:
+    """
+    The layouts of the AI games of a range of seeds
+
+    ...
+
+    Attributes
+    ----------
+    start : int
+        The first seed.
+    no_players : int
+        The amount of AIs.
+    seats : numpy array
+        The indices of the AIs in the order of the turns for each seed.
+    tokens : numpy array
+        The tokens of the cities for each seed, two cities in a byte.
+
+    Methods
+    -------
+    token_at
+        Returns the token of a city for each seed
+    find
+        Returns the seeds whose layout matches a query
+    layout
+        Returns the layout of a seed
+    save
+        Saves the catalog into a .npz file
+    load
+        Loads a catalog from a .npz file (a class method)
+    """
+
+    def __init__(self, start, no_players, seats, tokens):
+        """
+        Parameters
+        ----------
+        start, no_players, seats, tokens
+            See the attributes.
+        """
+        self.start = start
+        self.no_players = no_players
+        self.seats = seats
+        self.tokens = tokens
+
+    def __len__(self):
+        return len(self.seats)
+
+    def token_at(self, city):
+        """Returns the token of the city (an index of map.abbs) for each seed."""
+        return (self.tokens[:, city // 2] >> (4 * (city % 2))) & 15
+
+    def find(self, cities=(), first=None, limit=None):
+        """Returns the seeds whose layout matches all the conditions.
+
+        Parameters
+        ----------
+        cities : list of (int, int), optional
+            (city, token) pairs: the city (an index of map.abbs) has
+            the token (see game.Game), e.g. (map.abb_index["Egy"], 7)
+            for the star in Egypt.
+        first : int, optional
+            The index of the AI who plays first.
+        limit : int, optional
+            At most this many seeds are returned.
+        """
+        match = np.ones(len(self), dtype=bool)
+        for city, token in cities:
+            match &= self.token_at(city) == token
+        if first is not None:
+            match &= self.seats[:, 0] == first
+        return (np.flatnonzero(match)[:limit] + self.start).tolist()
+
+    def layout(self, seed):
+        """Returns the seats and the tokens of the cities of the seed."""
+        x = seed - self.start
+        row = self.tokens[x]
+        tokens = np.stack([row & 15, row >> 4], axis=1).ravel()
+        return self.seats[x].tolist(), tokens.tolist()
+
+    def save(self, filename):
+        """Saves the catalog into a .npz file."""
+        np.savez_compressed(
+            filename, start=self.start, no_players=self.no_players, seats=self.seats,
+            tokens=self.tokens
+        )
+
+    @classmethod
+    def load(cls, filename):
+        """Returns the catalog saved into the .npz file."""
+        with np.load(filename) as data:
+            return cls(int(data["start"]), int(data["no_players"]), data["seats"], data["tokens"])
+
+
+def build(start, stop, no_players=4, chunk=2**15, workers=None):
+    """Builds the catalog of the seeds start, ..., stop - 1.
+
+    Parameters
+    ----------
+    start, stop : int
+        The range of the seeds.
+    no_players : int, optional
+        The amount of AIs, four in the AI game. Defaults to 4.
+    chunk : int, optional
+        How many seeds are set up at once. Defaults to 2**15.
+    workers : int, optional
+        The chunks are set up in a process pool of this size. Defaults
+        to None, i.e. in this process.
+    """
+    starts = list(range(start, stop, chunk))
+    stops = [min(a + chunk, stop) for a in starts]
+    players = [no_players] * len(starts)
+    if workers:
+        # the process pool is only imported for the workers
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(build_chunk, starts, stops, players))
+    else:
+        parts = [build_chunk(a, b, c) for a, b, c in zip(starts, stops, players)]
+    seats = np.concatenate([a[0] for a in parts])
+    tokens = np.concatenate([a[1] for a in parts])
+    return Catalog(start, no_players, seats, tokens)
+
+
+def check(catalog, seeds, ai_types=None):
+    """Checks the layouts of the catalog against initialize.init_AI.
+
+    Returns the seeds whose layout differs from that of the game.
+    """
+    if ai_types is None:
+        ai_types = initialize.default_ai_types
+    names = [initialize.player_name(x) for x in range(len(ai_types))]
+    wrong = []
+    for seed in seeds:
+        setup = initialize.init_AI(ai_types=ai_types, rng=random.Random(seed))
+        seats = [names.index(a.name) for a in setup.players]
+        if catalog.layout(seed) != (seats, setup.tokens):
+            wrong.append(seed)
+    return wrong
+
+
+def city(name):
+    """Returns the index of the city with a token by its abb or full name."""
+    if name in map.abb_index:
+        index = map.abb_index[name]
+    elif name in map.full_names:
+        index = map.full_names.index(name)
+    else:
+        raise ValueError(f"There is no city called {name}!")
+    if index >= map.no_tokens:
+        raise ValueError(f"There is no token in {name}!")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Builds and queries a catalog of the layouts of the seeds."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="sets up the seeds into a catalog")
+    build_parser.add_argument("file", help="the .npz file of the catalog")
+    build_parser.add_argument("--seeds", type=int, default=10**6,
+                              help="the seeds 0, ..., seeds - 1 are set up")
+    build_parser.add_argument("--start", type=int, default=0, help="the first seed")
+    build_parser.add_argument("--players", type=int, default=4, help="the amount of AIs")
+    build_parser.add_argument("--workers", type=int, default=None,
+                              help="the amount of worker processes, none by default")
+    build_parser.add_argument("--check", type=int, default=1000,
+                              help="how many seeds are checked against the game")
+    query_parser = subparsers.add_parser("query", help="finds the seeds of a layout")
+    query_parser.add_argument("file", help="the .npz file of the catalog")
+    query_parser.add_argument("--star", help="the city of the Star of Africa")
+    query_parser.add_argument("--robber", nargs="+", default=[], help="cities with a robber")
+    query_parser.add_argument("--horseshoe", nargs="+", default=[],
+                              help="cities with a horseshoe")
+    query_parser.add_argument("--empty", nargs="+", default=[], help="cities with no token")
+    query_parser.add_argument("--first", help="the name of the AI who plays first")
+    query_parser.add_argument("--limit", type=int, default=20,
+                              help="how many seeds are printed at most")
+    args = parser.parse_args()
+
+    t = time.time()
+    if args.command == "build":
+        catalog = build(
+            args.start, args.start + args.seeds, args.players, workers=args.workers
+        )
+        catalog.save(args.file)
+        checked = range(args.start, args.start + min(args.check, args.seeds))
+        wrong = check(catalog, checked, [1] * args.players if args.players != 4 else None)
+        print(f"{len(catalog)} seeds are in {args.file}, {len(checked) - len(wrong)} "
+              + f"of {len(checked)} checked seeds have the layout of the game.")
+    else:
+        catalog = Catalog.load(args.file)
+        try:
+            query = [(city(a), 7) for a in [args.star] if a]
+            query += [(city(a), 3) for a in args.robber]
+            query += [(city(a), 2) for a in args.horseshoe]
+            query += [(city(a), 1) for a in args.empty]
+        except ValueError as error:
+            parser.error(str(error))
+        first = None
+        if args.first:
+            names = [initialize.player_name(x) for x in range(catalog.no_players)]
+            if args.first not in names:
+                parser.error(f"The AIs of the catalog are {', '.join(names)}!")
+            first = names.index(args.first)
+        seeds = catalog.find(query, first)
+        print(f"{len(seeds)} of {len(catalog)} seeds match: {seeds[:args.limit]}")
+    print(f"It took {round(time.time()-t, 3)} seconds to run this.")
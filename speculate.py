@@ -0,0 +1,156 @@
+import copy
+import threading
+import map
+import caches
+
+# In a game with humans the program waits in input() for most of the
+# time, and the AIs after a human then compute what they need (e.g.
+# the distances to the tokens that are left) only once the human has
+# answered. A Speculator is the ask of such a game: while the human is
+# thinking, a thread computes the inputs of the decisions of the AIs
+# that play before the next human, for the ways the turn of the human
+# can plausibly end. The results go into the caches of map.py, so the
+# AIs find them there.
+#
+# The plausible ends of the turn are that no token is flipped, or that
+# the human flips the token where they are or in a city they can reach
+# this turn (by land, by sea or by plane, with any roll of the dice).
+# After that the thread warms up the static caches (see caches.warm_up)
+# a few calls at a time, the biggest of which is the solved race home.
+#
+# The thread only reads a copy of the state of the game, which is taken
+# before the question, and it stops after the task it is doing when
+# the human answers.
+
+
+def reachable(player, unflipped):
+    """Returns the cities with a token the player can reach this turn.
+
+    The cities are in the order of the rolls, the city of the player
+    first if its token is unflipped.
+    """
+    player = copy.copy(player)
+    loc = player.location
+    if "-" in loc or "nd" in loc:
+        ways = [player.offshore]
+    else:
+        ways = [False, True] if map.sea_routes[loc] else [False]
+    options = [loc]
+    if "-" not in loc and player.money >= 300:
+        options += map.air_routes[loc]
+    for offshore in ways:
+        player.offshore = offshore
+        for dice in range(1, 7):
+            options += player.destination_options(dice)
+    cities = []
+    for option in options:
+        index = map.abb_index.get(option)
+        if index is not None and index < map.no_tokens and unflipped[index]:
+            cities.append(index)
+    return list(dict.fromkeys(cities))
+
+
+def upcoming_AIs(game):
+    """Returns the AIs who play after the current player before a human."""
+    seats = game.players[game.turn + 1:] + game.players[:game.turn]
+    upcoming = []
+    for player in seats:
+        if not player.AI_type:
+            break
+        upcoming.append(player)
+    return upcoming
+
+
+def tasks(game):
+    """Returns the calls that warm the caches for the AIs after a human.
+
+    Each task is a function and its arguments. The most likely
+    outcome, that no token is flipped, comes first.
+    """
+    # the poverty and the sea penalty each AI looks up the distances with
+    inputs = {}
+    for player in upcoming_AIs(game):
+        sea_penalty = player.params.sea_penalty if player.params else 1.75
+        inputs[(player.money == 0, sea_penalty)] = None
+        if player.money >= 300:
+            # after a flight (see AI_decisions.choose_action_token)
+            inputs[(player.money == 300, sea_penalty)] = None
+    if not inputs:
+        return []
+    unflipped = tuple(game.unflipped)
+    outcomes = [unflipped]
+    for index in reachable(game.players[game.turn], unflipped):
+        outcomes.append(unflipped[:index] + (False,) + unflipped[index + 1:])
+    return [
+        (map.closest_tokens, (outcome, poor, sea_penalty))
+        for outcome in outcomes if any(outcome)
+        for poor, sea_penalty in inputs
+    ]
+
+
+class Speculator:
+    """
+    Asks the humans and precomputes for the AIs while they think
+
+    ...
+
+    Attributes
+    ----------
+    game : Game
+        The game whose humans are asked.
+    ask : callable
+        Asks the human, e.g. input.
+    warm_up : list of tuples
+        The calls of caches.warm_up that haven't been made yet.
+    computed : int
+        How many tasks have been computed while the humans thought.
+
+    Methods
+    -------
+    __call__
+        Asks the human while speculating
+    speculate
+        Computes the tasks until the human answers
+    """
+
+    def __init__(self, game, ask=input):
+        """
+        Parameters
+        ----------
+        game : Game
+            The game. Its ask is usually replaced by the Speculator.
+        ask : callable, optional
+            Asks the human. Defaults to input.
+        """
+        self.game = game
+        self.ask = ask
+        self.warm_up = caches.warm_up_calls()
+        self.computed = 0
+
+    def __call__(self, prompt=""):
+        """Asks the human and speculates until the answer comes.
+
+        When the human has answered, the thread finishes the task it is
+        doing and stops before the game goes on, so that the AIs don't
+        have to share the interpreter with it.
+        """
+        stop = threading.Event()
+        thread = threading.Thread(target=self.speculate, args=(tasks(self.game), stop))
+        thread.start()
+        try:
+            return self.ask(prompt)
+        finally:
+            stop.set()
+            thread.join()
+
+    def speculate(self, work, stop):
+        """Computes the tasks and then warms up until stop is set."""
+        for function, args in work:
+            if stop.is_set():
+                return
+            function(*args)
+            self.computed += 1
+        while self.warm_up and not stop.is_set():
+            function, args = self.warm_up.pop(0)
+            function(*args)
+            self.computed += 1
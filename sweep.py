@@ -0,0 +1,238 @@
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import ai_game
+import AI_decisions
+from decision_cache import DecisionCache
+
+
+def find_engine_files():
+    """Returns the files whose contents define the version of the code.
+
+    They are the modules of this folder in sys.modules after the
+    imports above, i.e. every module the games load, and the board, so
+    that a new module of the engine can't be left out. If any of them
+    changes, the cached results are not used anymore.
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    names = {"africa.json"}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name == "__main__" or not path or os.path.dirname(os.path.abspath(path)) != folder:
+            continue
+        if os.path.basename(path) != os.path.basename(__file__):
+            names.add(os.path.basename(path))
+    return sorted(names)
+
+
+# found once on import, before the callers import anything else
+engine_files = find_engine_files()
+
+
+def code_version():
+    """Returns a hash of the source code of the engine."""
+    digest = hashlib.sha256()
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name in engine_files:
+        with open(os.path.join(folder, name), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+def grid_cells(grid):
+    """Returns a list of configurations, one for each cell of the grid.
+
+    Parameters
+    ----------
+    grid : dictionary
+        The keys are the parameters and the values lists of the values
+        the parameter gets in the sweep:
+        elimination - True or False
+        players - the amount of players, 1-6
+        ai_mix - a list of AI types, which is repeated to the amount
+        of players, e.g. [1, 2] with 3 players is 1, 2, 1
+        start - the starting city of all the AIs (Cai or Tan) or
+        default, i.e. the one that suits the AI type
+        money - the money each AI has in the beginning
+
+    Returns
+    -------
+    list of dictionaries
+    """
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[a] for a in keys))]
+
+
+def cell_setup(config):
+    """Returns the elimination and the arguments of init_AI of the cell."""
+    players = config.get("players", 4)
+    ai_mix = config.get("ai_mix", [1, 1, 2, 3])
+    ai_types = [ai_mix[x % len(ai_mix)] for x in range(players)]
+    start = config.get("start", "default")
+    if start == "default":
+        starting_locs = None
+    else:
+        starting_locs = [start] * players
+    setup = {
+        "ai_types": ai_types,
+        "starting_locs": starting_locs,
+        "money": config.get("money", 300),
+    }
+    return config.get("elimination", True), setup
+
+
+def cell_key(version, config, seeds):
+    """Returns the key of the cell in the result cache."""
+    text = json.dumps([version, config, list(seeds)], sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+def run_cell(config, seeds):
+    """Plays the games of one cell and returns their summary.
+
+    Parameters
+    ----------
+    config : dictionary
+        The configuration of the cell, see grid_cells.
+    seeds : tuple of int
+        The games with the seeds seeds[0], ..., seeds[1] - 1 are played.
+
+    Returns
+    -------
+    dictionary
+        The amount of games, the victories of each player, the amount
+        of games won by a horseshoe and the mean, standard deviation
+        and maximum of the game length.
+    """
+    elimination, setup = cell_setup(config)
+    data = ai_game.run_games(seeds[0], seeds[1], elimination, **setup)
+    turns = data[:, 1].astype(np.int64)
+    names, counts = np.unique(data[:, 0].astype(str), return_counts=True)
+    return {
+        "games": len(data),
+        "wins": {str(a): int(b) for a, b in zip(names, counts)},
+        "horseshoe_wins": int(data[:, 2].astype(bool).sum()),
+        "turns_mean": float(turns.mean()),
+        "turns_std": float(turns.std(ddof=1)) if len(turns) > 1 else 0.0,
+        "turns_max": int(turns.max()),
+    }
+
+
+def init_worker(decision_cache_size):
+    """Turns the decision cache on in a worker process."""
+    if decision_cache_size:
+        AI_decisions.set_decision_cache(DecisionCache(decision_cache_size))
+
+
+def run_sweep(grid, seeds, workers=None, cache_dir="sweep_cache", decision_cache_size=2**18):
+    """Runs all the cells of the grid in a process pool.
+
+    Every cell is played with the same seeds, and its summary is saved
+    into the cache folder with the key of the code version, the
+    configuration and the seeds. Cells which are already in the cache
+    are not played again.
+
+    Parameters
+    ----------
+    grid : dictionary
+        See grid_cells.
+    seeds : tuple of int
+        The range of seeds: (first, last + 1).
+    workers : int, optional
+        The amount of worker processes. Defaults to the amount of cores.
+    cache_dir : str, optional
+        The folder of the cached results. Defaults to sweep_cache.
+    decision_cache_size : int, optional
+        The size of the decision cache in each worker, None turns it
+        off. Defaults to 2**18.
+
+    Returns
+    -------
+    results : list of tuples
+        The configuration and the summary of each cell in the order of
+        grid_cells.
+    cached : int
+        How many of the cells were found in the cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    version = code_version()
+    configs = grid_cells(grid)
+    summaries = [None] * len(configs)
+    paths = [os.path.join(cache_dir, cell_key(version, a, seeds) + ".json") for a in configs]
+    pending = []
+    for index, path in enumerate(paths):
+        if os.path.exists(path):
+            with open(path) as file:
+                summaries[index] = json.load(file)["summary"]
+        else:
+            pending.append(index)
+    cached = len(configs) - len(pending)
+    if pending:
+        with ProcessPoolExecutor(
+            workers, initializer=init_worker, initargs=(decision_cache_size,)
+        ) as pool:
+            futures = {pool.submit(run_cell, configs[a], seeds): a for a in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                summaries[index] = future.result()
+                record = {
+                    "version": version,
+                    "config": configs[index],
+                    "seeds": list(seeds),
+                    "summary": summaries[index],
+                }
+                # write and rename, so that a killed sweep leaves no half files
+                with open(paths[index] + ".tmp", "w") as file:
+                    json.dump(record, file)
+                os.replace(paths[index] + ".tmp", paths[index])
+    return list(zip(configs, summaries)), cached
+
+
+def write_summary(filename, results):
+    """Writes the summaries of the cells into a csv file."""
+    keys = sorted({key for config, _ in results for key in config})
+    names = sorted({name for _, summary in results for name in summary["wins"]})
+    fieldnames = keys + ["Games", "Mean turns", "Standard deviation of turns",
+                         "Max turns", "Horseshoe winners"] + [f"Won by {a}" for a in names]
+    with open(filename, "w", newline='') as file:
+        header_writer = csv.DictWriter(file, fieldnames)
+        header_writer.writeheader()
+        writer = csv.writer(file)
+        for config, summary in results:
+            games = summary["games"]
+            writer.writerow(
+                [config.get(a) for a in keys]
+                + [games,
+                   round(summary["turns_mean"], 3),
+                   round(summary["turns_std"], 3),
+                   summary["turns_max"],
+                   round(100 * summary["horseshoe_wins"] / games, 2)]
+                + [round(100 * summary["wins"].get(a, 0) / games, 2) for a in names]
+            )
+
+
+if __name__ == "__main__":
+    # change these variables for a different sweep: every combination
+    # of the values is played with the same seeds
+    grid = {
+        "elimination": [True, False],
+        "players": [2, 4, 6],
+        "ai_mix": [[1, 1, 2, 3], [1], [2, 3]],
+        "start": ["default"],
+        "money": [300],
+    }
+    seeds = (0, 10**3)
+    # None uses all the cores
+    workers = None
+
+    t = time.time()
+    results, cached = run_sweep(grid, seeds, workers)
+    write_summary("sweep.csv", results)
+    print(f"{len(results)} cells, of which {cached} were already in the cache.")
+    print(f"It took {round(time.time()-t, 3)} seconds to run this.")
@@ -0,0 +1,260 @@
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import ai_game
+import AI_decisions
+import initialize
+from AI_decisions import AIParams
+from decision_cache import DecisionCache
+
+# The parameters of the AI (see AI_decisions.AIParams) are tuned by
+# letting one seat of the AI game play with candidate parameters while
+# the other AIs keep the defaults. A candidate is as good as the share
+# of the games that seat wins.
+#
+# All the candidates of a round play the same seeds, so they are
+# compared on the same games (paired seeds), and the defaults play
+# along as the reference. Successive halving: every candidate first
+# plays rung_games games, the better half plays twice as many more,
+# and so on until keep candidates are left. The weak candidates are
+# dropped after a few thousand games instead of playing them all for
+# as long as the best ones.
+#
+# The search is evolutionary: the first generation is random, and the
+# survivors of a generation are mutated into the next one. Every
+# generation plays new seeds. One generation is a plain random search.
+
+# the ranges of the random parameters
+sea_coeff_range = (0.0, 4.0)
+air_coeff_range = (0.0, 10.0)
+sea_penalty_range = (1.0, 3.0)
+# how many games of a candidate are played in one task of a worker
+chunk = 250
+# the seeds of the generations start this far apart
+generation_seeds = 10**7
+
+
+def random_params(rng):
+    """Returns random parameters from the ranges."""
+    return AIParams(
+        sea_coeff=round(rng.uniform(*sea_coeff_range), 2),
+        air_coeffs=tuple(round(rng.uniform(*air_coeff_range), 2) for _ in range(5)),
+        sea_penalty=round(rng.uniform(*sea_penalty_range), 2),
+    )
+
+
+def mutate(params, rng, scale=1.0):
+    """Returns the parameters with a little noise, within the ranges.
+
+    Parameters
+    ----------
+    params : AIParams
+        The parameters of a parent.
+    rng : random.Random
+        The random generator of the search.
+    scale : float, optional
+        How big the changes are. The noise of a value has the standard
+        deviation of scale / 8 of the width of its range. Defaults to 1.
+    """
+
+    def noisy(value, low, high):
+        value += rng.gauss(0, scale * (high - low) / 8)
+        return round(min(max(value, low), high), 2)
+
+    return params._replace(
+        sea_coeff=noisy(params.sea_coeff, *sea_coeff_range),
+        air_coeffs=tuple(noisy(a, *air_coeff_range) for a in params.air_coeffs),
+        sea_penalty=noisy(params.sea_penalty, *sea_penalty_range),
+    )
+
+
+def init_worker(decision_cache_size):
+    """Turns the decision cache on in a worker process."""
+    if decision_cache_size:
+        AI_decisions.set_decision_cache(DecisionCache(decision_cache_size))
+
+
+def play_chunk(params, start, stop, elimination=True, ai_types=None, seat=0):
+    """Plays the games with the seeds start, ..., stop - 1.
+
+    The AI at the index seat of ai_types plays with the parameters and
+    the others with the defaults. Returns a boolean array of whether
+    that AI won each game.
+    """
+    if ai_types is None:
+        ai_types = [1, 1, 2, 3]
+    seat_params = [None] * len(ai_types)
+    seat_params[seat] = params
+    data = ai_game.run_games(
+        start, stop, elimination, ai_types=ai_types, params=seat_params
+    )
+    return data[:, 0].astype(str) == initialize.sample_names[seat]
+
+
+def paired_difference(wins, reference):
+    """Returns the mean difference of the wins and its standard error."""
+    diff = wins.astype(float) - reference
+    if len(diff) < 2:
+        return float(diff.mean()), float("inf")
+    return float(diff.mean()), float(diff.std(ddof=1) / len(diff) ** 0.5)
+
+
+def successive_halving(pool, candidates, first_seed, rung_games=2000, keep=1,
+                       reporter=print, **game_setup):
+    """Plays the candidates until only keep of them are left.
+
+    Parameters
+    ----------
+    pool : ProcessPoolExecutor
+        Plays the games.
+    candidates : list of AIParams
+        The parameters to compare.
+    first_seed : int
+        The seed of the first game.
+    rung_games : int, optional
+        How many games every candidate plays before the first halving,
+        the next rungs are twice as long. Defaults to 2000.
+    keep : int, optional
+        How many candidates are left in the end. Defaults to 1.
+    reporter : callable, optional
+        Is told about every rung as a string. Defaults to print.
+    game_setup : optional
+        elimination, ai_types and seat of play_chunk.
+
+    Returns
+    -------
+    list of tuples
+        The parameters, the wins (boolean array) and the paired
+        difference to the defaults (mean, standard error) of the left
+        candidates, the best first.
+
+    Raises
+    ------
+    ValueError
+        If there are no candidates other than the defaults, which play
+        along as the reference anyway.
+    """
+    reference = AIParams()
+    alive = [a for a in dict.fromkeys(candidates) if a != reference]
+    if not alive:
+        raise ValueError("There must be a candidate other than the defaults!")
+    wins = {a: np.zeros(0, dtype=bool) for a in alive + [reference]}
+    played = 0
+    games = rung_games
+    while True:
+        futures = {
+            a: [
+                pool.submit(play_chunk, a, start, min(start + chunk, first_seed + played + games),
+                            **game_setup)
+                for start in range(first_seed + played, first_seed + played + games, chunk)
+            ]
+            for a in alive + [reference]
+        }
+        for params, parts in futures.items():
+            wins[params] = np.concatenate([wins[params]] + [a.result() for a in parts])
+        played += games
+        ranked = sorted(
+            alive, key=lambda a: paired_difference(wins[a], wins[reference])[0], reverse=True
+        )
+        best = paired_difference(wins[ranked[0]], wins[reference])
+        reporter(
+            f"{len(alive)} candidates after {played} games, the best wins "
+            + f"{round(wins[ranked[0]].mean() * 100, 2)} % "
+            + f"({round(best[0] * 100, 2)} ± {round(best[1] * 100, 2)} % points "
+            + f"to the defaults with {round(wins[reference].mean() * 100, 2)} %)."
+        )
+        if len(alive) <= keep:
+            break
+        alive = ranked[: max(keep, (len(alive) + 1) // 2)]
+        games *= 2
+    return [(a, wins[a], paired_difference(wins[a], wins[reference])) for a in ranked]
+
+
+def tune(generations=3, population=16, parents=4, rung_games=2000, workers=None,
+         seed=0, decision_cache_size=2**18, reporter=print, **game_setup):
+    """Searches the parameters of the AI with an evolutionary search.
+
+    Parameters
+    ----------
+    generations : int, optional
+        How many generations are played, 1 is a random search.
+        Defaults to 3.
+    population : int, optional
+        How many candidates a generation has. Defaults to 16.
+    parents : int, optional
+        How many candidates of a generation are left by successive
+        halving and mutated into the next generation. Defaults to 4.
+    rung_games : int, optional
+        See successive_halving. Defaults to 2000.
+    workers : int, optional
+        The amount of worker processes. Defaults to the amount of cores.
+    seed : int, optional
+        The seed of the search and of the first game. Defaults to 0.
+    decision_cache_size : int, optional
+        The size of the decision cache in each worker, None turns it
+        off. Defaults to 2**18.
+    reporter : callable, optional
+        Is told about the progress as strings. Defaults to print.
+    game_setup : optional
+        elimination, ai_types and seat of play_chunk.
+
+    Returns
+    -------
+    list of tuples
+        The survivors of the last generation, see successive_halving.
+    """
+    rng = random.Random(seed)
+    candidates = [random_params(rng) for _ in range(population)]
+    with ProcessPoolExecutor(
+        workers, initializer=init_worker, initargs=(decision_cache_size,)
+    ) as pool:
+        for generation in range(generations):
+            reporter(f"Generation {generation + 1}:")
+            survivors = successive_halving(
+                pool, candidates, seed + generation * generation_seeds, rung_games,
+                parents, reporter, **game_setup
+            )
+            parent_params = [a[0] for a in survivors]
+            candidates = parent_params + [
+                mutate(parent_params[x % len(parent_params)], rng)
+                for x in range(population - len(parent_params))
+            ]
+    return survivors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tunes the parameters of the AI.")
+    parser.add_argument("--generations", type=int, default=3,
+                        help="how many generations are played, 1 is a random search")
+    parser.add_argument("--population", type=int, default=16,
+                        help="how many candidates a generation has")
+    parser.add_argument("--parents", type=int, default=4,
+                        help="how many candidates are mutated into the next generation")
+    parser.add_argument("--rung-games", type=int, default=2000,
+                        help="how many games are played before the first halving")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the amount of worker processes, all the cores by default")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the search")
+    parser.add_argument("--seat", type=int, default=0,
+                        help="which AI of the AI game plays with the candidates")
+    parser.add_argument("--no-elimination", action="store_true",
+                        help="turns the elimination rules off")
+    parser.add_argument("--out", default="tuned.json",
+                        help="the file of the best parameters")
+    args = parser.parse_args()
+
+    t = time.time()
+    survivors = tune(
+        args.generations, args.population, args.parents, args.rung_games,
+        args.workers, args.seed, elimination=not args.no_elimination, seat=args.seat,
+    )
+    best, wins, (diff, error) = survivors[0]
+    with open(args.out, "w") as file:
+        json.dump(best._asdict(), file, indent=2)
+    print(f"The best parameters: {best}")
+    print(f"They win {round(wins.mean() * 100, 2)} % of {len(wins)} games, "
+          + f"{round(diff * 100, 2)} ± {round(error * 100, 2)} % points more than the defaults.")
+    print(f"It took {round(time.time()-t, 3)} seconds to run this.")
@@ -0,0 +1,162 @@
+from functools import cache
+import numpy as np
+import map
+
+# the distances and turns the tables cover; the longest distance
+# between two nodes of the board is well below max_distance
+max_distance = 64
+max_turns = 64
+
+
+@cache
+def sum_distribution(turns=max_turns):
+    """Returns the distribution of the sum of the dice.
+
+    The distribution is calculated by convolving the distribution of a
+    d6 with itself.
+
+    Returns
+    -------
+    array of float
+        (turns + 1, 6 * turns + 1): the row t is the probabilities of
+        the sums of t dice.
+    """
+    die = np.zeros(7)
+    die[1:] = 1 / 6
+    table = np.zeros((turns + 1, 6 * turns + 1))
+    table[0, 0] = 1
+    for t in range(1, turns + 1):
+        table[t, : 6 * t + 1] = np.convolve(table[t - 1, : 6 * (t - 1) + 1], die)
+    table.flags.writeable = False
+    return table
+
+
+@cache
+def covered_within(distance=max_distance, turns=max_turns):
+    """Returns the probabilities to cover the distances in the turns.
+
+    A distance n is covered in t turns, if the sum of t dice is at
+    least n. As one can stop in a city even if the dice would take one
+    further, this is the probability to get there within t turns.
+
+    Returns
+    -------
+    array of float
+        (distance + 1, turns + 1): the probability to cover the
+        distance n within t turns.
+    """
+    sums = sum_distribution(turns)
+    # tail[t, n] = P(the sum of t dice >= n)
+    tail = np.cumsum(sums[:, ::-1], axis=1)[:, ::-1]
+    width = min(distance + 1, tail.shape[1])
+    table = np.zeros((distance + 1, turns + 1))
+    table[:width] = tail[:, :width].T
+    table.flags.writeable = False
+    return table
+
+
+@cache
+def turns_distribution(distance=max_distance, turns=max_turns):
+    """Returns the distribution of the turns to cover the distances.
+
+    Returns
+    -------
+    array of float
+        (distance + 1, turns + 1): the probability that the distance n
+        is covered exactly on the turn t. The expected value of the row
+        n is map.expected(n).
+    """
+    within = covered_within(distance, turns)
+    table = np.diff(within, axis=1, prepend=0)
+    table.flags.writeable = False
+    return table
+
+
+@cache
+def distance_matrix(poor, sea_penalty=1.75):
+    """Returns the all-pairs distances between the nodes of the board.
+
+    The sea distances of a poor player are multiplied by sea_penalty
+    (see map.distances and AI_decisions.AIParams), so the distances
+    are rounded up to whole steps. Unreachable nodes have the distance
+    -1.
+    """
+    dists = np.array([map.distances(x, poor, sea_penalty) for x in range(len(map.abbs))])
+    matrix = np.where(np.isfinite(dists), np.ceil(dists), -1).astype(np.int64)
+    matrix.flags.writeable = False
+    return matrix
+
+
+@cache
+def reach_within(poor, turns=max_turns, sea_penalty=1.75):
+    """Returns the probabilities to reach each node within the turns.
+
+    sea_penalty is that of distance_matrix.
+
+    Returns
+    -------
+    array of float
+        (nodes, nodes, turns + 1): the probability to get from the
+        node a to the node b within t turns.
+    """
+    dists = distance_matrix(poor, sea_penalty)
+    within = covered_within(max(max_distance, dists.max()), turns)
+    table = np.where((dists >= 0)[:, :, None], within[np.maximum(dists, 0)], 0.0)
+    table.flags.writeable = False
+    return table
+
+
+def reach_probability(loc_str, target, turns, poor=False, sea_penalty=1.75):
+    """Returns the probability to get to the target within the turns.
+
+    Parameters
+    ----------
+    loc_str : str
+        The location string of the player. Between two nodes the player
+        goes through the closer end.
+    target : str
+        The abbreviation of the target, e.g. Tan.
+    turns : int
+        Within how many turns.
+    poor : bool, optional
+        If the player has no money. Defaults to False.
+    sea_penalty : float, optional
+        How many times longer the sea is for a poor player (see
+        AI_decisions.AIParams). Defaults to 1.75.
+
+    Returns
+    -------
+    float
+    """
+    loc = loc_str.split("-")
+    dists = distance_matrix(poor, sea_penalty)
+    goal = map.abb_index[target]
+    if len(loc) == 1:
+        distance = dists[map.abb_index[loc[0]], goal]
+    else:
+        ends = [
+            (dists[map.abb_index[loc[0]], goal], int(loc[2])),
+            (dists[map.abb_index[loc[1]], goal], int(loc[3])),
+        ]
+        reachable = [a + b for a, b in ends if a >= 0]
+        distance = min(reachable) if reachable else -1
+    if distance < 0:
+        return 0.0
+    return float(covered_within(max(max_distance, distance), max(max_turns, turns))[distance, turns])
+
+
+def first_to_reach(distance_a, distance_b, a_moves_first=True, turns=max_turns):
+    """Returns the probability that the player a gets there first.
+
+    Both players race their distances with the dice. If they would get
+    there in the same round, the one who moves first wins.
+    """
+    dist = turns_distribution(max(max_distance, distance_a, distance_b), turns)
+    a = dist[distance_a]
+    b_within = np.cumsum(dist[distance_b])
+    if a_moves_first:
+        # b must not be there before the same round
+        b_later = 1 - np.concatenate([[0], b_within[:-1]])
+    else:
+        b_later = 1 - b_within
+    return float((a * b_later).sum())
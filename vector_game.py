@@ -0,0 +1,785 @@
+import argparse
+import time
+from functools import cache
+import numpy as np
+import map
+import game
+import initialize
+import home_race
+import AI_decisions
+import seed_catalog
+
+# The AI game of game.py for many games at once. The state of every game
+# is a row of NumPy arrays (the players are the columns of their seats),
+# and a turn is played for all the games with the same operations over
+# the rows, so a turn costs about the same for one game as for a few
+# hundred. The locations are the indices of home_race.board(), and the
+# moves of the dice are looked up from tables of its destinations.
+#
+# The decisions are those of AI_decisions.py with the default
+# parameters. choose_token compares the sorted distances to the
+# unflipped tokens lexicographically. Every game keeps the sorted
+# distances from each node, in quarter steps (the sea is 1.75 times
+# longer without money), packed into integers with the nearest token in
+# the highest bits, so that a comparison of a few integers compares the
+# rows. A flip removes the distance of the token from the rows of its
+# game.
+#
+# Every game has its own Mersenne Twister, the same generator as
+# random.Random(seed) (see seed_catalog.py), and draws the same numbers
+# in the same order as the Game, so a game is the same as the game of
+# ai_game.py with the seed. `python vector_game.py` checks this.
+
+# the decisions of a turn, the first four in the order of the actions of
+# Player.turn_possibilities
+FLIP, LAND, SEA, AIR, FORCED = range(5)
+# the distances are in quarter steps (a power of two, see steps in tables)
+scale = 4
+# the variants of the distances: with money, without money (the sea is
+# longer), and without money rounded down to steps (in the cities). The
+# last is not kept, but the fractions of steps are cleared from the
+# fields of the second.
+RICH, POOR, POOR_CITY = range(3)
+token_money = {4: 300, 5: 600, 6: 1000}
+
+
+def _level(money):
+    """Returns the money levels of the race home, see home_race.level."""
+    return np.minimum(money // 100, home_race.max_money)
+
+
+def _pack(sorted_rows, bits, fields):
+    """Packs the sorted distances into integers of the fields."""
+    shape = sorted_rows.shape[:-1]
+    blocks = -(-sorted_rows.shape[-1] // fields)
+    padded = np.zeros(shape + (blocks * fields,), dtype=np.int64)
+    padded[..., : sorted_rows.shape[-1]] = sorted_rows
+    shifts = bits * np.arange(fields - 1, -1, -1, dtype=np.int64)
+    return (padded.reshape(shape + (blocks, fields)) << shifts).sum(axis=-1)
+
+
+def _remove(keys, position, bits, fields, masks):
+    """Removes the field at the position from the packed rows.
+
+    The fields after it move one field up, also across the blocks.
+    masks[position] has the bits of the fields that move.
+    """
+    shifted = (keys << bits) & ((1 << (bits * fields)) - 1)
+    # the first field of the next block; the one of the next rows lands
+    # in the spare field after the last token, which never moves
+    shifted.reshape(-1)[:-1] |= (keys.reshape(-1) >> (bits * (fields - 1)))[1:]
+    shifted ^= keys
+    shifted &= np.take(masks, position, axis=0)
+    shifted ^= keys
+    return shifted
+
+
+# the amount of ones in the numbers of 15 bits
+_bit_counts = np.array([bin(x).count("1") for x in range(1 << 15)], dtype=np.int64)
+
+
+@cache
+def tables():
+    """Returns the tables of the board for the games.
+
+    Returns
+    -------
+    dictionary
+        city, at_sea, has_land, has_sea, has_air, home, beduin, pirate:
+        for each location of home_race.board().
+        first, second, d_first, d_second: the location as a candidate
+        (see AI_decisions.candidate_arrays).
+        dests, counts: (locs, land/sea, dice, destinations) and their
+        amounts, padded with 0. forced, forced_counts: by sea without
+        money. air, air_counts: the flights.
+        after: (without, with money for the sea) the flat state of the
+        race home after moving to the location (see home_race.scores).
+        routes: (nodes, candidates) of the routes from each city by
+        land, sea and air (see AI_decisions.route_arrays), the decision
+        of each in route_kind and -1 if there is no such route.
+        keys: (variants, nodes, blocks) the sorted distances to all the
+        tokens in quarter steps, packed into fields of bits. closer:
+        (tokens, variants, nodes) the bits of the tokens that are closer
+        than the token, i.e. before it in the sorted distances. ones:
+        (blocks, tokens + 1) a one in each field of the first tokens, to
+        add a number to the fields. steps: the bits of the whole steps
+        in the fields, to round the distances down. moving: (tokens + 1,
+        blocks) the bits of the fields from each position on.
+    """
+    locs, index, moves = home_race.board()
+    size = len(locs)
+    params = AI_decisions.default_params
+    first, second, d_first, d_second = AI_decisions.candidate_arrays(locs)
+    city = np.array([home_race.is_city(a) for a in locs])
+    at_sea = np.array([not home_race.is_city(a) and home_race.offshore(a) for a in locs])
+
+    def routes_of(routes):
+        return np.array([home_race.is_city(a) and bool(routes.get(a)) for a in locs])
+
+    width = max(len(a) for a in moves.values())
+    dests = np.zeros((size, 2, 6, width), dtype=np.int64)
+    counts = np.zeros((size, 2, 6), dtype=np.int64)
+    air = np.zeros((size, width), dtype=np.int64)
+    air_counts = np.zeros(size, dtype=np.int64)
+    for (loc, way, steps), options in moves.items():
+        row = [index[a] for a in options]
+        if way == "air":
+            air[index[loc], : len(row)] = row
+            air_counts[index[loc]] = len(row)
+        else:
+            dests[index[loc], int(way == "sea"), steps - 1, : len(row)] = row
+            counts[index[loc], int(way == "sea"), steps - 1] = len(row)
+    after = np.array(
+        [
+            [index[a] * home_race.specials + home_race.special_after(a, special) for a in locs]
+            for special in (0, 1)
+        ]
+    )
+
+    # one step to each route of the cities, as choose_action_token
+    route_rows = []
+    for abb in map.abbs:
+        rows = []
+        for decision, way in ((LAND, "land"), (SEA, "sea"), (AIR, "air")):
+            arrays = AI_decisions.route_arrays(abb, way)
+            rows += [(decision,) + tuple(a) for a in zip(*arrays)]
+        route_rows.append(rows)
+    most = max(len(a) for a in route_rows)
+    routes = np.full((5, map.no_nodes, most), -1, dtype=np.int64)
+    for x, rows in enumerate(route_rows):
+        if rows:
+            routes[:, x, : len(rows)] = np.array(rows).T
+
+    rich = np.array([map.distances(t, False) for t in range(map.no_tokens)]).T
+    poor = np.array(
+        [map.distances(t, True, params.sea_penalty) for t in range(map.no_tokens)]
+    ).T
+    distances = np.stack([rich, poor]) * scale
+    if not np.array_equal(distances, np.round(distances)):
+        raise ValueError("The distances must be whole quarter steps!")
+    distances = distances.astype(np.int64)
+    coeffs = np.array((params.sea_coeff,) + tuple(params.air_coeffs)) * scale
+    if not np.array_equal(coeffs, np.round(coeffs)):
+        raise ValueError("The coefficients of the AI must be whole quarter steps!")
+    # the largest number in a field: a distance, the steps to a node and
+    # a coefficient
+    largest = distances.max() + scale * max(d_first.max(), routes[4].max()) + coeffs.max()
+    bits = int(largest).bit_length()
+    fields = 63 // bits
+    # a spare empty field after the last token, see _remove
+    blocks = -(-(map.no_tokens + 1) // fields)
+    spare = np.zeros(distances.shape[:2] + (1,), dtype=np.int64)
+    keys = _pack(np.concatenate([np.sort(distances, axis=2), spare], axis=2), bits, fields)
+    powers = 1 << np.arange(map.no_tokens, dtype=np.int64)
+    closer = ((distances[:, :, None, :] < distances[:, :, :, None]) * powers).sum(axis=3)
+    closer = np.ascontiguousarray(np.moveaxis(closer, 2, 0))
+    ones = np.zeros((blocks, map.no_tokens + 1), dtype=np.int64)
+    for count in range(map.no_tokens + 1):
+        for x in range(count):
+            ones[x // fields, count] += 1 << (bits * (fields - 1 - x % fields))
+    steps = ((1 << (bits * fields)) - 1) - ones[0, fields] * (scale - 1)
+    # the fields from each position on
+    moving = (ones[:, -1] * ((1 << bits) - 1))[None, :] - ones.T * ((1 << bits) - 1)
+    return {
+        "city": city,
+        "at_sea": at_sea,
+        "has_land": routes_of(map.land_routes),
+        "has_sea": routes_of(map.sea_routes),
+        "has_air": routes_of(map.air_routes),
+        "home": np.array([a in home_race.homes for a in locs]),
+        "beduin": np.array([a in map.beduin_squares for a in locs]),
+        "pirate": np.array([a in map.pirate_squares for a in locs]),
+        "first": first,
+        "second": second,
+        "d_first": d_first,
+        "d_second": d_second,
+        "dests": dests,
+        "counts": counts,
+        "forced": dests[:, 1, 1],
+        "forced_counts": counts[:, 1, 1],
+        "air": air,
+        "air_counts": air_counts,
+        "after": after,
+        "route_kind": routes[0],
+        "routes": routes[1:],
+        "closer": closer,
+        "keys": keys,
+        "ones": ones,
+        "steps": steps,
+        "moving": moving,
+        "bits": bits,
+        "fields": fields,
+        "targets": np.array([map.dist_gol, map.dist_tow]),
+    }
+
+
+class VectorGames:
+    """
+    Many AI games played at once
+
+    The games are those of initialize.init_AI with the same AIs, each
+    with its own seed. The methods take the rows (the games) and the
+    seats of the players as arrays, and play the same part of a turn
+    for all of them. play plays whole games; environment.py plays the
+    turns of one player itself and the others with play_turns.
+
+    ...
+
+    Attributes
+    ----------
+    n : int
+        The amount of games.
+    elimination : bool
+        Whether the elimination rules are on.
+    ai_types : array of int
+        The types of the AIs in the order of initialize.init_AI.
+    seat_ai : array of int
+        (n, players) the index of the AI (in ai_types) in each seat,
+        i.e. in the order of the turns.
+    location, money, special, has_star, has_horseshoe, ai_type, alive :
+        arrays of (n, players) of the players in their seats. A player
+        eliminated from the game is not alive.
+    tokens, unflipped : arrays of (n, nodes)
+        The tokens of the cities and whether they are unflipped.
+    horseshoes_found, star_found, cape_visit, turn_no : arrays of (n,)
+        Of the games.
+    turn : array of int
+        The seat of the current (or the last) turn.
+    winner : array of int
+        The seat of the winner, -1 if the game isn't over.
+
+    Methods
+    -------
+    start
+        Starts the games of the rows with the seeds
+    play
+        Plays the games of the rows to the end
+    play_turns
+        Plays the turns of the AIs in the seats
+    begin_turn, end_turn
+        Return the seats of the next turn, and end the turn
+    possible
+        Returns the actions the players can take
+    pay
+        Pays for the travel the players decided
+    options
+        Returns the destinations of the decisions
+    move, try_flip, stuck, slave
+        The parts of a turn, as in game.py
+    """
+
+    def __init__(self, n, elimination=True, ai_types=None):
+        """
+        Parameters
+        ----------
+        n : int
+            The amount of games.
+        elimination : bool, optional
+            Whether the elimination rules are on. Defaults to True.
+        ai_types : list of int, optional
+            The types of the AIs (see initialize.init_AI).
+        """
+        if ai_types is None:
+            ai_types = initialize.default_ai_types
+            starting_locs = ["Cai", "Tan", "Cai", "Tan"]
+        else:
+            starting_locs = initialize.default_starting_locs(ai_types)
+        if not ai_types or len(ai_types) > initialize.max_players:
+            raise ValueError(
+                f"The amount of players must be between 1 and {initialize.max_players}!"
+            )
+        self.tables = tables()
+        index = home_race.board()[1]
+        self.n = n
+        self.elimination = elimination
+        self.ai_types = np.array(ai_types, dtype=np.int8)
+        self.starting_locs = np.array([index[a] for a in starting_locs])
+        players = len(ai_types)
+        self.seat_ai = np.zeros((n, players), dtype=np.int64)
+        self.location = np.zeros((n, players), dtype=np.int64)
+        self.money = np.zeros((n, players), dtype=np.int64)
+        self.special = np.zeros((n, players), dtype=np.int8)
+        self.has_star = np.zeros((n, players), dtype=bool)
+        self.has_horseshoe = np.zeros((n, players), dtype=bool)
+        self.ai_type = np.zeros((n, players), dtype=np.int8)
+        self.alive = np.zeros((n, players), dtype=bool)
+        self.tokens = np.zeros((n, map.no_nodes), dtype=np.int8)
+        self.unflipped = np.zeros((n, map.no_nodes), dtype=bool)
+        self.keys = np.zeros((n,) + self.tables["keys"].shape, dtype=np.int64)
+        self.horseshoes_found = np.zeros(n, dtype=np.int64)
+        self.star_found = np.zeros(n, dtype=bool)
+        self.cape_visit = np.zeros(n, dtype=bool)
+        self.turn_no = np.zeros(n, dtype=np.int64)
+        self.turn = np.zeros(n, dtype=np.int64)
+        self.winner = np.full(n, -1, dtype=np.int64)
+        # the generators: the words of the states and their outputs, a
+        # column for each game, and the next output of each game
+        self.state = np.zeros((seed_catalog.mt_size, n), dtype=np.uint32)
+        self.outputs = np.zeros((seed_catalog.mt_size, n), dtype=np.uint32)
+        self.position = np.zeros(n, dtype=np.int64)
+
+    def _next(self, rows):
+        """Returns the next outputs of the generators of the rows."""
+        due = rows[self.position[rows] == seed_catalog.mt_size]
+        if len(due):
+            state = seed_catalog.twist(self.state[:, due])
+            self.state[:, due] = state
+            self.outputs[:, due] = seed_catalog.temper(state)
+            self.position[due] = 0
+        outputs = self.outputs[self.position[rows], rows]
+        self.position[rows] += 1
+        return outputs
+
+    def _below(self, rows, n):
+        """Returns random numbers 0, ..., n - 1 like random._randbelow."""
+        shift = 32 - n.bit_length()
+        draw = self._next(rows) >> shift
+        again = np.flatnonzero(draw >= n)
+        while len(again):
+            draw[again] = self._next(rows[again]) >> shift
+            again = again[draw[again] >= n]
+        return draw.astype(np.int64)
+
+    def roll(self, rows):
+        """Rolls the dice of the games of the rows."""
+        return self._below(rows, 6) + 1
+
+    def _shuffle(self, rows, items):
+        """Shuffles the items of each row like random.shuffle."""
+        columns = np.arange(len(rows))
+        for x in range(items.shape[1] - 1, 0, -1):
+            draw = self._below(rows, x + 1)
+            swapped = items[columns, draw]
+            items[columns, draw] = items[:, x]
+            items[:, x] = swapped
+
+    def start(self, rows, seeds):
+        """Starts the games of the rows with the seeds."""
+        seeds = np.asarray(seeds, dtype=np.int64)
+        if len(seeds) and (seeds.min() < 0 or seeds.max() >= 2**32):
+            raise ValueError("The seeds must be between 0 and 2**32 - 1!")
+        self.state[:, rows] = seed_catalog.seeded_states(seeds)
+        self.position[rows] = seed_catalog.mt_size
+        # the shuffles of initialize.init_AI and Game.__init__
+        seats = np.tile(np.arange(len(self.ai_types)), (len(rows), 1))
+        self._shuffle(rows, seats)
+        tokens = np.tile(np.array(game.initial_tokens, dtype=np.int8), (len(rows), 1))
+        self._shuffle(rows, tokens)
+        self.seat_ai[rows] = seats
+        self.location[rows] = self.starting_locs[seats]
+        self.money[rows] = 300
+        self.special[rows] = 0
+        self.has_star[rows] = False
+        self.has_horseshoe[rows] = False
+        self.ai_type[rows] = self.ai_types[seats]
+        self.alive[rows] = True
+        self.tokens[rows, : map.no_tokens] = tokens
+        self.unflipped[rows] = np.arange(map.no_nodes) < map.no_tokens
+        self.keys[rows] = self.tables["keys"]
+        self.horseshoes_found[rows] = 0
+        self.star_found[rows] = False
+        self.cape_visit[rows] = False
+        self.turn_no[rows] = 1
+        self.turn[rows] = -1
+        self.winner[rows] = -1
+
+    def begin_turn(self, rows):
+        """Returns the seats of the next turn of the rows.
+
+        As in Game.play_steps, the turn number grows when the turns
+        start again from the first seat. The eliminated seats are
+        skipped.
+        """
+        alive = self.alive[rows]
+        later = alive & (np.arange(alive.shape[1]) > self.turn[rows][:, None])
+        again = ~later.any(axis=1)
+        self.turn_no[rows[again]] += 1
+        seats = np.where(again, alive.argmax(axis=1), later.argmax(axis=1))
+        self.turn[rows] = seats
+        return seats
+
+    def end_turn(self, rows, seats):
+        """Ends the turns: a player at home with the star or a horseshoe wins."""
+        won = self.tables["home"][self.location[rows, seats]] & (
+            self.has_star[rows, seats] | self.has_horseshoe[rows, seats]
+        )
+        self.winner[rows[won]] = seats[won]
+
+    def play(self, rows):
+        """Plays the games of the rows until they have a winner.
+
+        Returns the amount of the turns played.
+        """
+        rows = rows[self.winner[rows] < 0]
+        turns = 0
+        while len(rows):
+            seats = self.begin_turn(rows)
+            self.play_turns(rows, seats)
+            self.end_turn(rows, seats)
+            turns += len(rows)
+            rows = rows[self.winner[rows] < 0]
+        return turns
+
+    def possible(self, rows, seats):
+        """Returns the possible actions (flip, land, sea, air) of the players.
+
+        See Player.turn_possibilities.
+        """
+        t = self.tables
+        loc = self.location[rows, seats]
+        city = t["city"][loc]
+        possible = np.empty((len(rows), 4), dtype=bool)
+        possible[:, FLIP] = city & self.unflipped[rows, np.where(city, loc, 0)]
+        possible[:, LAND] = np.where(city, t["has_land"][loc], ~t["at_sea"][loc])
+        possible[:, SEA] = np.where(city, t["has_sea"][loc], t["at_sea"][loc])
+        possible[:, AIR] = t["has_air"][loc] & (self.money[rows, seats] >= 300)
+        return possible
+
+    def pay(self, rows, seats, decisions):
+        """Pays for the travel from a city, returns the decisions.
+
+        A player without money travels by sea with the forced decision.
+        """
+        decisions = decisions.copy()
+        city = self.tables["city"][self.location[rows, seats]]
+        sea = np.flatnonzero((decisions == SEA) & city)
+        poor = sea[self.money[rows[sea], seats[sea]] == 0]
+        self.special[rows[poor], seats[poor]] = 1
+        decisions[poor] = FORCED
+        paid = sea[self.money[rows[sea], seats[sea]] > 0]
+        self.money[rows[paid], seats[paid]] -= 100
+        air = decisions == AIR
+        self.money[rows[air], seats[air]] -= 300
+        return decisions
+
+    def options(self, rows, seats, decisions):
+        """Returns the destinations of the decisions (not flip).
+
+        The dice are rolled for land and sea.
+
+        Returns
+        -------
+        options : array of int
+            (rows, destinations) the locations, padded with 0.
+        counts : array of int
+            The amount of the destinations.
+        """
+        t = self.tables
+        loc = self.location[rows, seats]
+        options = np.zeros((len(rows), t["dests"].shape[3]), dtype=np.int64)
+        counts = np.zeros(len(rows), dtype=np.int64)
+        dice = np.flatnonzero((decisions == LAND) | (decisions == SEA))
+        roll = self.roll(rows[dice]) - 1
+        way = (decisions[dice] == SEA).astype(np.int64)
+        options[dice] = t["dests"][loc[dice], way, roll]
+        counts[dice] = t["counts"][loc[dice], way, roll]
+        for decision, table in ((AIR, "air"), (FORCED, "forced")):
+            chosen = decisions == decision
+            options[chosen] = t[table][loc[chosen]]
+            counts[chosen] = t[table + "_counts"][loc[chosen]]
+        return options[:, : max(counts.max(initial=0), 1)], counts
+
+    def move(self, rows, seats, locs):
+        """Moves the players to the locations, see Game.move."""
+        t = self.tables
+        self.location[rows, seats] = locs
+        city = t["city"][locs]
+        for special, squares in ((2, "beduin"), (3, "pirate")):
+            stuck = ~city & t[squares][locs]
+            self.special[rows[stuck], seats[stuck]] = special
+        rows, seats, locs = rows[city], seats[city], locs[city]
+        self.special[rows, seats] = 0
+        cape = (locs == map.abb_index["Tow"]) & ~self.cape_visit[rows]
+        self.cape_visit[rows[cape]] = True
+        self.money[rows[cape], seats[cape]] += 500
+        flip = (
+            self.unflipped[rows, locs]
+            & (self.money[rows, seats] >= 100)
+            & ~(self.has_star[rows, seats] | self.has_horseshoe[rows, seats])
+        )
+        self.money[rows[flip], seats[flip]] -= 100
+        self.flip(rows[flip], seats[flip])
+
+    def try_flip(self, rows, seats):
+        """Tries to flip the tokens: works if 4-6 is rolled."""
+        flip = self.roll(rows) > 3
+        self.flip(rows[flip], seats[flip])
+
+    def flip(self, rows, seats):
+        """Flips the tokens where the players are, see Game.flip."""
+        if not len(rows):
+            return
+        t = self.tables
+        locs = self.location[rows, seats]
+        token = self.tokens[rows, locs]
+        slave = (token == 1) & (locs == map.abb_index["Sla"])
+        self.special[rows[slave], seats[slave]] = 6
+        shoe = token == 2
+        self.horseshoes_found[rows[shoe]] += 1
+        shoe &= self.star_found[rows]
+        self.has_horseshoe[rows[shoe], seats[shoe]] = True
+        last = rows[shoe & (self.horseshoes_found[rows] == 5)]
+        if self.elimination and len(last):
+            self.alive[last] &= self.has_star[last] | self.has_horseshoe[last]
+        robber = token == 3
+        self.money[rows[robber], seats[robber]] = 0
+        for value, money in token_money.items():
+            found = token == value
+            gol = np.where(locs[found] == map.abb_index["Gol"], 2, 1)
+            self.money[rows[found], seats[found]] += money * gol
+        star = token == 7
+        self.star_found[rows[star]] = True
+        self.has_star[rows[star], seats[star]] = True
+        won = star & (self.horseshoes_found[rows] == 5)
+        if self.elimination:
+            self.winner[rows[won]] = seats[won]
+        # the distance to the token is removed from the sorted rows, it
+        # is after the distances to the closer unflipped tokens
+        unflipped = self.unflipped[rows, : map.no_tokens] @ (1 << np.arange(map.no_tokens))
+        closer = t["closer"][locs] & unflipped[:, None, None]
+        position = _bit_counts[closer & 0x7FFF] + _bit_counts[closer >> 15]
+        self.keys[rows] = _remove(
+            self.keys[rows], position, t["bits"], t["fields"], t["moving"]
+        )
+        self.unflipped[rows, locs] = False
+
+    def stuck(self, rows, seats):
+        """The players with the beduins or the pirates escape with 1-2."""
+        free = self.roll(rows) < 3
+        self.special[rows[free], seats[free]] = 0
+
+    def slave(self, rows, seats):
+        """The players working as slaves have one turn less to work."""
+        special = self.special[rows, seats]
+        self.special[rows, seats] = np.where(special == 4, 0, special - 1)
+
+    def _lex_choice(self, rows, variants, first, second, add_first, add_second, valid):
+        """Returns the candidates with the lexicographically smallest rows.
+
+        Each candidate has two rows, the sorted distances from the first
+        and the second node in its variant plus the adds (see
+        AI_decisions.token_scores). Of equal rows the first is chosen.
+        """
+        t = self.tables
+        shape = (len(rows), 2 * first.shape[1])
+        variants = np.repeat(variants, 2, axis=1)
+        nodes = np.stack([first, second], axis=2).reshape(shape)
+        adds = np.stack([add_first, add_second], axis=2).reshape(shape)
+        best = np.repeat(valid, 2, axis=1)
+        count = self.unflipped[rows, : map.no_tokens].sum(axis=1)
+        rest = np.arange(len(rows))
+        for block in range(len(t["ones"])):
+            rest = rest[count[rest] > block * t["fields"]]
+            if block:
+                candidates = best[rest, 0::2] | best[rest, 1::2]
+                rest = rest[candidates.sum(axis=1) > 1]
+            if not len(rest):
+                break
+            keys = self.keys[
+                rows[rest][:, None], np.minimum(variants[rest], POOR), nodes[rest], block
+            ]
+            keys = np.where(variants[rest] == POOR_CITY, keys & t["steps"], keys)
+            keys = keys + adds[rest] * t["ones"][block, count[rest]][:, None]
+            keys = np.where(best[rest], keys, np.iinfo(np.int64).max)
+            best[rest] &= keys == keys.min(axis=1, keepdims=True)
+        return best.argmax(axis=1) // 2
+
+    def choose_token(self, rows, options, counts, poor):
+        """Returns the options of the AIs to get the closest token."""
+        t = self.tables
+        first, second = t["first"][options], t["second"][options]
+        city = first == second
+        return self._lex_choice(
+            rows, np.where(poor[:, None], np.where(city, POOR_CITY, POOR), RICH),
+            first, second, scale * t["d_first"][options], scale * t["d_second"][options],
+            np.arange(options.shape[1]) < counts[:, None],
+        )
+
+    def choose_action_token(self, rows, seats, possible):
+        """Returns the actions of the AIs to get the closest token."""
+        t = self.tables
+        params = AI_decisions.default_params
+        loc = self.location[rows, seats]
+        money = self.money[rows, seats][:, None]
+        kind = t["route_kind"][loc]
+        first, second, d_first, d_second = t["routes"][:, loc]
+        valid = (kind >= 0) & np.take_along_axis(possible, np.maximum(kind, 0), axis=1)
+        # the flights end in cities, the other routes between nodes
+        variants = np.where(
+            kind == AIR, np.where(money == 300, POOR_CITY, RICH), np.where(money == 0, POOR, RICH)
+        )
+        air_coeffs = np.array(params.air_coeffs)[
+            np.searchsorted([300, 400, 900, 1200], money, side="left")
+        ]
+        coeffs = np.select(
+            [kind == AIR, (kind == SEA) & ((money == 100) | (money == 200))],
+            [air_coeffs, params.sea_coeff], 0,
+        )
+        choice = self._lex_choice(
+            rows, variants, first, second, (scale * (d_first + coeffs)).astype(np.int64),
+            (scale * (d_second + coeffs)).astype(np.int64), valid,
+        )
+        return np.where(possible[:, FLIP], FLIP, kind[np.arange(len(rows)), choice])
+
+    def choose_city(self, rows, options, counts, targets):
+        """Returns the options of the AIs to get to Gol (0) or Tow (1)."""
+        t = self.tables
+        first, second = t["first"][options], t["second"][options]
+        valid = np.arange(options.shape[1]) < counts[:, None]
+        city = (first == second) & valid
+        dists = t["targets"][targets]
+        gol, tow = (city & (first == map.abb_index[a]) for a in ("Gol", "Tow"))
+        potentials = city & np.take_along_axis(self.unflipped[rows], first, axis=1)
+        rows_ = np.arange(len(rows))[:, None]
+        scores = np.where(
+            potentials.any(axis=1)[:, None],
+            np.where(potentials, dists[rows_, first], np.inf),
+            np.minimum(
+                dists[rows_, first] + t["d_first"][options],
+                dists[rows_, second] + t["d_second"][options],
+            ),
+        )
+        choice = np.where(valid, scores, np.inf).argmin(axis=1)
+        choice = np.where(potentials.sum(axis=1) == 1, potentials.argmax(axis=1), choice)
+        choice = np.where(tow.any(axis=1), tow.argmax(axis=1), choice)
+        return np.where(gol.any(axis=1), gol.argmax(axis=1), choice)
+
+    def choose_home(self, options, counts, money, forced):
+        """Returns the options of the AIs to get home asap."""
+        values, _ = home_race.solve()
+        states = self.tables["after"][forced.astype(np.int64)[:, None], options]
+        scores = values[_level(money)[:, None], states]
+        valid = np.arange(options.shape[1]) < counts[:, None]
+        return np.where(valid, scores, np.inf).argmin(axis=1)
+
+    def _update_types(self, rows, seats):
+        """The types 2 and 3 become 1s after Cape Town or Gold Coast."""
+        ai_type = self.ai_type[rows, seats]
+        done = ((ai_type == 2) & self.cape_visit[rows]) | (
+            (ai_type == 3) & ~self.unflipped[rows, map.abb_index["Gol"]]
+        )
+        self.ai_type[rows[done], seats[done]] = 1
+
+    def _decide_action(self, rows, seats, possible):
+        """Returns the actions of the AIs, see Game.AI_turn_decision."""
+        _, policy = home_race.solve()
+        loc = self.location[rows, seats]
+        money = self.money[rows, seats]
+        decisions = np.empty(len(rows), dtype=np.int64)
+        home = self.has_star[rows, seats] | self.has_horseshoe[rows, seats]
+        decisions[home] = policy[_level(money[home]), loc[home]] + LAND
+        rest = np.flatnonzero(~home)
+        searching = rest[~self.star_found[rows[rest]]]
+        self._update_types(rows[searching], seats[searching])
+        city = searching[self.ai_type[rows[searching], seats[searching]] > 1]
+        decisions[city] = np.where(possible[city, FLIP], FLIP, LAND)
+        token = np.setdiff1d(rest, city, assume_unique=True)
+        if len(token):
+            decisions[token] = self.choose_action_token(
+                rows[token], seats[token], possible[token]
+            )
+        return decisions
+
+    def _decide_move(self, rows, seats, decisions, options, counts):
+        """Returns the options of the AIs, see Game.AI_movement_decision."""
+        money = self.money[rows, seats]
+        choice = np.zeros(len(rows), dtype=np.int64)
+        home = self.has_star[rows, seats] | self.has_horseshoe[rows, seats]
+        if home.any():
+            choice[home] = self.choose_home(
+                options[home], counts[home], money[home], decisions[home] == FORCED
+            )
+        rest = ~home & ~self.star_found[rows]
+        self._update_types(rows[rest], seats[rest])
+        ai_type = self.ai_type[rows, seats]
+        for target, value in ((0, 3), (1, 2)):
+            city = np.flatnonzero(rest & (ai_type == value))
+            if len(city):
+                choice[city] = self.choose_city(
+                    rows[city], options[city], counts[city], np.full(len(city), target)
+                )
+        token = np.flatnonzero(~home & ~(rest & (ai_type > 1)))
+        if len(token):
+            choice[token] = self.choose_token(
+                rows[token], options[token], counts[token], money[token] == 0
+            )
+        return choice
+
+    def play_turns(self, rows, seats):
+        """Plays the turns of the AIs in the seats, see Game.run_turn_AI."""
+        special = self.special[rows, seats]
+        stuck = (special == 2) | (special == 3)
+        self.stuck(rows[stuck], seats[stuck])
+        slave = special >= 4
+        self.slave(rows[slave], seats[slave])
+        free = np.flatnonzero(special == 0)
+        decisions = np.full(len(rows), FORCED, dtype=np.int64)
+        possible = self.possible(rows[free], seats[free])
+        many = possible.sum(axis=1) > 1
+        decisions[free] = np.where(possible[:, LAND], LAND, SEA)
+        decisions[free[many]] = self._decide_action(
+            rows[free[many]], seats[free[many]], possible[many]
+        )
+        decisions[free] = self.pay(rows[free], seats[free], decisions[free])
+        flip = np.flatnonzero(decisions == FLIP)
+        self.try_flip(rows[flip], seats[flip])
+        travel = np.flatnonzero(((special == 0) | (special == 1)) & (decisions != FLIP))
+        rows, seats, decisions = rows[travel], seats[travel], decisions[travel]
+        options, counts = self.options(rows, seats, decisions)
+        choice = self._decide_move(rows, seats, decisions, options, counts)
+        self.move(rows, seats, options[np.arange(len(rows)), choice])
+
+
+def check(start, stop, elimination=True, ai_types=None):
+    """Plays the seeds with both engines, returns the seeds that differ.
+
+    The winner, the length of the game, whether the winner has a
+    horseshoe and the city of the star are compared with ai_game.py.
+    """
+    import ai_game
+
+    games = VectorGames(stop - start, elimination, ai_types)
+    rows = np.arange(stop - start)
+    games.start(rows, np.arange(start, stop))
+    games.play(rows)
+    names = [initialize.player_name(x) for x in games.seat_ai[rows, games.winner]]
+    differ = []
+    for x in rows:
+        row = ai_game.play_game(start + int(x), elimination, ai_types=ai_types)
+        seat = games.winner[x]
+        mine = [
+            names[x], games.turn_no[x], games.has_horseshoe[x, seat],
+            list(games.tokens[x]).index(7),
+        ]
+        if [a.item() if hasattr(a, "item") else a for a in mine] != row:
+            differ.append(start + int(x))
+    return differ
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Plays AI games at once with NumPy and checks them against game.py."
+    )
+    parser.add_argument("--games", type=int, default=2000, help="how many games")
+    parser.add_argument("--start", type=int, default=0, help="the first seed")
+    parser.add_argument(
+        "--no-elimination", action="store_true", help="play without the elimination rules"
+    )
+    args = parser.parse_args()
+    elimination = not args.no_elimination
+    games = VectorGames(args.games, elimination)
+    rows = np.arange(args.games)
+    t = time.perf_counter()
+    games.start(rows, np.arange(args.start, args.start + args.games))
+    turns = games.play(rows)
+    elapsed = time.perf_counter() - t
+    print(f"{args.games} games in {elapsed:.2f} s ({turns / elapsed:.0f} turns per second)")
+    differ = check(args.start, args.start + args.games, elimination)
+    if differ:
+        print(f"{len(differ)} games differ from game.py, e.g. the seeds {differ[:10]}")
+        raise SystemExit(1)
+    print("All the games are the same as in game.py.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import copy
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import AI_decisions
+import home_race
+from decision_cache import DecisionCache
+
+# The chances of the players to win from the current state of a game
+# are estimated by playing the rest of the game many times (rollouts).
+# The players don't know the tokens that haven't been flipped, so in
+# every rollout the unflipped tokens are shuffled among the unflipped
+# cities: the flipped tokens stay as they are, and the remaining
+# tokens are the ones that haven't been found yet. In the rollouts
+# every player (also a human) is played by the AI. Every rollout has a
+# random generator of its own, so the estimate doesn't touch the random
+# state of the game or of the module random, which the other games of
+# the process (e.g. the tables of game_server.py) may be using.
+#
+# The worker processes are started once and kept for the next
+# estimates (see get_pool). They are spawned, not forked, as the
+# process asking may have other threads running.
+
+# the pool of the worker processes, its size and its lock (see get_pool)
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def rollout_state(game):
+    """Returns a copy of the game for the rollouts.
+
+    The copy has no humans: a human player is played by the AI of type
+    1, which targets the closest token. The ask and say of the game
+    (e.g. the connections of game_server.py) are not copied.
+    """
+    shallow = copy.copy(game)
+    shallow.ask, shallow.say = input, print
+    state = copy.deepcopy(shallow)
+    state.human_game = False
+    for player in state.players:
+        if not player.AI_type:
+            player.AI_type = 1
+    return state
+
+
+def rollout(state, seed):
+    """Plays the rest of the game once.
+
+    Parameters
+    ----------
+    state : Game
+        The game from rollout_state, it is not changed.
+    seed : int
+        The seed of the rollout.
+
+    Returns
+    -------
+    winner : str
+        The name of the winner.
+    turn_no : int
+        The turn the game ended on.
+    """
+    game = copy.deepcopy(state)
+    game.rng = random.Random(seed)
+    unknown = [x for x in range(len(game.tokens)) if game.unflipped[x]]
+    hidden = [game.tokens[x] for x in unknown]
+    game.rng.shuffle(hidden)
+    for x, token in zip(unknown, hidden):
+        game.tokens[x] = token
+    while game.winner is None:
+        game.play()
+    return game.winner.name, game.turn_no
+
+
+def init_worker(decision_cache_size=2**18):
+    """Initializes a worker process with a decision cache."""
+    if decision_cache_size:
+        AI_decisions.set_decision_cache(DecisionCache(decision_cache_size))
+    # the solved race home is needed by every rollout
+    home_race.solve()
+
+
+def run_batch(state, seeds):
+    """Plays the rollouts of the game with the seeds in a worker process."""
+    return [rollout(state, seed) for seed in seeds]
+
+
+def get_pool(workers=None):
+    """Returns the pool of the worker processes, started on the first call.
+
+    The same pool serves all the estimates of the process, also from
+    several threads at once. A pool of a different size replaces it.
+    """
+    global _pool, _pool_workers
+    workers = workers or os.cpu_count()
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(
+                workers, multiprocessing.get_context("spawn"), initializer=init_worker
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def wilson_interval(wins, n, z=1.96):
+    """Returns the Wilson score interval of the probability.
+
+    Parameters
+    ----------
+    wins : int
+        In how many of the rollouts the event happened.
+    n : int
+        The amount of rollouts.
+    z : float, optional
+        The quantile of the standard normal distribution. Defaults to
+        1.96, i.e. 95 % confidence.
+
+    Returns
+    -------
+    low, high : float
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    centre = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half = z / (1 + z**2 / n) * (p * (1 - p) / n + z**2 / (4 * n**2)) ** 0.5
+    return max(centre - half, 0.0), min(centre + half, 1.0)
+
+
+def estimate(game, budget=2.0, workers=None, max_rollouts=10**4, batch=20,
+             z=1.96, seed=None):
+    """Estimates the chances of the players to win from the current state.
+
+    The rollouts are spread over worker processes in batches, and new
+    batches are started until the time budget is used or max_rollouts
+    have been played. The random state of the game and of the module
+    random is not used.
+
+    Parameters
+    ----------
+    game : Game
+        The game in its current state.
+    budget : float, optional
+        How many seconds the estimate may take (roughly, the batches
+        running at the deadline are not waited for). Defaults to 2.
+    workers : int, optional
+        The amount of worker processes (see get_pool), 0 plays the
+        rollouts in this process. Defaults to the amount of cores.
+    max_rollouts : int, optional
+        The maximum amount of rollouts. Defaults to 10000.
+    batch : int, optional
+        How many rollouts a worker plays at a time. Defaults to 20.
+    z : float, optional
+        The quantile of the confidence intervals. Defaults to 1.96.
+    seed : int, optional
+        The seed of the first rollout, the rest have the next seeds.
+        Defaults to a random seed.
+
+    Returns
+    -------
+    dictionary
+        rollouts: how many rollouts were played, mean_turns: the mean
+        length of the game in them, and players: the probability to
+        win and its confidence interval (low, high) of each player.
+    """
+    deadline = time.monotonic() + budget
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(48)
+    state = rollout_state(game)
+    results = []
+    batches = [
+        range(start, min(start + batch, seed + max_rollouts))
+        for start in range(seed, seed + max_rollouts, batch)
+    ]
+    if workers == 0:
+        home_race.solve()
+        for seeds in batches:
+            if time.monotonic() >= deadline:
+                break
+            results += [rollout(state, a) for a in seeds]
+    else:
+        workers = workers or os.cpu_count()
+        pool = get_pool(workers)
+        queue = iter(batches)
+        running = set()
+        try:
+            while True:
+                # keep every worker busy with two batches at a time
+                for seeds in queue:
+                    running.add(pool.submit(run_batch, state, seeds))
+                    if len(running) >= 2 * workers:
+                        break
+                if not running:
+                    break
+                done, running = wait(
+                    running, max(deadline - time.monotonic(), 0), FIRST_COMPLETED
+                )
+                for future in done:
+                    results += future.result()
+                if time.monotonic() >= deadline:
+                    break
+        finally:
+            # the batches still waiting are dropped, the pool is kept
+            for future in running:
+                future.cancel()
+    n = len(results)
+    players = {}
+    for player in game.players:
+        wins = sum(1 for a in results if a[0] == player.name)
+        low, high = wilson_interval(wins, n, z)
+        players[player.name] = {"p": wins / n if n else 0.0, "low": low, "high": high}
+    return {
+        "rollouts": n,
+        "mean_turns": sum(a[1] for a in results) / n if n else None,
+        "players": players,
+    }
+
+
+def report(result):
+    """Returns the estimate as a readable string."""
+    if not result["rollouts"]:
+        return "There was no time to play any games."
+    msg = f"The chances to win from here ({result['rollouts']} simulated games):"
+    for name, value in result["players"].items():
+        msg += (
+            f"\n{name}: {round(value['p'] * 100, 1)} % "
+            + f"({round(value['low'] * 100, 1)}-{round(value['high'] * 100, 1)} %)"
+        )
+    msg += f"\nThe game would last on average {round(result['mean_turns'], 1)} turns."
+    return msg